@@ -0,0 +1,139 @@
+# Benchmark de la détection des mots interdits : recherche naïve (un test « in » par règle,
+# comportement historique) contre l'automate d'Aho-Corasick de twitchbot/banned_words.py.
+# Le chat est simulé au débit demandé ; on mesure la latence par message et la part de CPU occupée.
+#
+# Usage : python benchmarks/banned_words.py [--rules 5000] [--rate 50] [--duration 10]
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import string
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loadMatcherModule():
+	# Chargement direct du fichier : importer le paquet twitchbot démarrerait l'application et la base
+	spec = importlib.util.spec_from_file_location('banned_words', os.path.join(ROOT, 'twitchbot', 'banned_words.py'))
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+def _randomWord(rng: random.Random, min_length: int = 4, max_length: int = 10) -> str:
+	return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_length, max_length)))
+
+
+def _rules(module, count: int, rng: random.Random, modes: bool) -> list:
+	rules = []
+	for i in range(count):
+		word = _randomWord(rng)
+		whole_word = leet = False
+		if modes:
+			kind = rng.random()
+			if kind < 0.1:
+				word = word[:rng.randint(3, len(word) - 1)] + '*'
+			elif kind < 0.3:
+				whole_word = True
+			elif kind < 0.5:
+				leet = True
+		rules.append(module.BannedWordRule(i, word, 60, whole_word, leet))
+	return rules
+
+
+def _messages(rules: list, count: int, rng: random.Random, hit_ratio: float) -> list:
+	vocabulary = [_randomWord(rng, 2, 9) for _ in range(2000)] + ['gg', 'lol', 'pog', 'kappa', 'mdr', 'ptdr']
+	messages = []
+	for _ in range(count):
+		words = [rng.choice(vocabulary) for _ in range(rng.randint(3, 30))]
+		if rng.random() < hit_ratio:
+			words.insert(rng.randrange(len(words)), rng.choice(rules).word.replace('*', 'xx'))
+		messages.append(' '.join(words))
+	return messages
+
+
+def _naive(rules: list):
+	words = [(rule, rule.word.lower()) for rule in rules]
+
+	def match(text: str):
+		lowered = text.lower()
+		for rule, word in words:
+			if word in lowered:
+				return rule
+		return None
+	return match
+
+
+def _run(match, messages: list, rate: float, duration: float) -> dict:
+	timings, hits, late = [], 0, 0
+	interval = 1 / rate
+	start = time.perf_counter()
+	next_message = start
+	index = 0
+	while time.perf_counter() - start < duration:
+		text = messages[index % len(messages)]
+		index += 1
+		begin = time.perf_counter()
+		if match(text) is not None:
+			hits += 1
+		elapsed = time.perf_counter() - begin
+		timings.append(elapsed * 1000)
+		next_message += interval
+		delay = next_message - time.perf_counter()
+		if delay > 0:
+			time.sleep(delay)
+		else:
+			late += 1
+	busy = sum(timings) / 1000
+	return {'timings': timings, 'hits': hits, 'late': late, 'busy': busy / (time.perf_counter() - start)}
+
+
+def _percentile(values: list, pct: float) -> float:
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _report(label: str, result: dict):
+	timings = result['timings']
+	print(f'\n{label}')
+	print(f'  {len(timings)} messages, {result["hits"]} bloqués, {result["late"]} en retard sur le débit')
+	print(f'  latence médiane {statistics.median(timings):.3f} ms  p95 {_percentile(timings, 0.95):.3f} ms  p99 {_percentile(timings, 0.99):.3f} ms  max {max(timings):.3f} ms')
+	print(f'  CPU occupé par la détection : {result["busy"] * 100:.2f} %')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark recherche naïve vs automate des mots interdits')
+	parser.add_argument('--rules', type=int, default=5000)
+	parser.add_argument('--rate', type=float, default=50, help='messages par seconde')
+	parser.add_argument('--duration', type=float, default=10, help='durée de chaque simulation (s)')
+	parser.add_argument('--hits', type=float, default=0.02, help='proportion de messages contenant un mot interdit')
+	parser.add_argument('--seed', type=int, default=42)
+	args = parser.parse_args()
+
+	module = _loadMatcherModule()
+	rng = random.Random(args.seed)
+
+	# Règles « contenu » seules : les deux approches doivent bloquer exactement les mêmes messages
+	rules = _rules(module, args.rules, rng, modes=False)
+	messages = _messages(rules, 5000, rng, args.hits)
+	start = time.perf_counter()
+	matcher = module.BannedWordMatcher(rules)
+	print(f'Automate : {args.rules} règles, {len(matcher._goto)} états, construit en {(time.perf_counter() - start) * 1000:.1f} ms')
+	naive = _naive(rules)
+	mismatches = sum((naive(text) is None) != (matcher.match(text) is None) for text in messages)
+	print(f'Vérification : {mismatches} divergence(s) sur {len(messages)} messages')
+
+	_report(f'Recherche naïve ({args.rules} règles, {args.rate:g} msg/s)', _run(naive, messages, args.rate, args.duration))
+	_report(f'Automate ({args.rules} règles, {args.rate:g} msg/s)', _run(matcher.match, messages, args.rate, args.duration))
+
+	# Règles avec modes : mot entier, joker, leetspeak
+	rules = _rules(module, args.rules, rng, modes=True)
+	messages = _messages(rules, 5000, rng, args.hits)
+	matcher = module.BannedWordMatcher(rules)
+	_report('Automate avec modes (mot entier 20 %, joker 10 %, leet 20 %)', _run(matcher.match, messages, args.rate, args.duration))
+
+
+if __name__ == '__main__':
+	main()
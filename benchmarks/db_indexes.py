@@ -0,0 +1,118 @@
+# Benchmark des index secondaires : remplit une base SQLite temporaire (1M lignes par défaut)
+# et mesure la latence des requêtes chaudes (!inspect, !listwarn, /logs/poll...) sans puis avec index.
+#
+# Usage : python benchmarks/db_indexes.py [--rows 1000000] [--repeat 50]
+import argparse
+import importlib.util
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_indexes_module():
+	# Chargement direct du fichier : importer le package database démarrerait Flask et la base de prod
+	spec = importlib.util.spec_from_file_location('database_indexes', os.path.join(ROOT, 'database', 'indexes.py'))
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+def _seed(connection: sqlite3.Connection, rows: int):
+	with open(os.path.join(ROOT, 'database', 'schema.sql')) as f:
+		connection.executescript(f.read())
+	users = max(1, rows // 50)
+	start = datetime(2024, 1, 1)
+	types = ['warning', 'timeout', 'ban', 'kick', 'unban']
+	actions = ['timeout', 'ban', 'clean', 'link_blocked', 'banned_word', 'permit']
+
+	def moderation_rows():
+		for i in range(rows):
+			user = random.randrange(users)
+			yield (random.choice(types), f'user{user}', str(100000 + user), start + timedelta(seconds=i * 30),
+				'raison', str(random.randrange(20)), f'staff{random.randrange(20)}', None)
+
+	def log_rows():
+		for i in range(rows):
+			yield (random.choice(actions), 'AutoMod', f'viewer{random.randrange(users)}', 'details', start + timedelta(seconds=i * 30))
+
+	def invite_rows():
+		for i in range(rows // 10):
+			yield (str(100000 + random.randrange(users)), '42', f'code{i}', 'inviter', start + timedelta(seconds=i * 300))
+
+	def shoutbox_rows():
+		for i in range(rows // 10):
+			yield ('modo', 'message', start + timedelta(seconds=i * 300))
+
+	connection.executemany('INSERT INTO moderation_event (type, username, discord_id, created_at, reason, staff_id, staff_name, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', moderation_rows())
+	connection.executemany('INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (?, ?, ?, ?, ?)', log_rows())
+	connection.executemany('INSERT INTO member_invites (user_id, guild_id, invite_code, inviter_name, join_date) VALUES (?, ?, ?, ?, ?)', invite_rows())
+	connection.executemany('INSERT INTO mod_shoutbox_message (author, message, created_at) VALUES (?, ?, ?)', shoutbox_rows())
+	connection.executemany('INSERT INTO twitch_permit (username, expires_at) VALUES (?, ?)', ((f'viewer{i}', start) for i in range(rows // 100)))
+	connection.commit()
+	return users, start + timedelta(seconds=rows * 30)
+
+
+def _queries(users: int, end: datetime):
+	since = end - timedelta(minutes=10)
+	return {
+		'!inspect (historique d\'un membre)': lambda: ('SELECT * FROM moderation_event WHERE discord_id = ? ORDER BY created_at DESC', (str(100000 + random.randrange(users)),)),
+		'!listwarn (10 derniers)': lambda: ('SELECT * FROM moderation_event ORDER BY created_at DESC LIMIT 10', ()),
+		'/logs/poll (since)': lambda: ('SELECT * FROM twitch_moderation_log WHERE created_at > ? ORDER BY created_at DESC LIMIT 20', (since,)),
+		'invitation d\'un membre': lambda: ('SELECT invite_code, inviter_name FROM member_invites WHERE user_id = ? AND guild_id = ? ORDER BY join_date DESC LIMIT 1', (str(100000 + random.randrange(users)), '42')),
+		'permis de lien': lambda: ('SELECT * FROM twitch_permit WHERE username = ?', (f'viewer{random.randrange(users)}',)),
+		'shoutbox (100 derniers)': lambda: ('SELECT * FROM mod_shoutbox_message ORDER BY created_at DESC LIMIT 100', ()),
+	}
+
+
+def _measure(connection: sqlite3.Connection, queries: dict, repeat: int) -> dict:
+	results = {}
+	for label, build in queries.items():
+		timings = []
+		for _ in range(repeat):
+			sql, params = build()
+			begin = time.perf_counter()
+			connection.execute(sql, params).fetchall()
+			timings.append((time.perf_counter() - begin) * 1000)
+		results[label] = (statistics.median(timings), max(timings))
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark des index secondaires SQLite')
+	parser.add_argument('--rows', type=int, default=1_000_000)
+	parser.add_argument('--repeat', type=int, default=50)
+	args = parser.parse_args()
+
+	indexes = _load_indexes_module()
+	with tempfile.TemporaryDirectory() as tmp:
+		connection = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+		connection.execute('PRAGMA journal_mode=WAL')
+		print(f'Remplissage de {args.rows} lignes...')
+		begin = time.perf_counter()
+		users, end = _seed(connection, args.rows)
+		print(f'  terminé en {time.perf_counter() - begin:.1f}s')
+
+		queries = _queries(users, end)
+		indexes.dropIndexes(connection.cursor())
+		before = _measure(connection, queries, args.repeat)
+		begin = time.perf_counter()
+		indexes.ensureIndexes(connection.cursor())
+		connection.commit()
+		print(f'Création des index en {time.perf_counter() - begin:.1f}s')
+		after = _measure(connection, queries, args.repeat)
+		connection.close()
+
+	print(f'\n{"requête":<36} {"sans index (médiane/max ms)":>28} {"avec index (médiane/max ms)":>28}')
+	for label in queries:
+		b, a = before[label], after[label]
+		print(f'{label:<36} {b[0]:>18.2f} / {b[1]:<8.2f} {a[0]:>18.2f} / {a[1]:<8.2f}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,209 @@
+# Benchmark de la séparation lecture/écriture : N pollers (type /twitch-moderation/logs/poll)
+# interrogent la base pendant qu'une charge d'écriture constante (journaux de modération des bots)
+# tourne en parallèle. Compare un moteur unique partagé à la paire lecture seule / écrivain unique,
+# puis ajoute une tâche de fond qui écrit par lots (rétention, cache anti-cheat, écriture différée) :
+# connexion de l'écrivain gardée pour tous les lots, ou connexion dédiée par lot (backgroundConnection).
+#
+# Usage : python benchmarks/db_read_write_split.py [--pollers 16] [--writers 3] [--writes 200] [--duration 10] [--batch 2000]
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POLL_SQL = text('SELECT * FROM twitch_moderation_log WHERE created_at > :since ORDER BY created_at DESC LIMIT 20')
+COUNT_SQL = text('SELECT COUNT(*) FROM twitch_moderation_log')
+BATCH_SQL = 'INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (?, ?, ?, ?, ?)'
+BATCH_PAUSE = 0.005
+INSERT_SQL = text('INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (:action, :moderator, :target, :details, :created_at)')
+
+
+def _sqlDateTime(value: datetime) -> str:
+	return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+	cursor = dbapi_connection.cursor()
+	try:
+		cursor.execute('PRAGMA journal_mode=WAL;')
+	except sqlite3.OperationalError:
+		pass
+	cursor.execute('PRAGMA synchronous=NORMAL;')
+	cursor.execute('PRAGMA busy_timeout=30000;')
+	cursor.close()
+
+
+def _set_query_only(dbapi_connection, connection_record):
+	dbapi_connection.execute('PRAGMA query_only=ON;')
+
+
+def _engine(url: str, **options):
+	engine = create_engine(url, connect_args={'check_same_thread': False, 'timeout': 30}, **options)
+	event.listen(engine, 'connect', _set_pragmas)
+	return engine
+
+
+def _seed(path: str, rows: int):
+	connection = sqlite3.connect(path)
+	connection.execute('PRAGMA journal_mode=WAL')
+	with open(os.path.join(ROOT, 'database', 'schema.sql')) as f:
+		connection.executescript(f.read())
+	connection.execute('CREATE INDEX idx_twitch_moderation_log_created ON twitch_moderation_log (created_at DESC)')
+	start = datetime.now() - timedelta(seconds=rows)
+	connection.executemany(
+		'INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (?, ?, ?, ?, ?)',
+		(('banned_word', 'AutoMod', f'viewer{i}', 'details', _sqlDateTime(start + timedelta(seconds=i))) for i in range(rows)))
+	connection.commit()
+	connection.close()
+
+
+def _writeBatch(connection, batch: int):
+	now = _sqlDateTime(datetime.now())
+	cursor = connection.cursor()
+	cursor.executemany(BATCH_SQL, (('retention', 'bench', f'viewer{i}', 'batch', now) for i in range(batch)))
+	connection.commit()
+
+
+def _pooledJob(writer, batch: int):
+	"""Tâche de fond qui garde la connexion du pool de l'écrivain pour tous ses lots (à éviter)."""
+	def job(stop: threading.Event, stats: dict):
+		connection = writer.raw_connection()
+		try:
+			while not stop.is_set():
+				_writeBatch(connection, batch)
+				stats['batches'] += 1
+				time.sleep(BATCH_PAUSE)
+		finally:
+			connection.close()
+	return job
+
+
+def _dedicatedJob(path: str, batch: int):
+	"""Tâche de fond sur une connexion hors pool, ouverte puis fermée à chaque lot (backgroundConnection)."""
+	def job(stop: threading.Event, stats: dict):
+		while not stop.is_set():
+			connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+			try:
+				_set_pragmas(connection, None)
+				_writeBatch(connection, batch)
+			finally:
+				connection.close()
+			stats['batches'] += 1
+			time.sleep(BATCH_PAUSE)
+	return job
+
+
+def _run(reader, writer, pollers: int, writers: int, writes_per_second: int, duration: float, job=None) -> dict:
+	stop = threading.Event()
+	read_timings, write_timings = [], []
+	errors = {'read': 0, 'write': 0}
+	job_stats = {'batches': 0}
+	lock = threading.Lock()
+
+	def poller():
+		timings = []
+		while not stop.is_set():
+			since = datetime.now() - timedelta(minutes=5)
+			begin = time.perf_counter()
+			try:
+				with reader.connect() as connection:
+					connection.execute(POLL_SQL, {'since': _sqlDateTime(since)}).fetchall()
+					connection.execute(COUNT_SQL).scalar()
+				timings.append((time.perf_counter() - begin) * 1000)
+			except Exception:
+				with lock:
+					errors['read'] += 1
+		with lock:
+			read_timings.extend(timings)
+
+	def writer_loop():
+		interval = writers / writes_per_second
+		next_write = time.perf_counter()
+		timings = []
+		while not stop.is_set():
+			begin = time.perf_counter()
+			try:
+				with writer.begin() as connection:
+					connection.execute(INSERT_SQL, {'action': 'banned_word', 'moderator': 'AutoMod', 'target': 'viewer', 'details': 'bench', 'created_at': _sqlDateTime(datetime.now())})
+				timings.append((time.perf_counter() - begin) * 1000)
+			except Exception:
+				with lock:
+					errors['write'] += 1
+			next_write += interval
+			time.sleep(max(0, next_write - time.perf_counter()))
+		with lock:
+			write_timings.extend(timings)
+
+	threads = [threading.Thread(target=poller) for _ in range(pollers)]
+	threads += [threading.Thread(target=writer_loop) for _ in range(writers)]
+	if job is not None:
+		threads.append(threading.Thread(target=job, args=(stop, job_stats)))
+	for thread in threads:
+		thread.start()
+	time.sleep(duration)
+	stop.set()
+	for thread in threads:
+		thread.join()
+	return {'reads': read_timings, 'writes': write_timings, 'errors': errors, 'batches': job_stats['batches'] if job else None}
+
+
+def _percentile(values: list, pct: float) -> float:
+	if not values:
+		return 0.0
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _report(label: str, result: dict, duration: float):
+	reads, writes = result['reads'], result['writes']
+	print(f'\n{label}')
+	print(f'  lectures : {len(reads) / duration:>8.0f} req/s  médiane {statistics.median(reads) if reads else 0:.2f} ms  p95 {_percentile(reads, 0.95):.2f} ms  p99 {_percentile(reads, 0.99):.2f} ms  erreurs {result["errors"]["read"]}')
+	print(f'  écritures: {len(writes) / duration:>8.0f} tx/s   médiane {statistics.median(writes) if writes else 0:.2f} ms  p95 {_percentile(writes, 0.95):.2f} ms  p99 {_percentile(writes, 0.99):.2f} ms  max {max(writes) if writes else 0:.2f} ms  erreurs {result["errors"]["write"]}')
+	if result['batches'] is not None:
+		print(f'  tâche de fond : {result["batches"]} lot(s)')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark moteur partagé vs moteurs lecture seule / écrivain unique')
+	parser.add_argument('--pollers', type=int, default=16)
+	parser.add_argument('--writers', type=int, default=3, help='threads écrivains (bots Discord/Twitch, écriture différée)')
+	parser.add_argument('--writes', type=int, default=200, help='écritures par seconde (total)')
+	parser.add_argument('--duration', type=float, default=10)
+	parser.add_argument('--rows', type=int, default=100_000)
+	parser.add_argument('--batch', type=int, default=2000, help='lignes par lot de la tâche de fond')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, 'bench.db')
+		_seed(path, args.rows)
+
+		shared = _engine(f'sqlite:///{path}')
+		result = _run(shared, shared, args.pollers, args.writers, args.writes, args.duration)
+		shared.dispose()
+		_report(f'Moteur unique partagé (pool par défaut), {args.pollers} pollers', result, args.duration)
+
+		writer = _engine(f'sqlite:///{path}', pool_size=1, max_overflow=0)
+		reader = _engine(f'sqlite:///file:{path}?mode=ro&uri=true', pool_size=args.pollers, max_overflow=args.pollers)
+		event.listen(reader, 'connect', _set_query_only)
+		result = _run(reader, writer, args.pollers, args.writers, args.writes, args.duration)
+		_report(f'Lecture seule + écrivain unique, {args.pollers} pollers', result, args.duration)
+
+		# Les écritures ORM attendent la fin de la tâche (pool épuisé) : un max proche de la durée
+		result = _run(reader, writer, args.pollers, args.writers, args.writes, args.duration, _pooledJob(writer, args.batch))
+		_report(f'+ tâche de fond sur la connexion de l\'écrivain (lots de {args.batch})', result, args.duration)
+
+		result = _run(reader, writer, args.pollers, args.writers, args.writes, args.duration, _dedicatedJob(path, args.batch))
+		_report(f'+ tâche de fond sur connexion dédiée par lot (lots de {args.batch})', result, args.duration)
+		writer.dispose()
+		reader.dispose()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,140 @@
+# Benchmark et vérification des agrégats journaliers (database/rollups.py) : remplit une base SQLite
+# temporaire au format des anciennes bases (colonnes sources sans NOT NULL, quelques lignes à NULL),
+# mesure le recalcul complet (migrations) et le coût des triggers par écriture, puis vérifie que
+# les agrégats correspondent aux tables sources et qu'une ligne incomplète ne bloque ni une écriture
+# ni le recalcul.
+#
+# Usage : python benchmarks/rollups.py [--rows 200000] [--writes 2000]
+import argparse
+import importlib.util
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Colonnes telles que créées par SQLAlchemy (models.py) : toutes acceptent NULL
+LEGACY_TABLES = [
+	'CREATE TABLE moderation_event (id INTEGER PRIMARY KEY, type VARCHAR(32), username VARCHAR(256), discord_id VARCHAR(64), created_at DATETIME, reason VARCHAR(1024), staff_id VARCHAR(64), staff_name VARCHAR(256), duration INTEGER)',
+	'CREATE TABLE twitch_moderation_log (id INTEGER PRIMARY KEY, action VARCHAR(32), moderator VARCHAR(256), target VARCHAR(256), details VARCHAR(512), created_at DATETIME)',
+	'CREATE TABLE member_invites (id INTEGER PRIMARY KEY, user_id VARCHAR(64), guild_id VARCHAR(64), invite_code VARCHAR(32), inviter_name VARCHAR(256), join_date DATETIME)',
+]
+INSERT_EVENT = 'INSERT INTO moderation_event (type, username, discord_id, created_at, reason, staff_id, staff_name) VALUES (?, ?, ?, ?, ?, ?, ?)'
+INSERT_LOG = 'INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (?, ?, ?, ?, ?)'
+INSERT_INVITE = 'INSERT INTO member_invites (user_id, guild_id, invite_code, inviter_name, join_date) VALUES (?, ?, ?, ?, ?)'
+
+# Lignes incomplètes : clés et dates à NULL
+NULL_EVENTS = [
+	('warning', 'user', None, '2024-01-01 10:00:00.000000', 'raison', 'staff', 'staff'),
+	('warning', 'user', '42', '2024-01-01 10:00:00.000000', 'raison', None, None),
+	(None, None, None, '2024-01-01 10:00:00.000000', None, None, None),
+	('ban', 'user', '42', None, 'raison', 'staff', 'staff'),
+]
+NULL_LOGS = [(None, None, None, None, '2024-01-01 10:00:00.000000'), ('timeout', 'AutoMod', 'user', None, None)]
+NULL_INVITES = [('1', None, None, None, '2024-01-01 10:00:00.000000'), ('2', 'guild', None, None, None)]
+
+
+def _load_rollups_module():
+	# Chargement direct du fichier : importer le package database démarrerait Flask et la base de prod
+	spec = importlib.util.spec_from_file_location('database_rollups', os.path.join(ROOT, 'database', 'rollups.py'))
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+def _sqlDateTime(value: datetime) -> str:
+	return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _seed(connection: sqlite3.Connection, rows: int):
+	for sql in LEGACY_TABLES:
+		connection.execute(sql)
+	start = datetime(2024, 1, 1)
+	types = ['warning', 'timeout', 'ban', 'kick', 'unban']
+	actions = ['timeout', 'ban', 'clean', 'link_blocked', 'banned_word', 'permit']
+	connection.executemany(INSERT_EVENT, ((random.choice(types), f'user{i % 500}', str(100000 + i % 500),
+		_sqlDateTime(start + timedelta(seconds=i * 60)), 'raison', str(i % 20), f'staff{i % 20}') for i in range(rows)))
+	connection.executemany(INSERT_LOG, ((random.choice(actions), random.choice(['AutoMod', 'mod']), f'user{i % 500}', None,
+		_sqlDateTime(start + timedelta(seconds=i * 60))) for i in range(rows)))
+	connection.executemany(INSERT_INVITE, ((str(i), 'guild', 'abc', 'inviter', _sqlDateTime(start + timedelta(seconds=i * 600)))
+		for i in range(rows // 10)))
+	connection.executemany(INSERT_EVENT, NULL_EVENTS)
+	connection.executemany(INSERT_LOG, NULL_LOGS)
+	connection.executemany(INSERT_INVITE, NULL_INVITES)
+	connection.commit()
+
+
+def _check(connection: sqlite3.Connection) -> list:
+	"""Écarts entre agrégats et tables sources (lignes datées uniquement)."""
+	expected = {
+		'daily_moderation_stats': "SELECT COUNT(*) FROM moderation_event WHERE date(created_at) IS NOT NULL",
+		'daily_moderation_target': "SELECT COUNT(*) FROM moderation_event WHERE date(created_at) IS NOT NULL",
+		'daily_moderation_staff': "SELECT COUNT(*) FROM moderation_event WHERE date(created_at) IS NOT NULL",
+		'daily_twitch_moderation': "SELECT COUNT(*) FROM twitch_moderation_log WHERE date(created_at) IS NOT NULL",
+	}
+	errors = []
+	for table, sql in expected.items():
+		total = connection.execute(f'SELECT COALESCE(SUM(count), 0) FROM {table}').fetchone()[0]
+		source = connection.execute(sql).fetchone()[0]
+		if total != source:
+			errors.append(f'{table} : {total} au lieu de {source}')
+	joins = connection.execute('SELECT COALESCE(SUM(joins), 0) FROM daily_member_stats').fetchone()[0]
+	source = connection.execute('SELECT COUNT(*) FROM member_invites WHERE date(join_date) IS NOT NULL').fetchone()[0]
+	if joins != source:
+		errors.append(f'daily_member_stats : {joins} arrivées au lieu de {source}')
+	automod = connection.execute('SELECT SUM(automod_count) FROM daily_twitch_moderation').fetchone()[0]
+	source = connection.execute("SELECT COUNT(*) FROM twitch_moderation_log WHERE moderator = 'AutoMod' AND date(created_at) IS NOT NULL").fetchone()[0]
+	if automod != source:
+		errors.append(f'daily_twitch_moderation : {automod} actions AutoMod au lieu de {source}')
+	return errors
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--rows', type=int, default=200000)
+	parser.add_argument('--writes', type=int, default=2000)
+	args = parser.parse_args()
+	rollups = _load_rollups_module()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		connection = sqlite3.connect(os.path.join(tmp, 'rollups.db'))
+		print(f'Remplissage : {args.rows} événements, {args.rows} journaux Twitch, {args.rows // 10} arrivées...')
+		_seed(connection, args.rows)
+
+		start = time.perf_counter()
+		rollups.ensureRollups(connection.cursor())
+		rollups.rebuildRollups(connection.cursor())
+		connection.commit()
+		print(f'Recalcul complet : {(time.perf_counter() - start) * 1000:.0f} ms')
+
+		# Écritures avec triggers, dont les lignes incomplètes (elles ne doivent pas échouer)
+		start = time.perf_counter()
+		for i in range(args.writes):
+			connection.execute(INSERT_EVENT, ('warning', 'user', str(i), _sqlDateTime(datetime.now()), 'raison', '1', 'staff'))
+		connection.commit()
+		print(f'Écriture avec triggers : {(time.perf_counter() - start) / args.writes * 1e6:.0f} µs par événement')
+		connection.executemany(INSERT_EVENT, NULL_EVENTS)
+		connection.executemany(INSERT_LOG, NULL_LOGS)
+		connection.executemany(INSERT_INVITE, NULL_INVITES)
+		connection.execute("UPDATE moderation_event SET discord_id = NULL, created_at = created_at WHERE id % 7 = 0")
+		connection.execute('DELETE FROM moderation_event WHERE id % 5 = 0')
+		connection.commit()
+
+		errors = _check(connection)
+		rollups.rebuildRollups(connection.cursor())
+		connection.commit()
+		errors += [f'après recalcul, {error}' for error in _check(connection)]
+		connection.close()
+
+	if errors:
+		print('Agrégats incohérents :\n  ' + '\n  '.join(errors))
+		sys.exit(1)
+	print('Agrégats cohérents avec les tables sources (lignes à NULL comprises)')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,133 @@
+# Routeur des commandes personnalisées (table commande) partagé par Discord et Twitch.
+# Les déclencheurs (et leurs alias) sont indexés par plateforme, en minuscules, avec leur
+# réponse précompilée en segments texte / variable. La table est rechargée paresseusement
+# après un commit qui touche une commande : un message « ! » coûte une recherche dans un
+# dict et un rendu de modèle, sans requête en base.
+import re
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import db
+from database.models import Commande
+
+PLATFORMS = ('discord', 'twitch')
+TEMPLATE_VARIABLES = ('user', 'username', 'channel', 'title', 'game', 'viewers', 'uptime')
+_VARIABLE = re.compile(r'\{(' + '|'.join(TEMPLATE_VARIABLES) + r')\}')
+
+_lock = threading.Lock()
+_router = None
+_generation = 0
+
+
+def normalizeTrigger(trigger: str) -> str:
+	trigger = trigger.strip().lower()
+	if trigger and not trigger.startswith('!'):
+		trigger = '!' + trigger
+	return trigger
+
+
+def parseAliases(aliases: str | None) -> list:
+	"""Alias saisis séparés par des virgules ou des espaces, normalisés comme les déclencheurs."""
+	if not aliases:
+		return []
+	return [normalizeTrigger(alias) for alias in re.split(r'[,\s]+', aliases) if alias.strip()]
+
+
+class CompiledTemplate:
+	__slots__ = ('segments', 'variables')
+
+	def __init__(self, text: str):
+		# Segments pairs : texte littéral, segments impairs : nom de variable
+		self.segments = _VARIABLE.split(text or '')
+		self.variables = frozenset(self.segments[1::2])
+
+	def render(self, values: dict) -> str:
+		if not self.variables:
+			return self.segments[0]
+		return ''.join(values[part] if i % 2 else part for i, part in enumerate(self.segments))
+
+
+class CompiledCommand:
+	__slots__ = ('id', 'trigger', 'aliases', 'response', 'template', 'twitch_permission')
+
+	def __init__(self, row: Commande):
+		self.id = row.id
+		self.trigger = row.trigger
+		self.aliases = parseAliases(row.aliases)
+		self.response = row.response or ''
+		self.template = CompiledTemplate(self.response)
+		self.twitch_permission = row.twitch_permission or 'viewer'
+
+
+class CommandRouter:
+	"""Déclencheurs et alias → commande, par plateforme."""
+
+	def __init__(self, rows: list):
+		self._triggers = {platform: {} for platform in PLATFORMS}
+		self._listed = {platform: [] for platform in PLATFORMS}
+		commands = [(row, CompiledCommand(row)) for row in rows if row.trigger]
+		for row, command in commands:
+			for platform in PLATFORMS:
+				if getattr(row, f'{platform}_enable'):
+					self._listed[platform].append(command)
+					self._triggers[platform][normalizeTrigger(row.trigger)] = command
+		# Un alias ne masque jamais le déclencheur principal d'une autre commande
+		for platform in PLATFORMS:
+			triggers = self._triggers[platform]
+			for command in self._listed[platform]:
+				for alias in command.aliases:
+					triggers.setdefault(alias, command)
+
+	def find(self, platform: str, trigger: str) -> CompiledCommand | None:
+		return self._triggers[platform].get(trigger.lower())
+
+	def listCommands(self, platform: str) -> list:
+		"""Commandes actives de la plateforme, dans l'ordre de la table."""
+		return self._listed[platform]
+
+
+def loadRouter() -> CommandRouter:
+	"""Construit l'index des commandes (contexte applicatif requis)."""
+	global _router
+	with _lock:
+		if _router is not None:
+			return _router
+		generation = _generation
+	router = CommandRouter(db.session.query(Commande).all())
+	with _lock:
+		if generation == _generation:
+			_router = router
+	return router
+
+
+def getRouter() -> CommandRouter | None:
+	"""Index courant, None s'il doit être (re)chargé."""
+	return _router
+
+
+def invalidateCommandRouter():
+	global _router, _generation
+	with _lock:
+		_router = None
+		_generation += 1
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackCommandChanges(session, flush_context, instances):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if isinstance(obj, Commande):
+			session.info['commands_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidateAfterCommit(session):
+	if session.info.pop('commands_changed', False):
+		invalidateCommandRouter()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('commands_changed', None)
@@ -0,0 +1,68 @@
+# Accès base de données depuis les boucles asyncio des bots Discord et Twitch.
+# Les requêtes SQLAlchemy sont exécutées dans un pool de threads dédié, chacune dans son propre
+# contexte d'application (donc sa propre session) : aucune I/O SQLite ni attente de verrou
+# ne bloque la boucle d'événements.
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+
+from webapp import webapp
+from database import db
+
+DB_EXECUTOR_WORKERS = 4
+_LOCK_RETRIES = 5
+_LOCK_BASE_DELAY = 0.1
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+
+
+def _isLocked(error: OperationalError) -> bool:
+	return 'database is locked' in str(error).lower()
+
+
+def _runInContext(fn, commit: bool, args, kwargs):
+	with webapp.app_context():
+		# Les objets renvoyés restent lisibles une fois la session fermée
+		db.session().expire_on_commit = False
+		if not commit:
+			return fn(*args, **kwargs)
+		for attempt in range(_LOCK_RETRIES):
+			try:
+				result = fn(*args, **kwargs)
+				db.session.commit()
+				return result
+			except OperationalError as e:
+				db.session.rollback()
+				if not _isLocked(e) or attempt == _LOCK_RETRIES - 1:
+					raise
+				delay = _LOCK_BASE_DELAY * (2 ** attempt)
+				logging.warning(f"Base verrouillée, nouvel essai dans {delay:.1f}s ({attempt + 1}/{_LOCK_RETRIES})")
+				time.sleep(delay)
+			except Exception:
+				db.session.rollback()
+				raise
+
+
+async def runQuery(fn, *args, **kwargs):
+	"""Exécute fn (lecture) hors de la boucle asyncio et renvoie son résultat."""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_executor, functools.partial(_runInContext, fn, False, args, kwargs))
+
+
+async def runWrite(fn, *args, **kwargs):
+	"""Exécute fn puis valide la session hors de la boucle asyncio ; fn est rejouée si la base est verrouillée."""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_executor, functools.partial(_runInContext, fn, True, args, kwargs))
+
+
+async def addAndCommit(*objects):
+	"""Insère les objets donnés et valide. Les objets sont renvoyés détachés, identifiants renseignés."""
+	def _add():
+		for obj in objects:
+			db.session.add(obj)
+	await runWrite(_add)
+	return objects[0] if len(objects) == 1 else objects
@@ -1,32 +1,130 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 from database import db
 from database.models import Configuration
 
+_TRUE_VALUES = ['true', '1', 'yes', 'on']
+
+# Snapshot de la table configuration partagé par tous les threads (web, Discord, Twitch).
+# Rechargé paresseusement après invalidation (commit touchant la table). Les valeurs écrites par
+# createOrUpdate sont gardées dans la session et reportées dans le snapshot seulement une fois
+# le commit réussi : aucun thread ne lit de configuration non validée.
+_lock = threading.Lock()
+_snapshot: dict | None = None
+_generation = 0
+_stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'invalidations': 0}
+
+
+def _typed(key: str, value):
+	if key.endswith('_enable'):
+		if isinstance(value, bool):
+			return value
+		return value in _TRUE_VALUES
+	return value
+
+
+def _loadSnapshot() -> dict:
+	global _snapshot
+	with _lock:
+		if _snapshot is not None:
+			return _snapshot
+		generation = _generation
+	rows = db.session.query(Configuration.key, Configuration.value).all()
+	snapshot = {key: (value, _typed(key, value)) for key, value in rows}
+	with _lock:
+		_stats['reloads'] += 1
+		# Une invalidation pendant la lecture rend ce snapshot potentiellement périmé
+		if generation == _generation:
+			_snapshot = snapshot
+	return snapshot
+
+
+def _lookup(key: str):
+	snapshot = _snapshot
+	with _lock:
+		_stats['hits' if snapshot is not None else 'misses'] += 1
+	if snapshot is None:
+		snapshot = _loadSnapshot()
+	return snapshot.get(key)
+
+
+def _applyCommitted(values: dict):
+	global _snapshot, _generation
+	with _lock:
+		# Un rechargement en cours a pu lire la table avant ce commit : il ne sera pas retenu
+		_generation += 1
+		if _snapshot is not None:
+			_snapshot = {**_snapshot, **values}
+
+
+def invalidateConfigurationCache():
+	global _snapshot, _generation
+	with _lock:
+		_snapshot = None
+		_generation += 1
+		_stats['invalidations'] += 1
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackConfigurationChanges(session, flush_context, instances):
+	# Les lignes écrites par createOrUpdate sont reportées au commit ; toute autre modification
+	# de la table (ou une suppression) impose un rechargement complet
+	pending = session.info.get('configuration_pending', {})
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if isinstance(obj, Configuration) and (obj in session.deleted or obj.key not in pending):
+			session.info['configuration_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _applyAfterCommit(session):
+	pending = session.info.pop('configuration_pending', None)
+	if session.info.pop('configuration_changed', False):
+		invalidateConfigurationCache()
+	elif pending:
+		_applyCommitted(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('configuration_pending', None)
+	session.info.pop('configuration_changed', None)
+
+
 class ConfigurationHelper:
 	def getValue(self, key:str) :
-		conf = Configuration.query.filter_by(key=key).first()
-		if conf == None:
+		entry = _lookup(key)
+		if entry == None:
 			return None
-		if (key.endswith('_enable')) :
-			return conf.value in ['true', '1', 'yes', 'on']
-		return conf.value
-	
+		return entry[1]
+
 	def getIntValue(self, key:str) :
-		conf = Configuration.query.filter_by(key=key).first()
-		if conf == None:
+		entry = _lookup(key)
+		if entry == None:
 			return 0
-		return int(conf.value)
+		return int(entry[0])
 
 	def createOrUpdate(self, key:str, value) :
 		conf = Configuration.query.filter_by(key=key).first()
 		if (key.endswith('_enable')) :
-			value = value in ['true', '1', 'yes', 'on']
+			value = value in _TRUE_VALUES
 		if conf :
 			conf.value = value
 		else :
 			conf = Configuration(key = key, value = value)
 			db.session.add(conf)
+		# Valeur brute telle que relue depuis SQLite (booléen stocké en 0/1), appliquée au commit
+		raw = ('1' if value else '0') if isinstance(value, bool) else value
+		db.session.info.setdefault('configuration_pending', {})[key] = (raw, _typed(key, value))
 
-
-
-
+	def getCacheStats(self) -> dict:
+		"""Compteurs du cache de configuration (hits, misses, rechargements, invalidations)."""
+		with _lock:
+			stats = dict(_stats)
+			stats['size'] = len(_snapshot) if _snapshot is not None else 0
+		total = stats['hits'] + stats['misses']
+		stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else 0.0
+		return stats
@@ -0,0 +1,60 @@
+# Index secondaires des colonnes de recherche fréquentes (création et maintenance au démarrage).
+# Module sans dépendance Flask : utilisable depuis les migrations comme depuis un script de benchmark.
+import logging
+from sqlite3 import Cursor
+
+# (nom, table, colonnes) — l'ordre des colonnes suit les filtres puis le tri des requêtes
+INDEXES = [
+	# !inspect, !listwarn @user, filtre utilisateur du panneau : discord_id puis curseur (created_at, id)
+	('idx_moderation_event_discord_created', 'moderation_event', 'discord_id, created_at DESC, id DESC'),
+	# /moderation et !listwarn sans filtre : pagination par curseur (created_at, id)
+	('idx_moderation_event_created', 'moderation_event', 'created_at DESC, id DESC'),
+	# Filtres type et staff du panneau de modération
+	('idx_moderation_event_type_created', 'moderation_event', 'type, created_at DESC, id DESC'),
+	('idx_moderation_event_staff_created', 'moderation_event', 'staff_id, created_at DESC, id DESC'),
+	# Détection des vidéos déjà connues (discordbot/youtube.py)
+	('idx_youtube_video_history_notification_video', 'youtube_video_history', 'notification_id, video_id'),
+	# /twitch-moderation/logs/poll et shoutbox : since + tri created_at desc
+	('idx_twitch_moderation_log_created', 'twitch_moderation_log', 'created_at DESC'),
+	# Dernière invitation d'un membre (!inspect) : couvrant, pas de lecture de la table
+	('idx_member_invites_user_guild_join', 'member_invites', 'user_id, guild_id, join_date DESC, invite_code, inviter_name'),
+	# Permis de liens vérifiés sur chaque message Twitch contenant une URL
+	('idx_twitch_permit_username', 'twitch_permit', 'username'),
+	('idx_mod_shoutbox_message_created', 'mod_shoutbox_message', 'created_at DESC'),
+]
+
+
+def _indexSql(name: str, table: str, columns: str) -> str:
+	return f'CREATE INDEX {name} ON {table} ({columns})'
+
+
+def ensureIndexes(cursor: Cursor) -> list[str]:
+	"""Crée les index manquants, recrée ceux dont la définition a changé et met à jour les statistiques du planificateur.
+	Retourne la liste des index (re)créés."""
+	existing_tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+	existing_indexes = dict(cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL").fetchall())
+	created = []
+	analyzed_tables = set()
+	for name, table, columns in INDEXES:
+		if table not in existing_tables:
+			continue
+		sql = _indexSql(name, table, columns)
+		current = existing_indexes.get(name)
+		if current == sql:
+			continue
+		if current is not None:
+			logging.info(f"Index {name} modifié, recréation")
+			cursor.execute(f'DROP INDEX {name}')
+		cursor.execute(sql)
+		logging.info(f"Index {name} créé sur {table}")
+		created.append(name)
+		analyzed_tables.add(table)
+	for table in analyzed_tables:
+		cursor.execute(f'ANALYZE {table}')
+	return created
+
+
+def dropIndexes(cursor: Cursor):
+	"""Supprime les index gérés par ce module (utilisé par le benchmark pour mesurer l'avant/après)."""
+	for name, _, _ in INDEXES:
+		cursor.execute(f'DROP INDEX IF EXISTS {name}')
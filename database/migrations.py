@@ -0,0 +1,284 @@
+# Migrations versionnées du schéma SQLite.
+# La version courante est stockée dans la table schema_version : au démarrage, seules les étapes
+# en attente sont appliquées, dans une seule transaction. Si le schéma est à jour, aucune
+# introspection (PRAGMA table_info, sqlite_master) n'est faite.
+import json
+import logging
+import os
+import sqlite3
+import time
+from sqlite3 import Cursor, Connection
+
+from database.indexes import ensureIndexes
+from database.rollups import ensureRollups, rebuildRollups, replaceRollupTriggers
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), 'schema.sql')
+
+
+def _tableExists(table_name: str, cursor: Cursor) -> bool:
+	cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+	return cursor.fetchone() is not None
+
+def _tableHaveColumn(table_name:str, column_name:str, cursor:Cursor) -> bool:
+	if not _tableExists(table_name, cursor):
+		return False
+	cursor.execute(f'PRAGMA table_info({table_name})')
+	columns = cursor.fetchall()
+	return any(col[1] == column_name for col in columns)
+
+def _tableEmpty(table:str, cursor:Cursor) -> bool:
+	return cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == 0
+
+def _renameTable(old_name:str, new_name:str, cursor:Cursor) :
+	cursor.execute(f'ALTER TABLE {old_name} RENAME TO {new_name}')
+
+def _dropTable(table_name:str, cursor:Cursor) :
+	cursor.execute(f'DROP TABLE {table_name}')
+
+def _addMissingColumns(table: str, columns: list, cursor: Cursor):
+	if not _tableExists(table, cursor):
+		return
+	cursor.execute(f'PRAGMA table_info({table})')
+	existing = {col[1] for col in cursor.fetchall()}
+	for col_name, col_type in columns:
+		if col_name in existing:
+			continue
+		try:
+			cursor.execute(f'ALTER TABLE {table} ADD COLUMN {col_name} {col_type}')
+			logging.info(f"Colonne {col_name} ajoutée à {table}")
+		except Exception as e:
+			logging.warning(f"Colonne {table}.{col_name}: {e}")
+
+def _splitSqlScript(sql: str) -> list[str]:
+	"""Découpe un script SQL en instructions (executescript validerait la transaction en cours)."""
+	statements = []
+	current = ''
+	for line in sql.splitlines(keepends=True):
+		if not current and (not line.strip() or line.strip().startswith('--')):
+			continue
+		current += line
+		if sqlite3.complete_statement(current):
+			statements.append(current.strip())
+			current = ''
+	if current.strip():
+		statements.append(current.strip())
+	return statements
+
+
+def _doPreImportMigration(cursor:Cursor):
+	if _tableHaveColumn('game_bundle', 'id', cursor) :
+		logging.info("Table game_bundle détécté, rennomage en game_bundle_old")
+		_renameTable('game_bundle', 'game_bundle_old', cursor)
+
+def _doImportSchema(cursor: Cursor):
+	with open(SCHEMA_FILE, 'r') as f:
+		sql = f.read()
+	for statement in _splitSqlScript(sql):
+		cursor.execute(statement)
+
+def _doPostImportMigration(cursor:Cursor):
+	if _tableEmpty('game_bundle', cursor) and _tableExists('game_bundle_old', cursor):
+		logging.info("remplir game_bundle avec game_bundle_old")
+		bundles = cursor.execute('SELECT * FROM game_bundle_old').fetchall()
+		for bundle in bundles :
+			name = bundle[1]
+			json_data = json.loads(bundle[2])
+			url = json_data['url']
+			logging.info(f'import du bundle {name}, {url}')
+			cursor.execute('INSERT INTO game_bundle(url, name, json) VALUES (?, ?, ?)', (url, name, json.dumps(json_data)))
+		logging.info("suppression de la table temporaire game_bundle_old")
+		_dropTable('game_bundle_old', cursor)
+
+def _doAddColumnMigrations(cursor: Cursor):
+	"""Colonnes ajoutées au fil des versions sur des bases créées avant leur apparition dans schema.sql."""
+	_addMissingColumns('youtube_notification', [
+		('embed_title', 'VARCHAR(256)'),
+		('embed_description', 'VARCHAR(2000)'),
+		('embed_color', 'VARCHAR(8) DEFAULT "FF0000"'),
+		('embed_footer', 'VARCHAR(2048)'),
+		('embed_author_name', 'VARCHAR(256)'),
+		('embed_author_icon', 'VARCHAR(512)'),
+		('embed_thumbnail', 'BOOLEAN DEFAULT 1'),
+		('embed_image', 'BOOLEAN DEFAULT 1'),
+	], cursor)
+	_addMissingColumns('commande', [
+		('twitch_permission', "VARCHAR(16) DEFAULT 'viewer'"),
+	], cursor)
+	# Colonnes embed pour live_alert (message par défaut en embed)
+	_addMissingColumns('live_alert', [
+		('watch_activity', 'BOOLEAN NOT NULL DEFAULT 0'),
+		('embed_title', 'VARCHAR(256)'),
+		('embed_description', 'VARCHAR(2000)'),
+		('embed_color', 'VARCHAR(8) DEFAULT "9146FF"'),
+		('embed_footer', 'VARCHAR(2048)'),
+		('embed_author_name', 'VARCHAR(256)'),
+		('embed_author_icon', 'VARCHAR(512)'),
+		('embed_thumbnail', 'BOOLEAN DEFAULT 1'),
+		('embed_image', 'BOOLEAN DEFAULT 1'),
+	], cursor)
+	# Colonnes supplémentaires pour patreon_post (historique + statut notification)
+	_addMissingColumns('patreon_post', [
+		('title', 'VARCHAR(512)'),
+		('link', 'VARCHAR(1024)'),
+		('description', 'TEXT'),
+		('published_at', 'VARCHAR(64)'),
+		('notified', 'BOOLEAN NOT NULL DEFAULT 0'),
+	], cursor)
+
+	# Seed des 4 types de twitch_event_notification (table créée par schema.sql)
+	if _tableEmpty('twitch_event_notification', cursor):
+		for ev in ('sub', 'follow', 'raid', 'clip'):
+			try:
+				cursor.execute(
+					"INSERT INTO twitch_event_notification (event_type, message_twitch) VALUES (?, ?)",
+					(ev, 'Merci {user} !' if ev != 'raid' else 'Bienvenue aux viewers de {from_broadcaster_name} !'),
+				)
+			except Exception as e:
+				logging.warning(f"Seed twitch_event_notification {ev}: {e}")
+
+def _doSeedAuth(cursor: Cursor):
+	"""Seed rôles par défaut et permissions des pages si vides."""
+	if cursor.execute("SELECT COUNT(*) FROM webapp_role").fetchone()[0] > 0:
+		return
+	default_roles = [
+		("viewer_twitch", 0),
+		("utilisateur_discord", 1),
+		("moderateur_discord", 2),
+		("expert_discord", 3),
+		("moderateur_twitch", 4),
+		("super_administrateur", 5),
+	]
+	for name, level in default_roles:
+		try:
+			cursor.execute("INSERT INTO webapp_role (name, level) VALUES (?, ?)", (name, level))
+		except Exception as e:
+			logging.warning(f"Seed role {name}: {e}")
+	logging.info("Rôles par défaut insérés")
+
+	if cursor.execute("SELECT COUNT(*) FROM webapp_page_permission").fetchone()[0] > 0:
+		return
+	# page_key, min_level, write_level (NULL = même que min_level)
+	default_pages = [
+		("index", 0, None),
+		("configurations", 5, 5),
+		("commandes", 1, 2),
+		("humeurs", 1, 2),
+		("live_alert", 0, 4),
+		("announcements", 0, 4),
+		("twitch_moderation", 0, 4),
+		("link_filter", 0, 4),
+		("twitch_events", 0, 4),
+		("youtube", 1, 2),
+		("protondb", 1, 2),
+		("freeloot", 1, 2),
+		("patreon", 1, 2),
+		("moderation", 1, 2),
+		("users", 5, 5),
+		("settings", 5, 5),
+	]
+	for page_key, min_level, wl in default_pages:
+		try:
+			cursor.execute(
+				"INSERT INTO webapp_page_permission (page_key, min_level, write_level) VALUES (?, ?, ?)",
+				(page_key, min_level, wl),
+			)
+		except Exception as e:
+			logging.warning(f"Seed page {page_key}: {e}")
+	logging.info("Permissions pages par défaut insérées")
+
+	# Inscriptions activées par défaut
+	try:
+		cursor.execute(
+			"INSERT OR IGNORE INTO configuration (key, value) VALUES ('registration_enabled', 'true')"
+		)
+	except Exception as e:
+		logging.warning(f"Config registration_enabled: {e}")
+
+
+def _migrateBaseline(cursor: Cursor):
+	"""Création du schéma et rattrapage des bases antérieures au versionnage (idempotent)."""
+	_doPreImportMigration(cursor)
+	_doImportSchema(cursor)
+	_doPostImportMigration(cursor)
+	_doAddColumnMigrations(cursor)
+	_doSeedAuth(cursor)
+
+def _migrateIndexes(cursor: Cursor):
+	ensureIndexes(cursor)
+
+def _migrateRollups(cursor: Cursor):
+	ensureRollups(cursor)
+	rebuildRollups(cursor)
+
+def _migrateRollupTriggers(cursor: Cursor):
+	# Nouvelle version des triggers puis recalcul ; les départs déjà enregistrés (sans table
+	# source) sont conservés tels quels (jour UTC avant la version 8)
+	replaceRollupTriggers(cursor)
+	rebuildRollups(cursor)
+
+def _migrateBannedWordModes(cursor: Cursor):
+	_addMissingColumns('twitch_banned_word', [
+		('whole_word', 'BOOLEAN NOT NULL DEFAULT 0'),
+		('leet', 'BOOLEAN NOT NULL DEFAULT 0'),
+	], cursor)
+
+def _migrateCommandAliases(cursor: Cursor):
+	_addMissingColumns('commande', [('aliases', 'VARCHAR(256) NULL')], cursor)
+
+def _migrateNewTables(cursor: Cursor):
+	"""Tables ajoutées à schema.sql après la version initiale (CREATE TABLE IF NOT EXISTS)."""
+	_doImportSchema(cursor)
+
+
+# (version, description, étape) — ne jamais modifier une étape publiée : ajouter une nouvelle version
+MIGRATIONS = [
+	(1, "Schéma initial", _migrateBaseline),
+	(2, "Index secondaires des colonnes de recherche", _migrateIndexes),
+	(3, "Index de pagination par curseur de l'historique de modération", _migrateIndexes),
+	(4, "Agrégats journaliers de modération et d'activité des membres", _migrateRollups),
+	(5, "Modes des mots interdits (mot entier, leetspeak)", _migrateBannedWordModes),
+	(6, "Alias des commandes personnalisées", _migrateCommandAliases),
+	(7, "Cache des recherches ProtonDB", _migrateNewTables),
+	(8, "Agrégats journaliers en heure locale", _migrateRollupTriggers),
+	(9, "Agrégats journaliers : lignes sources incomplètes (NULL) ignorées ou regroupées", _migrateRollupTriggers),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _currentVersion(cursor: Cursor) -> int:
+	cursor.execute("""
+		CREATE TABLE IF NOT EXISTS schema_version (
+			version INTEGER PRIMARY KEY,
+			description VARCHAR(256) NOT NULL,
+			applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+		)
+	""")
+	return cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def runMigrations(connection: Connection) -> int:
+	"""Applique les migrations en attente dans une transaction unique. Retourne la version du schéma."""
+	start = time.perf_counter()
+	cursor = connection.cursor()
+	version = _currentVersion(cursor)
+	connection.commit()
+	pending = [m for m in MIGRATIONS if m[0] > version]
+	if not pending:
+		logging.info(f"Schéma de la base à jour (version {version}), vérifié en {(time.perf_counter() - start) * 1000:.1f} ms")
+		return version
+
+	try:
+		cursor.execute('BEGIN IMMEDIATE')
+		for step_version, description, step in pending:
+			step_start = time.perf_counter()
+			step(cursor)
+			cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (step_version, description))
+			logging.info(f"Migration {step_version} ({description}) appliquée en {(time.perf_counter() - step_start) * 1000:.1f} ms")
+		connection.commit()
+	except Exception as e:
+		connection.rollback()
+		logging.error(f"lors de la migration de la bdd (version {version} conservée) : {e}")
+		return version
+	logging.info(f"Schéma de la base migré de la version {version} à {LATEST_VERSION} en {(time.perf_counter() - start) * 1000:.1f} ms")
+	return LATEST_VERSION
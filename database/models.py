@@ -13,11 +13,9 @@ ROLE_ORDER = [
 ]
 
 def role_level(role_name: str) -> int:
-	"""Retourne le niveau du rôle depuis la table webapp_role (-1 si inconnu)."""
-	if not role_name:
-		return -1
-	r = WebappRole.query.filter_by(name=role_name).first()
-	return r.level if r else -1
+	"""Retourne le niveau du rôle depuis la table webapp_role (-1 si inconnu), via la matrice en mémoire."""
+	from database.permissions import roleLevel
+	return roleLevel(role_name)
 
 class WebappRole(db.Model):
 	__tablename__ = "webapp_role"
@@ -113,6 +111,7 @@ class Commande(db.Model):
 	trigger = db.Column(db.String(32), unique=True)
 	response = db.Column(db.String(2000))
 	twitch_permission = db.Column(db.String(16), default='viewer')  # viewer | sub | vip | moderator
+	aliases = db.Column(db.String(256))  # autres déclencheurs, séparés par des virgules
 
 class ModerationEvent(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
@@ -176,6 +175,14 @@ class AntiCheatCache(db.Model):
 	updated_at = db.Column(db.DateTime)
 
 
+class ProtonDbCache(db.Model):
+	__tablename__ = 'protondb_cache'
+	kind = db.Column(db.String(16), primary_key=True)
+	key = db.Column(db.String(256), primary_key=True)
+	value = db.Column(db.Text, nullable=False)
+	fetched_at = db.Column(db.DateTime, nullable=False)
+
+
 class YouTubeNotification(db.Model):
 	__tablename__ = 'youtube_notification'
 	id = db.Column(db.Integer, primary_key=True)
@@ -240,6 +247,8 @@ class TwitchBannedWord(db.Model):
 	word = db.Column(db.String(256), unique=True, nullable=False)
 	enabled = db.Column(db.Boolean, default=True)
 	timeout_duration = db.Column(db.Integer, default=60)  # durée du timeout en secondes
+	whole_word = db.Column(db.Boolean, default=False)  # mot entier uniquement
+	leet = db.Column(db.Boolean, default=False)  # comparaison après normalisation leetspeak
 	created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
@@ -260,3 +269,43 @@ class ModShoutboxMessage(db.Model):
 	message = db.Column(db.String(500), nullable=False)
 	created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+
+
+# Agrégats journaliers tenus à jour par triggers (cf. database/rollups.py) : lecture seule côté ORM
+class DailyModerationStat(db.Model):
+	__tablename__ = 'daily_moderation_stats'
+	day = db.Column(db.Date, primary_key=True)
+	type = db.Column(db.String(32), primary_key=True)
+	count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyModerationTarget(db.Model):
+	__tablename__ = 'daily_moderation_target'
+	day = db.Column(db.Date, primary_key=True)
+	discord_id = db.Column(db.String(64), primary_key=True)
+	username = db.Column(db.String(256))
+	count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyModerationStaff(db.Model):
+	__tablename__ = 'daily_moderation_staff'
+	day = db.Column(db.Date, primary_key=True)
+	staff_id = db.Column(db.String(64), primary_key=True)
+	staff_name = db.Column(db.String(256))
+	count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyTwitchModeration(db.Model):
+	__tablename__ = 'daily_twitch_moderation'
+	day = db.Column(db.Date, primary_key=True)
+	action = db.Column(db.String(32), primary_key=True)
+	count = db.Column(db.Integer, nullable=False, default=0)
+	automod_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyMemberStat(db.Model):
+	__tablename__ = 'daily_member_stats'
+	day = db.Column(db.Date, primary_key=True)
+	guild_id = db.Column(db.String(64), primary_key=True)
+	joins = db.Column(db.Integer, nullable=False, default=0)
+	leaves = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,96 @@
+# Pagination par curseur (keyset) de l'historique de modération Discord.
+# Les pages sont lues dans l'ordre (created_at DESC, id DESC) en repartant du dernier événement
+# de la page précédente : chaque page coûte une descente d'index quel que soit le volume de
+# l'historique, là où un OFFSET relirait toutes les lignes précédentes.
+# Les événements sans date (anciennes données) viennent en dernier, comme dans l'ordre DESC de
+# SQLite, et sont parcourus par id décroissant : leur curseur ne porte que l'id.
+# Utilisée par le panneau (/moderation, chargement progressif) et par !listwarn.
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from database.models import ModerationEvent
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def encodeCursor(event: ModerationEvent) -> str:
+	"""Curseur opaque désignant la position juste après cet événement."""
+	raw = f"{event.created_at.isoformat() if event.created_at else ''}|{event.id}"
+	return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decodeCursor(cursor: str) -> tuple[datetime | None, int] | None:
+	"""(created_at, id) du curseur (created_at None pour un événement sans date), None s'il est absent ou invalide."""
+	if not cursor:
+		return None
+	try:
+		raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+		created_at, event_id = raw.rsplit('|', 1)
+		return (datetime.fromisoformat(created_at) if created_at else None), int(event_id)
+	except (ValueError, UnicodeDecodeError):
+		return None
+
+
+def _likePrefix(value: str) -> str:
+	return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _filtered(query, event_type: str = None, user: str = None, staff: str = None,
+		date_from: datetime = None, date_to: datetime = None):
+	if event_type:
+		# Les avertissements sont enregistrés sous 'warning' (bot) ou 'warn' (anciennes données)
+		if event_type in ('warn', 'warning'):
+			query = query.filter(ModerationEvent.type.in_(('warn', 'warning')))
+		else:
+			query = query.filter(ModerationEvent.type == event_type)
+	# Identifiant Discord : égalité (indexée) ; sinon début du pseudo
+	if user:
+		if user.isdigit():
+			query = query.filter(ModerationEvent.discord_id == user)
+		else:
+			query = query.filter(ModerationEvent.username.like(_likePrefix(user), escape='\\'))
+	if staff:
+		if staff.isdigit():
+			query = query.filter(ModerationEvent.staff_id == staff)
+		else:
+			query = query.filter(ModerationEvent.staff_name.like(_likePrefix(staff), escape='\\'))
+	if date_from:
+		query = query.filter(ModerationEvent.created_at >= date_from)
+	if date_to:
+		query = query.filter(ModerationEvent.created_at < date_to)
+	return query
+
+
+def _undated(query, before_id: int = None):
+	query = query.filter(ModerationEvent.created_at.is_(None))
+	if before_id is not None:
+		query = query.filter(ModerationEvent.id < before_id)
+	return query.order_by(ModerationEvent.id.desc())
+
+
+def queryModerationEvents(cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> tuple[list, str | None]:
+	"""Page d'événements (du plus récent au plus ancien) après le curseur donné.
+	Filtres : event_type, user, staff (identifiant Discord ou début du nom), date_from, date_to.
+	Retourne (événements, curseur de la page suivante ou None)."""
+	limit = max(1, min(limit, MAX_PAGE_SIZE))
+	query = _filtered(ModerationEvent.query, **filters)
+	position = decodeCursor(cursor)
+	ordered = (ModerationEvent.created_at.desc(), ModerationEvent.id.desc())
+	# Une ligne de plus que demandé suffit à savoir s'il existe une page suivante
+	if position is None:
+		events = query.order_by(*ordered).limit(limit + 1).all()
+	elif position[0] is None:
+		events = _undated(query, position[1]).limit(limit + 1).all()
+	else:
+		# La comparaison de tuples exclut les lignes sans date : elles sont lues à la suite
+		dated = query.filter(tuple_(ModerationEvent.created_at, ModerationEvent.id) < tuple_(*position))
+		events = dated.order_by(*ordered).limit(limit + 1).all()
+		if len(events) <= limit:
+			events += _undated(query).limit(limit + 1 - len(events)).all()
+	if len(events) > limit:
+		events = events[:limit]
+		return events, encodeCursor(events[-1])
+	return events, None
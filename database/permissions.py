@@ -0,0 +1,122 @@
+# Matrice rôles / permissions de pages et cache des utilisateurs connectés, en mémoire.
+# La matrice est rechargée paresseusement après un commit touchant webapp_role ou
+# webapp_page_permission ; les utilisateurs sont gardés USER_CACHE_TTL secondes (et invalidés
+# après un commit qui les modifie). Une page du panneau ne coûte ainsi aucune requête d'authentification.
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import db
+from database.models import WebappRole, PagePermission, WebappUser
+
+USER_CACHE_TTL = 30
+
+_lock = threading.Lock()
+_matrix: dict | None = None
+_generation = 0
+_users: dict = {}
+_stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'invalidations': 0, 'user_hits': 0, 'user_misses': 0}
+
+
+def _loadMatrix() -> dict:
+	global _matrix
+	with _lock:
+		if _matrix is not None:
+			return _matrix
+		generation = _generation
+	roles = dict(db.session.query(WebappRole.name, WebappRole.level).all())
+	pages = {key: (min_level, write_level) for key, min_level, write_level in
+		db.session.query(PagePermission.page_key, PagePermission.min_level, PagePermission.write_level).all()}
+	matrix = {'roles': roles, 'pages': pages}
+	with _lock:
+		_stats['reloads'] += 1
+		if generation == _generation:
+			_matrix = matrix
+	return matrix
+
+
+def _getMatrix() -> dict:
+	matrix = _matrix
+	if matrix is not None:
+		_stats['hits'] += 1
+		return matrix
+	_stats['misses'] += 1
+	return _loadMatrix()
+
+
+def roleLevel(role_name: str) -> int:
+	"""Niveau du rôle (-1 si inconnu)."""
+	if not role_name:
+		return -1
+	return _getMatrix()['roles'].get(role_name, -1)
+
+
+def pageMinLevel(page_key: str, for_write: bool = False) -> int:
+	"""Niveau minimum requis pour la page (lecture ou écriture), 0 si la page n'est pas restreinte."""
+	perm = _getMatrix()['pages'].get(page_key)
+	if perm is None:
+		return 0
+	min_level, write_level = perm
+	if for_write and write_level is not None:
+		return write_level
+	return min_level
+
+
+def getUser(user_id: int) -> WebappUser | None:
+	"""Utilisateur détaché de la session, servi depuis le cache tant que son TTL n'est pas écoulé."""
+	now = time.monotonic()
+	entry = _users.get(user_id)
+	if entry is not None and entry[0] > now:
+		_stats['user_hits'] += 1
+		return entry[1]
+	_stats['user_misses'] += 1
+	with _lock:
+		generation = _generation
+	user = db.session.get(WebappUser, user_id)
+	if user is not None:
+		db.session.expunge(user)
+	with _lock:
+		if generation == _generation:
+			_users[user_id] = (now + USER_CACHE_TTL, user)
+	return user
+
+
+def invalidatePermissionCache():
+	global _matrix, _generation
+	with _lock:
+		_matrix = None
+		_users.clear()
+		_generation += 1
+		_stats['invalidations'] += 1
+
+
+def getPermissionCacheStats() -> dict:
+	with _lock:
+		stats = dict(_stats)
+		stats['roles'] = len(_matrix['roles']) if _matrix is not None else 0
+		stats['pages'] = len(_matrix['pages']) if _matrix is not None else 0
+		stats['users'] = len(_users)
+	total = stats['hits'] + stats['misses']
+	stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else 0.0
+	return stats
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackPermissionChanges(session, flush_context, instances):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if isinstance(obj, (WebappRole, PagePermission, WebappUser)):
+			session.info['permissions_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidateAfterCommit(session):
+	if session.info.pop('permissions_changed', False):
+		invalidatePermissionCache()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('permissions_changed', None)
@@ -0,0 +1,196 @@
+# Rétention des tables à croissance continue : suppression par âge et/ou nombre de lignes,
+# archivage optionnel en JSONL compressé (instance/archives) avant suppression, puis
+# PRAGMA incremental_vacuum et checkpoint du WAL pour garder le fichier et les index compacts.
+# Exécutée périodiquement par un thread dédié (cf. run-web.py). Chaque lot ouvre sa propre
+# connexion hors du pool de l'écrivain (backgroundConnection) : les écritures des bots et de
+# l'interface passent entre deux lots.
+# incremental_vacuum n'est lancé que sur une base déjà en auto_vacuum=INCREMENTAL (bases neuves,
+# cf. database/__init__.py). Une base plus ancienne n'est jamais convertie ici : la conversion
+# demande un VACUUM complet, à lancer à la main, application arrêtée (cf. README).
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlite3 import Connection, Cursor
+
+from webapp import webapp
+from database import backgroundConnection
+from database.helpers import ConfigurationHelper
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'archives')
+RETENTION_INTERVAL = 6 * 3600
+RETENTION_FIRST_DELAY = 10 * 60
+RETENTION_BATCH_SIZE = 2000
+RETENTION_VACUUM_PAGES = 10000
+
+# table -> colonne date (None : pas d'âge), âge max en jours, nombre max de lignes, archivage.
+# Surchargeable via la configuration : retention_<table>_days / retention_<table>_rows (0 = défaut).
+POLICIES = {
+	'twitch_moderation_log': {'date_column': 'created_at', 'days': 90, 'rows': 200000, 'archive': True},
+	'mod_shoutbox_message': {'date_column': 'created_at', 'days': 30, 'rows': 10000, 'archive': True},
+	'youtube_video_history': {'date_column': 'detected_at', 'days': 180, 'rows': 0, 'archive': True},
+	'member_invites': {'date_column': 'join_date', 'days': 730, 'rows': 0, 'archive': True},
+	# Pas de date : on conserve les entrées les plus récentes (le flux n'en publie que quelques dizaines)
+	'freeloot_entry': {'date_column': None, 'days': 0, 'rows': 5000, 'archive': False},
+	# Cache : une entrée plus vieille que sa durée de service périmé n'est plus jamais lue
+	'protondb_cache': {'date_column': 'fetched_at', 'days': 30, 'rows': 50000, 'archive': False},
+}
+
+_lock = threading.Lock()
+_lastRun: dict = {}
+
+
+def _policy(table: str, defaults: dict) -> dict:
+	helper = ConfigurationHelper()
+	policy = dict(defaults)
+	policy['days'] = helper.getIntValue(f'retention_{table}_days') or defaults['days']
+	policy['rows'] = helper.getIntValue(f'retention_{table}_rows') or defaults['rows']
+	return policy
+
+
+def _expiryCondition(cursor: Cursor, table: str, policy: dict) -> tuple[str, tuple] | None:
+	conditions, params = [], []
+	if policy['date_column'] and policy['days'] > 0:
+		# Comparaison textuelle : couvre les formats SQLAlchemy, CURRENT_TIMESTAMP et ISO avec fuseau
+		cutoff = (datetime.now() - timedelta(days=policy['days'])).strftime('%Y-%m-%d %H:%M:%S')
+		conditions.append(f"{policy['date_column']} < ?")
+		params.append(cutoff)
+	if policy['rows'] > 0:
+		row = cursor.execute(f'SELECT rowid FROM {table} ORDER BY rowid DESC LIMIT 1 OFFSET ?', (policy['rows'] - 1,)).fetchone()
+		if row:
+			conditions.append('rowid < ?')
+			params.append(row[0])
+	if not conditions:
+		return None
+	return ' OR '.join(conditions), tuple(params)
+
+
+def _purgeBatch(connection: Connection, table: str, condition: str, params: tuple, archive_to) -> int:
+	cursor = connection.cursor()
+	cursor.execute(f'SELECT rowid AS _rowid, * FROM {table} WHERE {condition} ORDER BY rowid LIMIT {RETENTION_BATCH_SIZE}', params)
+	columns = [c[0] for c in cursor.description]
+	rows = cursor.fetchall()
+	if not rows:
+		return 0
+	if archive_to is not None:
+		archive = archive_to()
+		for row in rows:
+			archive.write(json.dumps(dict(zip(columns[1:], row[1:])), ensure_ascii=False, default=str) + '\n')
+		archive.flush()
+	cursor.executemany(f'DELETE FROM {table} WHERE rowid = ?', ((row[0],) for row in rows))
+	connection.commit()
+	return len(rows)
+
+
+def _purgeTable(table: str, policy: dict) -> tuple[int, str | None]:
+	with backgroundConnection() as connection:
+		expiry = _expiryCondition(connection.cursor(), table, policy)
+	if expiry is None:
+		return 0, None
+	condition, params = expiry
+	deleted = 0
+	archive_path = None
+	archive = None
+
+	def archive_to():
+		nonlocal archive, archive_path
+		if archive is None:
+			os.makedirs(ARCHIVE_DIR, exist_ok=True)
+			archive_path = os.path.join(ARCHIVE_DIR, f"{table}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+			archive = gzip.open(archive_path, 'at', encoding='utf-8')
+		return archive
+
+	try:
+		while True:
+			# Un lot par transaction et par connexion : les bots ne sont jamais bloqués plus d'un lot
+			with backgroundConnection() as connection:
+				try:
+					count = _purgeBatch(connection, table, condition, params, archive_to if policy['archive'] else None)
+				except Exception:
+					connection.rollback()
+					raise
+			if not count:
+				break
+			deleted += count
+	finally:
+		if archive is not None:
+			archive.close()
+	return deleted, archive_path
+
+
+def _purgeExpiredPermits() -> int:
+	with backgroundConnection() as connection:
+		cursor = connection.cursor()
+		cursor.execute('DELETE FROM twitch_permit WHERE expires_at < ?', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+		connection.commit()
+		return cursor.rowcount
+
+
+def _compact() -> dict:
+	with backgroundConnection() as connection:
+		cursor = connection.cursor()
+		freed = 0
+		incremental = cursor.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+		if incremental:
+			freelist = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+			cursor.execute(f'PRAGMA incremental_vacuum({RETENTION_VACUUM_PAGES})').fetchall()
+			connection.commit()
+			freed = min(freelist, RETENTION_VACUUM_PAGES)
+		busy, log_frames, checkpointed = cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+	return {
+		'incremental_vacuum': incremental,
+		'freed_pages': freed,
+		'checkpoint': {'busy': busy, 'log_frames': log_frames, 'checkpointed': checkpointed},
+	}
+
+
+def runRetention() -> dict:
+	"""Applique les politiques de rétention puis compacte la base. Retourne le résumé de l'exécution."""
+	with _lock:
+		start = time.perf_counter()
+		summary = {'started_at': datetime.now(timezone.utc).isoformat(), 'deleted': {}, 'archives': [], 'errors': []}
+		with webapp.app_context():
+			policies = {table: _policy(table, defaults) for table, defaults in POLICIES.items()}
+		for table, policy in policies.items():
+			try:
+				deleted, archive_path = _purgeTable(table, policy)
+			except Exception as e:
+				logging.error(f"Rétention {table} : {e}")
+				summary['errors'].append(f'{table}: {e}')
+				continue
+			summary['deleted'][table] = deleted
+			if archive_path:
+				summary['archives'].append(os.path.basename(archive_path))
+		try:
+			summary['deleted']['twitch_permit'] = _purgeExpiredPermits()
+			summary.update(_compact())
+		except Exception as e:
+			logging.error(f"Rétention (compactage) : {e}")
+			summary['errors'].append(str(e))
+		summary['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+		total = sum(summary['deleted'].values())
+		logging.info(f"Rétention : {total} ligne(s) supprimée(s) en {summary['duration_ms']} ms {summary['deleted']}")
+		_lastRun.clear()
+		_lastRun.update(summary)
+		return summary
+
+
+def runRetentionForever():
+	time.sleep(RETENTION_FIRST_DELAY)
+	while True:
+		with webapp.app_context():
+			enabled = ConfigurationHelper().getValue('retention_enable')
+		# Activée par défaut : seule une désactivation explicite l'arrête
+		if enabled is None or enabled:
+			try:
+				runRetention()
+			except Exception as e:
+				logging.error(f"Échec de la rétention des données : {e}")
+		time.sleep(RETENTION_INTERVAL)
+
+
+def getRetentionStats() -> dict:
+	return dict(_lastRun)
@@ -0,0 +1,140 @@
+# Tables d'agrégats journaliers (rollups) pour le tableau de bord et les statistiques de modération.
+# Elles sont tenues à jour par des triggers SQLite à chaque écriture dans les tables sources :
+# l'ORM, l'écriture différée (executemany) et les scripts passent tous par là. Les lectures du
+# panneau portent ainsi sur quelques lignes par jour au lieu de l'historique complet.
+# Les jours sont ceux de l'heure locale, comme date.today() dans le tableau de bord : les dates
+# stockées en UTC (moderation_event, member_invites) sont converties, twitch_moderation_log est
+# déjà en heure locale.
+# Module sans dépendance Flask : utilisé par les migrations.
+import logging
+from sqlite3 import Cursor
+
+ROLLUP_TABLES = [
+	"""CREATE TABLE IF NOT EXISTS daily_moderation_stats (
+		day DATE NOT NULL,
+		type VARCHAR(32) NOT NULL,
+		count INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (day, type)
+	)""",
+	"""CREATE TABLE IF NOT EXISTS daily_moderation_target (
+		day DATE NOT NULL,
+		discord_id VARCHAR(64) NOT NULL,
+		username VARCHAR(256),
+		count INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (day, discord_id)
+	)""",
+	"""CREATE TABLE IF NOT EXISTS daily_moderation_staff (
+		day DATE NOT NULL,
+		staff_id VARCHAR(64) NOT NULL,
+		staff_name VARCHAR(256),
+		count INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (day, staff_id)
+	)""",
+	"""CREATE TABLE IF NOT EXISTS daily_twitch_moderation (
+		day DATE NOT NULL,
+		action VARCHAR(32) NOT NULL,
+		count INTEGER NOT NULL DEFAULT 0,
+		automod_count INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (day, action)
+	)""",
+	"""CREATE TABLE IF NOT EXISTS daily_member_stats (
+		day DATE NOT NULL,
+		guild_id VARCHAR(64) NOT NULL,
+		joins INTEGER NOT NULL DEFAULT 0,
+		leaves INTEGER NOT NULL DEFAULT 0,
+		PRIMARY KEY (day, guild_id)
+	)""",
+]
+
+# Jour local d'une date enregistrée en UTC
+def _localDay(column: str) -> str:
+	return f"date({column}, 'localtime')"
+
+# Les colonnes des tables sources acceptent NULL (anciennes bases) alors que les clés des agrégats
+# ne le peuvent pas : une clé absente est comptée sous '', une ligne sans date n'est pas comptée
+# (sans quoi le trigger ferait échouer l'écriture source, et le recalcul la migration).
+def _key(column: str) -> str:
+	return f"COALESCE({column}, '')"
+
+# Ajout (sign = 1) ou retrait (sign = -1) d'un événement de modération Discord dans les agrégats
+def _moderationEventSql(row: str, sign: int) -> str:
+	day = _localDay(f'{row}.created_at')
+	return f"""
+		INSERT INTO daily_moderation_stats (day, type, count) SELECT {day}, {_key(f'{row}.type')}, {sign} WHERE {day} IS NOT NULL
+			ON CONFLICT (day, type) DO UPDATE SET count = count + {sign};
+		INSERT INTO daily_moderation_target (day, discord_id, username, count) SELECT {day}, {_key(f'{row}.discord_id')}, {row}.username, {sign} WHERE {day} IS NOT NULL
+			ON CONFLICT (day, discord_id) DO UPDATE SET count = count + {sign}, username = excluded.username;
+		INSERT INTO daily_moderation_staff (day, staff_id, staff_name, count) SELECT {day}, {_key(f'{row}.staff_id')}, {row}.staff_name, {sign} WHERE {day} IS NOT NULL
+			ON CONFLICT (day, staff_id) DO UPDATE SET count = count + {sign}, staff_name = excluded.staff_name;"""
+
+# Journaux Twitch et invitations : pas de trigger de suppression, les agrégats conservent
+# l'historique au-delà de la rétention des tables sources (cf. database/retention.py).
+ROLLUP_TRIGGERS = [
+	f"""CREATE TRIGGER IF NOT EXISTS rollup_moderation_event_insert AFTER INSERT ON moderation_event
+	BEGIN{_moderationEventSql('NEW', 1)}
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS rollup_moderation_event_delete AFTER DELETE ON moderation_event
+	BEGIN{_moderationEventSql('OLD', -1)}
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS rollup_moderation_event_update AFTER UPDATE OF type, discord_id, staff_id, created_at ON moderation_event
+	BEGIN{_moderationEventSql('OLD', -1)}{_moderationEventSql('NEW', 1)}
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS rollup_twitch_moderation_log_insert AFTER INSERT ON twitch_moderation_log
+	BEGIN
+		INSERT INTO daily_twitch_moderation (day, action, count, automod_count)
+			SELECT date(NEW.created_at), {_key('NEW.action')}, 1, NEW.moderator IS 'AutoMod' WHERE date(NEW.created_at) IS NOT NULL
+			ON CONFLICT (day, action) DO UPDATE SET count = count + 1, automod_count = automod_count + excluded.automod_count;
+	END""",
+	f"""CREATE TRIGGER IF NOT EXISTS rollup_member_invites_insert AFTER INSERT ON member_invites
+	BEGIN
+		INSERT INTO daily_member_stats (day, guild_id, joins)
+			SELECT {_localDay('NEW.join_date')}, {_key('NEW.guild_id')}, 1 WHERE {_localDay('NEW.join_date')} IS NOT NULL
+			ON CONFLICT (day, guild_id) DO UPDATE SET joins = joins + 1;
+	END""",
+]
+
+# Départs : aucune table source, enregistrés directement (via l'écriture différée) par le bot Discord,
+# avec le jour local du départ
+UPSERT_MEMBER_LEAVE = """INSERT INTO daily_member_stats (day, guild_id, leaves) VALUES (?, ?, 1)
+	ON CONFLICT (day, guild_id) DO UPDATE SET leaves = leaves + 1"""
+
+_BACKFILL = [
+	('daily_moderation_stats', f"""INSERT INTO daily_moderation_stats (day, type, count)
+		SELECT {_localDay('created_at')}, {_key('type')}, COUNT(*) FROM moderation_event
+		WHERE {_localDay('created_at')} IS NOT NULL GROUP BY 1, 2"""),
+	('daily_moderation_target', f"""INSERT INTO daily_moderation_target (day, discord_id, username, count)
+		SELECT {_localDay('created_at')}, {_key('discord_id')}, MAX(username), COUNT(*) FROM moderation_event
+		WHERE {_localDay('created_at')} IS NOT NULL GROUP BY 1, 2"""),
+	('daily_moderation_staff', f"""INSERT INTO daily_moderation_staff (day, staff_id, staff_name, count)
+		SELECT {_localDay('created_at')}, {_key('staff_id')}, MAX(staff_name), COUNT(*) FROM moderation_event
+		WHERE {_localDay('created_at')} IS NOT NULL GROUP BY 1, 2"""),
+	('daily_twitch_moderation', f"""INSERT INTO daily_twitch_moderation (day, action, count, automod_count)
+		SELECT date(created_at), {_key('action')}, COUNT(*), SUM(moderator IS 'AutoMod') FROM twitch_moderation_log
+		WHERE date(created_at) IS NOT NULL GROUP BY 1, 2"""),
+	('daily_member_stats', f"""INSERT INTO daily_member_stats (day, guild_id, joins)
+		SELECT {_localDay('join_date')}, {_key('guild_id')}, COUNT(*) FROM member_invites
+		WHERE {_localDay('join_date')} IS NOT NULL GROUP BY 1, 2"""),
+]
+
+def ensureRollups(cursor: Cursor):
+	"""Crée les tables d'agrégats et leurs triggers."""
+	for sql in ROLLUP_TABLES + ROLLUP_TRIGGERS:
+		cursor.execute(sql)
+
+
+def replaceRollupTriggers(cursor: Cursor):
+	"""Recrée les triggers d'agrégats (CREATE TRIGGER IF NOT EXISTS ne remplace pas une ancienne version)."""
+	for sql in ROLLUP_TRIGGERS:
+		cursor.execute(f'DROP TRIGGER IF EXISTS {sql.split()[5]}')
+	ensureRollups(cursor)
+
+
+def rebuildRollups(cursor: Cursor):
+	"""Recalcule les agrégats depuis les tables sources (les départs, sans source, sont conservés)."""
+	leaves = cursor.execute('SELECT day, guild_id, leaves FROM daily_member_stats WHERE leaves > 0').fetchall()
+	for table, sql in _BACKFILL:
+		cursor.execute(f'DELETE FROM {table}')
+		cursor.execute(sql)
+		logging.info(f"Agrégats {table} recalculés ({cursor.rowcount} ligne(s))")
+	cursor.executemany("""INSERT INTO daily_member_stats (day, guild_id, leaves) VALUES (?, ?, ?)
+		ON CONFLICT (day, guild_id) DO UPDATE SET leaves = excluded.leaves""", leaves)
@@ -56,7 +56,8 @@ CREATE TABLE IF NOT EXISTS `commande` (
 	`twitch_enable` BOOLEAN NOT NULL DEFAULT TRUE,
 	`trigger` VARCHAR(16) UNIQUE NOT NULL,
 	`response` VARCHAR(2000) NOT NULL,
-	`twitch_permission` VARCHAR(16) DEFAULT 'viewer'
+	`twitch_permission` VARCHAR(16) DEFAULT 'viewer',
+	`aliases` VARCHAR(256) NULL
 );
 
 CREATE TABLE IF NOT EXISTS `moderation_event` (
@@ -130,6 +131,8 @@ CREATE TABLE IF NOT EXISTS `twitch_banned_word` (
 	`word` VARCHAR(256) UNIQUE NOT NULL,
 	`enabled` BOOLEAN NOT NULL DEFAULT TRUE,
 	`timeout_duration` INTEGER NOT NULL DEFAULT 60,
+	`whole_word` BOOLEAN NOT NULL DEFAULT 0,
+	`leet` BOOLEAN NOT NULL DEFAULT 0,
 	`created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -229,3 +232,11 @@ CREATE TABLE IF NOT EXISTS `mod_shoutbox_message` (
 	`message` VARCHAR(500) NOT NULL,
 	`created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS `protondb_cache` (
+	`kind` VARCHAR(16) NOT NULL,
+	`key` VARCHAR(256) NOT NULL,
+	`value` TEXT NOT NULL,
+	`fetched_at` DATETIME NOT NULL,
+	PRIMARY KEY (`kind`, `key`)
+);
@@ -0,0 +1,40 @@
+# Session SQLAlchemy qui sépare lectures et écritures entre deux moteurs SQLite (WAL) :
+# - les lectures (vues GET du panneau, polling, lectures des bots) passent par le moteur
+#   lecture seule (bind READ_ONLY_BIND, mode=ro + query_only) ;
+# - flush, INSERT/UPDATE/DELETE et toute requête d'une transaction ayant déjà écrit passent
+#   par le moteur par défaut, à écrivain unique.
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_ONLY_BIND = 'readonly'
+
+_WRITE_KEYWORDS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+
+def _isWriteClause(clause) -> bool:
+	if clause is None:
+		return False
+	if getattr(clause, 'is_dml', False) or getattr(clause, 'is_ddl', False):
+		return True
+	text = getattr(clause, 'text', None)
+	return isinstance(text, str) and text.lstrip().upper().startswith(_WRITE_KEYWORDS)
+
+
+class RoutingSession(Session):
+	def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+		if bind is not None:
+			return bind
+		reader = self._db.engines.get(READ_ONLY_BIND)
+		if reader is None:
+			return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+		# Une fois la transaction en écriture, on reste sur l'écrivain pour relire ses propres écritures
+		if self._flushing or self.info.get('writing') or _isWriteClause(clause):
+			self.info['writing'] = True
+			return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+		return reader
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _endWriting(session, transaction):
+	if transaction.parent is None:
+		session.info.pop('writing', None)
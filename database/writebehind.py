@@ -0,0 +1,202 @@
+# Écriture différée des tables de journal à fort volume (twitch_moderation_log, member_invites)
+# et des permis de lien Twitch (twitch_permit), ainsi que du cache ProtonDB (protondb_cache).
+# Les insertions sont mises en file puis regroupées en transactions executemany, vidées dès que
+# la file atteint WRITE_BEHIND_BATCH_SIZE lignes ou toutes les WRITE_BEHIND_INTERVAL secondes.
+# La file est vidée à l'arrêt (atexit, ou flushAndStop depuis le gestionnaire de signal).
+# Un lot refusé à cause d'une de ses lignes (contrainte, paramètres) est réécrit ligne par ligne :
+# seules les lignes fautives sont abandonnées. Base verrouillée ou indisponible : le lot entier
+# est remis en file.
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import groupby
+
+from database import backgroundConnection
+
+WRITE_BEHIND_BATCH_SIZE = 200
+WRITE_BEHIND_INTERVAL = 0.25
+_MAX_ATTEMPTS = 3
+# Base verrouillée ou indisponible : le lot entier est réessayé plus tard. Toute autre erreur
+# SQLite vient d'une ligne (contrainte, requête, paramètres) : la réessayer ne changerait rien.
+_UNAVAILABLE = ('locked', 'busy', 'disk i/o', 'unable to open', 'readonly', 'disk is full')
+
+
+def _isRowError(error: Exception) -> bool:
+	if not isinstance(error, sqlite3.Error):
+		return False
+	message = str(error).lower()
+	return not any(reason in message for reason in _UNAVAILABLE)
+
+INSERT_TWITCH_MODERATION_LOG = 'INSERT INTO twitch_moderation_log (action, moderator, target, details, created_at) VALUES (?, ?, ?, ?, ?)'
+INSERT_TWITCH_PERMIT = 'INSERT INTO twitch_permit (username, expires_at) VALUES (?, ?)'
+DELETE_TWITCH_PERMIT = 'DELETE FROM twitch_permit WHERE username = ?'
+UPSERT_PROTONDB_CACHE = 'INSERT OR REPLACE INTO protondb_cache (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)'
+INSERT_MEMBER_INVITE = 'INSERT INTO member_invites (user_id, guild_id, invite_code, inviter_name, join_date) VALUES (?, ?, ?, ?, ?)'
+
+
+def sqlDateTime(value: datetime) -> str:
+	"""Format de stockage des DateTime SQLAlchemy sous SQLite."""
+	return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class WriteBehindQueue:
+	def __init__(self, batch_size: int = WRITE_BEHIND_BATCH_SIZE, interval: float = WRITE_BEHIND_INTERVAL):
+		self._batch_size = batch_size
+		self._interval = interval
+		self._queue = deque()
+		self._condition = threading.Condition()
+		self._flush_lock = threading.Lock()
+		self._thread = None
+		self._stopped = False
+		self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0,
+			'max_depth': 0, 'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0,
+			'last_wait_ms': 0.0, 'max_wait_ms': 0.0}
+
+	def enqueue(self, sql: str, params: tuple):
+		with self._condition:
+			self._queue.append((sql, params, 0, time.monotonic()))
+			self._stats['enqueued'] += 1
+			depth = len(self._queue)
+			if depth > self._stats['max_depth']:
+				self._stats['max_depth'] = depth
+			stopped = self._stopped
+			if not stopped:
+				self._ensureThread()
+				if depth >= self._batch_size:
+					self._condition.notify()
+		if stopped:
+			# Après l'arrêt du thread : écriture immédiate pour ne rien perdre
+			self.flush()
+
+	def _ensureThread(self):
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+			self._thread.start()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				if not self._stopped and len(self._queue) < self._batch_size:
+					self._condition.wait(self._interval)
+				stopped = self._stopped
+			if stopped:
+				return
+			if not self.flush():
+				# Base indisponible : on laisse passer un intervalle avant de réessayer
+				time.sleep(self._interval)
+
+	def flush(self) -> bool:
+		"""Écrit toutes les lignes en attente. Retourne False si un lot a échoué (il reste en file)."""
+		with self._flush_lock:
+			while True:
+				with self._condition:
+					if not self._queue:
+						return True
+					batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+				if not self._writeBatch(batch):
+					return False
+
+	def _writeBatch(self, batch: list) -> bool:
+		# Regroupement par suites consécutives de la même requête : l'ordre des écritures est
+		# conservé (un permis accordé puis consommé dans le même lot reste supprimé)
+		grouped = [(sql, [item[1] for item in items]) for sql, items in groupby(batch, key=lambda item: item[0])]
+		start = time.perf_counter()
+		failed = []
+		try:
+			with backgroundConnection() as connection:
+				try:
+					cursor = connection.cursor()
+					for sql, rows in grouped:
+						cursor.executemany(sql, rows)
+					connection.commit()
+				except Exception as e:
+					connection.rollback()
+					if not _isRowError(e):
+						raise
+					failed = self._writeRows(connection, batch)
+		except Exception as e:
+			self._requeue(batch, e)
+			return False
+		elapsed = (time.perf_counter() - start) * 1000
+		# Délai entre la mise en file de la ligne la plus ancienne du lot et son écriture
+		wait = (time.monotonic() - min(item[3] for item in batch)) * 1000
+		with self._condition:
+			self._stats['written'] += len(batch) - len(failed)
+			self._stats['dropped'] += len(failed)
+			if failed:
+				self._stats['errors'] += 1
+			self._stats['batches'] += 1
+			self._stats['last_flush_ms'] = elapsed
+			self._stats['total_flush_ms'] += elapsed
+			if elapsed > self._stats['max_flush_ms']:
+				self._stats['max_flush_ms'] = elapsed
+			self._stats['last_wait_ms'] = wait
+			if wait > self._stats['max_wait_ms']:
+				self._stats['max_wait_ms'] = wait
+		return True
+
+	def _writeRows(self, connection: sqlite3.Connection, batch: list) -> list:
+		"""Réécrit le lot ligne par ligne dans une transaction ; retourne les lignes refusées (abandonnées)."""
+		failed = []
+		try:
+			cursor = connection.cursor()
+			cursor.execute('BEGIN')
+			for item in batch:
+				cursor.execute('SAVEPOINT write_behind_row')
+				try:
+					cursor.execute(item[0], item[1])
+				except Exception as e:
+					if not _isRowError(e):
+						raise
+					cursor.execute('ROLLBACK TO write_behind_row')
+					failed.append((item, e))
+				cursor.execute('RELEASE write_behind_row')
+			connection.commit()
+		except Exception:
+			connection.rollback()
+			raise
+		for (sql, params, _, _), error in failed:
+			logging.error(f"Écriture différée : ligne abandonnée ({sql.split('(')[0].strip()} {params}) : {error}")
+		return failed
+
+	def _requeue(self, batch: list, error: Exception):
+		retry = [(sql, params, attempts + 1, queued_at) for sql, params, attempts, queued_at in batch if attempts + 1 < _MAX_ATTEMPTS]
+		dropped = len(batch) - len(retry)
+		with self._condition:
+			self._stats['errors'] += 1
+			self._stats['dropped'] += dropped
+			self._queue.extendleft(reversed(retry))
+		if dropped:
+			logging.error(f"Écriture différée : {dropped} ligne(s) abandonnée(s) après {_MAX_ATTEMPTS} essais : {error}")
+		else:
+			logging.warning(f"Écriture différée : échec d'un lot de {len(batch)} ligne(s), nouvel essai : {error}")
+
+	def flushAndStop(self, timeout: float = 10):
+		"""Arrête le thread d'écriture après avoir vidé la file."""
+		with self._condition:
+			self._stopped = True
+			self._condition.notify()
+			thread = self._thread
+		if thread is not None and thread is not threading.current_thread():
+			thread.join(timeout)
+		for _ in range(_MAX_ATTEMPTS):
+			if self.flush():
+				break
+
+	def getStats(self) -> dict:
+		with self._condition:
+			stats = dict(self._stats)
+			stats['depth'] = len(self._queue)
+		total = stats.pop('total_flush_ms')
+		stats['avg_flush_ms'] = round(total / stats['batches'], 3) if stats['batches'] else 0.0
+		for key in ('last_flush_ms', 'max_flush_ms', 'last_wait_ms', 'max_wait_ms'):
+			stats[key] = round(stats[key], 3)
+		return stats
+
+
+writeBehind = WriteBehindQueue()
+atexit.register(writeBehind.flushAndStop)
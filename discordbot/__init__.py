@@ -5,8 +5,10 @@ import random
 
 from webapp import webapp
 from database import db
+from database.executor import runQuery
 from database.helpers import ConfigurationHelper
-from database.models import Configuration, Humeur, Commande
+from database.models import Configuration, Humeur
+from database.commands import getRouter, loadRouter
 from discord import Message, TextChannel, Member, VoiceChannel, app_commands
 from discordbot.humblebundle import checkHumbleBundleAndNotify
 from discordbot.freeloot import checkFreeLootAndNotify
@@ -29,7 +31,8 @@ from discordbot.welcome import sendWelcomeMessage, sendLeaveMessage, updateInvit
 from discordbot.patreon import checkPatreonPosts
 from discordbot.youtube import checkYouTubeVideos
 from discordbot.auto_rooms import on_voice_state_update_auto_rooms, on_raw_reaction_add_auto_rooms, on_message_auto_rooms, cleanup_orphaned_auto_rooms
-from protondb import searhProtonDb
+from discordbot.protondb import protondb_command, buildProtonDbEmbed, notFoundMessage, MAX_GAMES, SEARCH_FAILED_MESSAGE
+from protondb import searchProtonDb
 
 class DiscordBot(discord.Client):
 	def __init__(self, *, intents: discord.Intents):
@@ -40,6 +43,8 @@ class DiscordBot(discord.Client):
 	async def setup_hook(self):
 		self.tree.add_command(transfer_message_context_menu)
 		logging.info("Commande contextuelle 'Déplacer le message' ajoutée au CommandTree")
+		self.tree.add_command(protondb_command)
+		logging.info("Commande slash '/protondb' ajoutée au CommandTree")
 	
 	async def on_ready(self):
 		logging.info(f'Connecté en tant que {self.user} (ID: {self.user.id})')
@@ -88,7 +93,7 @@ class DiscordBot(discord.Client):
 			if bot_status.get("twitch_is_live") or bot_status.get("discord_streaming_activity"):
 				await asyncio.sleep(60)
 				continue
-			humeurs = Humeur.query.all()
+			humeurs = await runQuery(lambda: Humeur.query.all())
 			if len(humeurs)>0 :
 				humeur = random.choice(humeurs)
 				if humeur != None: 
@@ -223,7 +228,8 @@ async def on_message(message: Message):
 		await handle_staff_help_command(message, bot)
 		return
 	
-	commande = Commande.query.filter_by(discord_enable=True, trigger=command_name).first()
+	router = getRouter() or await runQuery(loadRouter)
+	commande = router.find('discord', command_name)
 	if commande:
 		try:
 			await message.channel.send(commande.response, suppress_embeds=True)
@@ -258,75 +264,25 @@ async def on_message(message: Message):
 				logging.error(f"Échec de la gestion du message d'aide ProtonDB : {e}")
 			return
 		
+		# Indicateur de saisie plutôt qu'un message « recherche en cours » à supprimer ensuite
 		try:
-			searching_msg = await message.channel.send(f"🔍 Recherche en cours pour **{name}**...")
-			games = searhProtonDb(name)
-			await searching_msg.delete()
-		except:
-			games = searhProtonDb(name)
-		
-		if (len(games)==0) :
-			msg = f'{mention} Je n\'ai pas trouvé de jeux correspondant à **{name}**. Es-tu sûr que le jeu est disponible sur Steam ?'
+			async with message.channel.typing():
+				games, total_games = await searchProtonDb(name, MAX_GAMES)
+		except Exception as e:
+			logging.error(f'Échec de la recherche ProtonDB pour "{name}" : {e}')
 			try:
-				await message.channel.send(msg, suppress_embeds=True)
+				await message.channel.send(SEARCH_FAILED_MESSAGE)
 			except Exception as e:
 				logging.error(f"Échec de l'envoi du message ProtonDB : {e}")
 			return
-		total_games = len(games)
-		tier_colors = {'platinum': '🟣', 'gold': '🟡', 'silver': '⚪', 'bronze': '🟤', 'borked': '🔴'}
-		content = ""
-		max_games = 15
-		
-		for count, game in enumerate(games[:max_games]):
-			g_name = str(game.get('name'))
-			g_id = str(game.get('id'))
-			tier = str(game.get('tier') or 'N/A').lower()
-			tier_icon = tier_colors.get(tier, '⚫')
-			
-			new_entry = f"**[{g_name}](<https://www.protondb.com/app/{g_id}>)**\n{tier_icon} Classé **{tier.capitalize()}**"
-			
-			ac_status = game.get('anticheat_status')
-			if ac_status:
-				status_lower = str(ac_status).lower()
-				ac_map = {
-					'supported': ('✅', 'Supporté'),
-					'running': ('⚠️', 'Fonctionne'),
-					'broken': ('❌', 'Cassé'),
-					'denied': ('🚫', 'Refusé'),
-					'planned': ('📅', 'Planifié')
-				}
-				ac_emoji, ac_label = ac_map.get(status_lower, ('❔', str(ac_status)))
-				acs = game.get('anticheats') or []
-				ac_list = ', '.join([str(ac) for ac in acs if ac])
-				new_entry += f" • [Anti-cheat {ac_emoji} {ac_label}"
-				if ac_list:
-					new_entry += f" ({ac_list})"
-				new_entry += f"](<https://areweanticheatyet.com/game/{g_id}>)"
-			
-			new_entry += "\n\n"
-			
-			# Vérifier la limite avant d'ajouter
-			if len(content) + len(new_entry) > 3900:
-				rest = len(games) - count
-				content += f"*... et {rest} autre{'s' if rest > 1 else ''} jeu{'x' if rest > 1 else ''}*"
-				break
-			
-			content += new_entry
-		else:
-			rest = max(0, len(games) - max_games)
-			if rest > 0:
-				content += f"*... et {rest} autre{'s' if rest > 1 else ''} jeu{'x' if rest > 1 else ''}*"
 		
-		embed = discord.Embed(
-			title=f"🎮 Résultats ProtonDB - **{total_games} jeu{'x' if total_games > 1 else ''} trouvé{'s' if total_games > 1 else ''}**",
-			description=content,
-			color=0x5865F2
-		)
-		
-		try : 
-			await message.channel.send(embed=embed)
+		try:
+			if (len(games)==0) :
+				await message.channel.send(notFoundMessage(mention, name), suppress_embeds=True)
+			else:
+				await message.channel.send(embed=buildProtonDbEmbed(games, total_games))
 		except Exception as e:
-			logging.error(f"Échec de l'envoi de l'embed ProtonDB : {e}")
+			logging.error(f"Échec de l'envoi du message ProtonDB : {e}")
 
 @bot.event
 async def on_voice_state_update(member: Member, before, after):
@@ -4,6 +4,7 @@ import logging
 
 from discord import Client
 from database import db
+from database.executor import runQuery, runWrite
 from database.helpers import ConfigurationHelper
 from database.models import FreeLootEntry
 from freeloot_feed import (
@@ -134,6 +135,15 @@ def _build_embed(entry: dict, source_key: str):
 
 _freeloot_first_check = True
 
+
+def _is_known_entry(entry_id: str) -> bool:
+    return FreeLootEntry.query.get(entry_id) is not None
+
+
+def _mark_entry_sent(entry_id: str):
+    if not FreeLootEntry.query.get(entry_id):
+        db.session.add(FreeLootEntry(entry_id=entry_id))
+
 async def checkFreeLootAndNotify(bot: Client):
     global _freeloot_first_check
     helper = ConfigurationHelper()
@@ -155,22 +165,20 @@ async def checkFreeLootAndNotify(bot: Client):
         logging.info("FreeLoot: première vérification, synchronisation sans notification")
         for entry in entries:
             entry_id = entry["id"]
-            if not FreeLootEntry.query.get(entry_id):
+            if not await runQuery(_is_known_entry, entry_id):
                 source_key = source_key_from_entry(entry["title"], entry["link"])
                 if source_key and _is_enabled_source(source_key):
                     try:
-                        db.session.add(FreeLootEntry(entry_id=entry_id))
-                        db.session.commit()
+                        await runWrite(_mark_entry_sent, entry_id)
                     except Exception as e:
                         logging.error(f"FreeLoot: erreur de synchronisation pour {entry_id}: {e}")
-                        db.session.rollback()
         _freeloot_first_check = False
         return
     
     # Vérifications suivantes : notification normale
     for entry in entries:
         entry_id = entry["id"]
-        if FreeLootEntry.query.get(entry_id):
+        if await runQuery(_is_known_entry, entry_id):
             continue
         source_key = source_key_from_entry(entry["title"], entry["link"])
         if not source_key or not _is_enabled_source(source_key):
@@ -179,11 +187,9 @@ async def checkFreeLootAndNotify(bot: Client):
             embed = _build_embed(entry, source_key)
             content = _get_mention_content()
             await channel.send(content=content or None, embed=embed)
-            db.session.add(FreeLootEntry(entry_id=entry_id))
-            db.session.commit()
+            await runWrite(_mark_entry_sent, entry_id)
         except Exception as e:
             logging.error(f"FreeLoot: envoi Discord échoué pour {entry_id}: {e}")
-            db.session.rollback()
 
 
 async def _send_entry_to_discord_async(bot: Client, entry_id: str) -> tuple[bool, str]:
@@ -209,13 +215,10 @@ async def _send_entry_to_discord_async(bot: Client, entry_id: str) -> tuple[bool
         embed = _build_embed(entry, source_key)
         content = _get_mention_content()
         await channel.send(content=content or None, embed=embed)
-        if not FreeLootEntry.query.get(entry_id):
-            db.session.add(FreeLootEntry(entry_id=entry_id))
-            db.session.commit()
+        await runWrite(_mark_entry_sent, entry_id)
         return (True, "Annonce envoyée sur Discord.")
     except Exception as e:
         logging.error(f"FreeLoot: envoi manuel échoué pour {entry_id}: {e}")
-        db.session.rollback()
         return (False, str(e))
 
 
@@ -4,6 +4,7 @@ import json
 import requests
 
 from database import db
+from database.executor import runQuery, runWrite
 from database.helpers import ConfigurationHelper
 from database.models import  GameBundle
 from discord import Client
@@ -25,6 +26,9 @@ def _callGithub():
 def _isNotAlreadyNotified(bundle):
 	return GameBundle.query.filter_by(url=bundle['url']).first() == None
 
+def _saveBundle(bundle):
+	db.session.add(GameBundle(url=bundle['url'], name=bundle['name'], json = json.dumps(bundle)))
+
 def _findFirstNotNotified(bundles) :
 	if bundles != None :
 		for bundle in bundles: 
@@ -46,14 +50,13 @@ async def checkHumbleBundleAndNotify(bot: Client):
 	if _isEnable() :
 		try : 
 			bundles = _callGithub()
-			bundle = _findFirstNotNotified(bundles)
+			bundle = await runQuery(_findFirstNotNotified, bundles)
 			
 			# Premier check : synchronisation sans notification
 			if _humblebundle_first_check:
 				if bundle != None:
 					logging.info(f'HumbleBundle: première vérification, synchronisation sans notification pour {bundle["name"]}')
-					db.session.add(GameBundle(url=bundle['url'], name=bundle['name'], json = json.dumps(bundle)))
-					db.session.commit()
+					await runWrite(_saveBundle, bundle)
 				_humblebundle_first_check = False
 				return
 			
@@ -61,8 +64,7 @@ async def checkHumbleBundleAndNotify(bot: Client):
 			if bundle != None :
 				message = _formatMessage(bundle)
 				await bot.get_channel(ConfigurationHelper().getIntValue('humble_bundle_channel')).send(message)
-				db.session.add(GameBundle(url=bundle['url'], name=bundle['name'], json = json.dumps(bundle)))
-				db.session.commit()
+				await runWrite(_saveBundle, bundle)
 		except Exception as e:
 			logging.error(f"Échec de la vérification des offres Humble Bundle : {e}")
 	else: 
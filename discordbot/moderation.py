@@ -1,15 +1,15 @@
 import asyncio
 import logging
-import time
 import os
 import re
 import discord
 import io
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
-from database import db
+from database.executor import runQuery, runWrite, addAndCommit
 from database.helpers import ConfigurationHelper
 from database.models import ModerationEvent
+from database.moderation_history import queryModerationEvents
 from discord import Message, TextChannel, ForumChannel, Thread, app_commands
 from discord.ui import Modal, TextInput, View, Select, ChannelSelect
 
@@ -165,7 +165,7 @@ async def send_warning_usage(channel):
 	msg = await channel.send(embed=embed)
 	asyncio.create_task(delete_after_delay(msg))
 
-def create_warning_event(target_user, reason: str, staff_member):
+async def create_warning_event(target_user, reason: str, staff_member):
 	event = ModerationEvent(
 		type='warning',
 		username=target_user.name,
@@ -175,25 +175,7 @@ def create_warning_event(target_user, reason: str, staff_member):
 		staff_id=str(staff_member.id),
 		staff_name=staff_member.name
 	)
-	db.session.add(event)
-	_commit_with_retry()
-
-def _commit_with_retry(max_retries: int = 5, base_delay: float = 0.1):
-	attempt = 0
-	while True:
-		try:
-			db.session.commit()
-			return
-		except Exception as e:
-			msg = str(e)
-			if 'database is locked' in msg.lower() and attempt < max_retries:
-				db.session.rollback()
-				delay = base_delay * (2 ** attempt)
-				time.sleep(delay)
-				attempt += 1
-				continue
-			db.session.rollback()
-			raise
+	await addAndCommit(event)
 
 async def send_dm_to_warned_user(target_user, reason: str, guild_name: str):
 	try:
@@ -263,7 +245,7 @@ async def handle_warning_command(message: Message, bot):
 			await _process_warning_success(message, target_user, reason, bot, timeout_seconds)
 
 async def _process_warning_success(message: Message, target_user, reason: str, bot, timeout_seconds: int = None):
-	create_warning_event(target_user, reason, message.author)
+	await create_warning_event(target_user, reason, message.author)
 	
 	timeout_info = None
 	if timeout_seconds:
@@ -284,8 +266,7 @@ async def _process_warning_success(message: Message, target_user, reason: str, b
 					staff_name=message.author.name,
 					duration=timeout_seconds
 				)
-				db.session.add(timeout_event)
-				_commit_with_retry()
+				await addAndCommit(timeout_event)
 			except discord.Forbidden:
 				logging.error(f"Permissions insuffisantes pour timeout {target_user.name}")
 			except Exception as e:
@@ -413,8 +394,7 @@ async def _process_timeout_success(message: Message, target_user, reason: str, t
 			staff_name=message.author.name,
 			duration=timeout_seconds
 		)
-		db.session.add(timeout_event)
-		_commit_with_retry()
+		await addAndCommit(timeout_event)
 		
 		await send_timeout_confirmation(message.channel, target_user, reason, timeout_seconds, message, bot)
 	except discord.Forbidden:
@@ -464,9 +444,8 @@ async def send_event_not_found(channel, event_id: int):
 	msg = await channel.send(embed=embed)
 	asyncio.create_task(delete_after_delay(msg))
 
-def delete_moderation_event(event: ModerationEvent):
-	db.session.delete(event)
-	db.session.commit()
+async def delete_moderation_event(event: ModerationEvent):
+	await runWrite(lambda: ModerationEvent.query.filter_by(id=event.id).delete())
 
 async def send_event_deleted_confirmation(channel, event: ModerationEvent, moderator, original_message: Message):
 	embed = discord.Embed(
@@ -499,19 +478,18 @@ async def handle_remove_warning_command(message: Message, bot):
 		await send_invalid_event_id(message.channel)
 		return
 	
-	event = ModerationEvent.query.filter_by(id=event_id).first()
+	event = await runQuery(lambda: ModerationEvent.query.filter_by(id=event_id).first())
 	
 	if not event:
 		await send_event_not_found(message.channel, event_id)
 		return
 	
-	delete_moderation_event(event)
+	await delete_moderation_event(event)
 	await send_event_deleted_confirmation(message.channel, event, message.author, message)
 
-def get_moderation_events(user_filter: str = None):
-	if user_filter:
-		return ModerationEvent.query.filter_by(discord_id=user_filter).order_by(ModerationEvent.created_at.desc()).all()
-	return ModerationEvent.query.order_by(ModerationEvent.created_at.desc()).all()
+async def get_moderation_events(user_filter: str = None, cursor: str = None, per_page: int = 5):
+	"""Une page d'événements (plus récents d'abord) et le curseur de la page suivante."""
+	return await runQuery(queryModerationEvents, cursor, per_page, user=user_filter)
 
 async def send_no_events_found(channel):
 	embed = discord.Embed(
@@ -522,20 +500,15 @@ async def send_no_events_found(channel):
 	msg = await channel.send(embed=embed)
 	asyncio.create_task(delete_after_delay(msg))
 
-def create_events_list_embed(events: list, page_num: int, per_page: int):
-	start = page_num * per_page
-	end = start + per_page
-	page_events = events[start:end]
-	max_page = (len(events) - 1) // per_page
-	
+def create_events_list_embed(events: list, page_num: int, has_next: bool):
 	embed = discord.Embed(
 		title="📋 Liste des événements de modération",
-		description=f"Total : {len(events)} événement(s)",
+		description="Du plus récent au plus ancien",
 		color=discord.Color.blue(),
 		timestamp=datetime.now(timezone.utc)
 	)
 	
-	for event in page_events:
+	for event in events:
 		local_dt = _to_local(event.created_at)
 		date_str = local_dt.strftime('%d/%m/%Y %H:%M') if local_dt else 'N/A'
 		embed.add_field(
@@ -544,18 +517,18 @@ def create_events_list_embed(events: list, page_num: int, per_page: int):
 			inline=False
 		)
 	
-	embed.set_footer(text=f"Page {page_num + 1}/{max_page + 1}")
+	embed.set_footer(text=f"Page {page_num + 1}" + (" • ➡️ pour la suite" if has_next else " (fin)"))
 	return embed
 
-async def add_pagination_reactions(msg, max_page: int):
-	if max_page > 0:
+async def add_pagination_reactions(msg, has_next: bool):
+	if has_next:
 		await msg.add_reaction('⬅️')
 		await msg.add_reaction('➡️')
 	await msg.add_reaction('❌')
 
-async def handle_pagination_loop(msg, bot, message_author, events: list, per_page: int):
+async def handle_pagination_loop(msg, bot, message_author, user_filter: str, pages: list, per_page: int):
+	# pages : (événements, curseur suivant) déjà chargées ; la page suivante n'est lue qu'à la demande
 	page = 0
-	max_page = (len(events) - 1) // per_page
 	
 	def check(reaction, user):
 		return user == message_author and str(reaction.emoji) in ['⬅️', '➡️', '❌'] and reaction.message.id == msg.id
@@ -567,12 +540,20 @@ async def handle_pagination_loop(msg, bot, message_author, events: list, per_pag
 			if str(reaction.emoji) == '❌':
 				await msg.delete()
 				break
-			elif str(reaction.emoji) == '➡️' and page < max_page:
+			elif str(reaction.emoji) == '➡️' and pages[page][1]:
+				if page + 1 == len(pages):
+					events, next_cursor = await get_moderation_events(user_filter, pages[page][1], per_page)
+					if not events:
+						pages[page] = (pages[page][0], None)
+						await msg.edit(embed=create_events_list_embed(pages[page][0], page, False))
+						await msg.remove_reaction(reaction, user)
+						continue
+					pages.append((events, next_cursor))
 				page += 1
-				await msg.edit(embed=create_events_list_embed(events, page, per_page))
+				await msg.edit(embed=create_events_list_embed(pages[page][0], page, pages[page][1] is not None))
 			elif str(reaction.emoji) == '⬅️' and page > 0:
 				page -= 1
-				await msg.edit(embed=create_events_list_embed(events, page, per_page))
+				await msg.edit(embed=create_events_list_embed(pages[page][0], page, pages[page][1] is not None))
 			
 			await msg.remove_reaction(reaction, user)
 		except:
@@ -591,18 +572,16 @@ async def handle_list_warnings_command(message: Message, bot):
 	parts = message.content.split(maxsplit=1)
 	user_filter = str(message.mentions[0].id) if len(parts) > 1 and message.mentions else None
 	
-	events = get_moderation_events(user_filter)
+	per_page = 5
+	events, next_cursor = await get_moderation_events(user_filter, per_page=per_page)
 	
 	if not events:
 		await send_no_events_found(message.channel)
 		return
 	
-	per_page = 5
-	max_page = (len(events) - 1) // per_page
-	
-	msg = await message.channel.send(embed=create_events_list_embed(events, 0, per_page))
-	await add_pagination_reactions(msg, max_page)
-	await handle_pagination_loop(msg, bot, message.author, events, per_page)
+	msg = await message.channel.send(embed=create_events_list_embed(events, 0, next_cursor is not None))
+	await add_pagination_reactions(msg, next_cursor is not None)
+	await handle_pagination_loop(msg, bot, message.author, user_filter, [(events, next_cursor)], per_page)
 	await safe_delete_message(message)
 
 async def handle_ban_command(message: Message, bot):
@@ -647,7 +626,7 @@ async def _send_user_not_found_for_ban(channel):
 	msg = await channel.send(embed=embed)
 	asyncio.create_task(delete_after_delay(msg))
 
-def _create_ban_event(target_user, reason: str, staff_member):
+async def _create_ban_event(target_user, reason: str, staff_member):
 	event = ModerationEvent(
 		type='ban',
 		username=target_user.name,
@@ -657,8 +636,7 @@ def _create_ban_event(target_user, reason: str, staff_member):
 		staff_id=str(staff_member.id),
 		staff_name=staff_member.name
 	)
-	db.session.add(event)
-	_commit_with_retry()
+	await addAndCommit(event)
 	return event
 
 async def _process_ban_success(message: Message, target_user, reason: str, bot):
@@ -679,7 +657,7 @@ async def _process_ban_success(message: Message, target_user, reason: str, bot):
 		asyncio.create_task(delete_after_delay(msg))
 		return
 
-	event = _create_ban_event(target_user, reason, message.author)
+	event = await _create_ban_event(target_user, reason, message.author)
 	
 	local_now = _to_local(datetime.now(timezone.utc))
 	embed = discord.Embed(
@@ -729,7 +707,7 @@ async def _parse_unban_target_and_reason(message: Message, bot, parts: list):
 	if parts[1].startswith('#'):
 		try:
 			sanction_id = int(parts[1][1:])
-			evt = ModerationEvent.query.filter_by(id=sanction_id, type='ban').first()
+			evt = await runQuery(lambda: ModerationEvent.query.filter_by(id=sanction_id, type='ban').first())
 			if not evt:
 				return None, None, reason
 			discord_id = evt.discord_id
@@ -788,8 +766,7 @@ async def _process_unban_success(message: Message, bot, target_user, discord_id:
 		staff_id=str(message.author.id),
 		staff_name=message.author.name
 	)
-	db.session.add(create)
-	_commit_with_retry()
+	await addAndCommit(create)
 
 	try:
 		asyncio.create_task(_send_unban_invite(message, bot, target_user, discord_id))
@@ -970,8 +947,8 @@ async def handle_staff_help_command(message: Message, bot):
 			"Ex: `!pdb Elden Ring`"
 		)
 	
-	from database.models import Commande
-	custom_commands = Commande.query.filter_by(discord_enable=True).all()
+	from database.commands import getRouter, loadRouter
+	custom_commands = (getRouter() or await runQuery(loadRouter)).listCommands('discord')
 	if custom_commands:
 		commands_list = []
 		for cmd in custom_commands:
@@ -1155,8 +1132,7 @@ async def _process_kick_success(message: Message, target_member, reason: str, bo
 		staff_id=str(message.author.id),
 		staff_name=message.author.name
 	)
-	db.session.add(create)
-	_commit_with_retry()
+	await addAndCommit(create)
 	
 	local_now = _to_local(datetime.now(timezone.utc))
 	embed = discord.Embed(
@@ -1201,8 +1177,8 @@ def get_account_age(user):
 	account_age = (datetime.now(timezone.utc) - user.created_at).days
 	return account_age
 
-def get_user_moderation_history(discord_id: str):
-	events = ModerationEvent.query.filter_by(discord_id=discord_id).order_by(ModerationEvent.created_at.desc()).all()
+async def get_user_moderation_history(discord_id: str):
+	events = await runQuery(lambda: ModerationEvent.query.filter_by(discord_id=discord_id).order_by(ModerationEvent.created_at.desc()).all())
 	
 	warnings = [e for e in events if e.type == 'warning']
 	kicks = [e for e in events if e.type == 'kick']
@@ -1299,10 +1275,10 @@ async def get_invite_info_for_user(bot, guild, user_id: int):
 		from database import db
 		from sqlalchemy import text
 		
-		result = db.session.execute(
+		result = await runQuery(lambda: db.session.execute(
 			text("SELECT invite_code, inviter_name FROM member_invites WHERE user_id = :user_id AND guild_id = :guild_id ORDER BY join_date DESC LIMIT 1"),
 			{'user_id': str(user_id), 'guild_id': str(guild.id)}
-		).fetchone()
+		).fetchone())
 		
 		if result and result[0]:
 			invite_code = result[0]
@@ -1337,7 +1313,7 @@ async def handle_inspect_command(message: Message, bot):
 	member = message.guild.get_member(target_user.id)
 	join_date, days_on_server = await get_member_join_info(message.guild, target_user.id)
 	account_age = get_account_age(target_user)
-	warnings, kicks, bans = get_user_moderation_history(str(target_user.id))
+	warnings, kicks, bans = await get_user_moderation_history(str(target_user.id))
 	invite_info = await get_invite_info_for_user(bot, message.guild, target_user.id)
 	
 	embed = create_inspect_embed(
@@ -1663,8 +1639,7 @@ async def handle_transfer_command(message: Message, bot):
 		staff_id=str(message.author.id),
 		staff_name=message.author.name
 	)
-	db.session.add(transfer_event)
-	_commit_with_retry()
+	await addAndCommit(transfer_event)
 	
 	local_now = _to_local(datetime.now(timezone.utc))
 	destination_info = target_channel.mention if isinstance(target_channel, (TextChannel, Thread)) else f"le forum {target_channel.name}"
@@ -1836,8 +1811,7 @@ class TransferReasonModal(Modal, title="Raison du transfert"):
 			staff_id=str(interaction.user.id),
 			staff_name=interaction.user.name
 		)
-		db.session.add(transfer_event)
-		_commit_with_retry()
+		await addAndCommit(transfer_event)
 		
 		destination_info = target_channel.mention if isinstance(target_channel, (TextChannel, Thread)) else f"le forum {target_channel.name}"
 		
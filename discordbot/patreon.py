@@ -7,6 +7,7 @@ import requests
 from discord import Client
 
 from database import db
+from database.executor import runQuery, runWrite
 from database.helpers import ConfigurationHelper
 from database.models import PatreonPost
 from webapp import webapp
@@ -158,6 +159,21 @@ def _build_embed(post: dict):
 	return embed
 
 
+def _is_known_post(guid: str) -> bool:
+	return PatreonPost.query.get(guid) is not None
+
+
+def _save_post(post_data: dict, notified: bool):
+	db.session.add(PatreonPost(
+		guid=post_data['guid'],
+		title=post_data['title'],
+		link=post_data['link'],
+		description=post_data['description'],
+		published_at=post_data['published_at'],
+		notified=notified,
+	))
+
+
 async def checkPatreonPosts(bot: Client):
 	global _patreon_first_check
 	with webapp.app_context():
@@ -188,46 +204,28 @@ async def checkPatreonPosts(bot: Client):
 			logger.info("Patreon: première vérification, synchronisation sans notification")
 			for post_data in posts:
 				guid = post_data['guid']
-				if not PatreonPost.query.get(guid):
+				if not await runQuery(_is_known_post, guid):
 					try:
-						db.session.add(PatreonPost(
-							guid=guid,
-							title=post_data['title'],
-							link=post_data['link'],
-							description=post_data['description'],
-							published_at=post_data['published_at'],
-							notified=False,
-						))
-						db.session.commit()
+						await runWrite(_save_post, post_data, False)
 					except Exception as e:
 						logger.error(f"Patreon: erreur de synchronisation pour {guid}: {e}")
-						db.session.rollback()
 			_patreon_first_check = False
 			return
 
 		for post_data in posts:
 			guid = post_data['guid']
 
-			if PatreonPost.query.get(guid):
+			if await runQuery(_is_known_post, guid):
 				continue
 
 			try:
 				embed = _build_embed(post_data)
 				content = _get_mention_content()
 				await channel.send(content=content or None, embed=embed)
-				db.session.add(PatreonPost(
-					guid=guid,
-					title=post_data['title'],
-					link=post_data['link'],
-					description=post_data['description'],
-					published_at=post_data['published_at'],
-					notified=True,
-				))
-				db.session.commit()
+				await runWrite(_save_post, post_data, True)
 				logger.info(f"Patreon: notification envoyée pour '{post_data['title']}'")
 			except Exception as e:
 				logger.error(f"Patreon: envoi Discord échoué pour {guid}: {e}")
-				db.session.rollback()
 
 
 async def _send_post_to_discord_async(bot: Client, guid: str) -> tuple[bool, str]:
@@ -240,7 +238,7 @@ async def _send_post_to_discord_async(bot: Client, guid: str) -> tuple[bool, str
 	if not channel:
 		return (False, "Canal Discord introuvable.")
 
-	post_db = PatreonPost.query.get(guid)
+	post_db = await runQuery(lambda: PatreonPost.query.get(guid))
 	if not post_db:
 		return (False, "Post introuvable en base de données.")
 
@@ -260,12 +258,10 @@ async def _send_post_to_discord_async(bot: Client, guid: str) -> tuple[bool, str
 		embed = _build_embed(post_data)
 		content = _get_mention_content()
 		await channel.send(content=content or None, embed=embed)
-		post_db.notified = True
-		db.session.commit()
+		await runWrite(lambda: PatreonPost.query.filter_by(guid=guid).update({'notified': True}))
 		return (True, "Notification envoyée sur Discord.")
 	except Exception as e:
 		logger.error(f"Patreon: envoi manuel échoué pour {guid}: {e}")
-		db.session.rollback()
 		return (False, str(e))
 
 
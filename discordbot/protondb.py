@@ -0,0 +1,117 @@
+# Recherche ProtonDB sur Discord : commande !pdb / !protondb et commande slash /protondb.
+# /protondb répond par une interaction différée (un seul message, sans « recherche en cours »),
+# et son autocomplétion lit l'index local des noms de jeux, sans base ni réseau.
+import asyncio
+import logging
+
+import discord
+from discord import app_commands
+
+from database.executor import runQuery
+from database.helpers import ConfigurationHelper
+from protondb import searchProtonDb
+from protondb.game_index import gameIndex
+
+MAX_GAMES = 15
+MAX_CHOICES = 25
+SEARCH_FAILED_MESSAGE = "❌ La recherche ProtonDB a échoué, réessaie dans un instant."
+
+_TIER_COLORS = {'platinum': '🟣', 'gold': '🟡', 'silver': '⚪', 'bronze': '🟤', 'borked': '🔴'}
+_ANTICHEAT_STATUS = {
+	'supported': ('✅', 'Supporté'),
+	'running': ('⚠️', 'Fonctionne'),
+	'broken': ('❌', 'Cassé'),
+	'denied': ('🚫', 'Refusé'),
+	'planned': ('📅', 'Planifié')
+}
+
+_index_loading = None
+
+
+def _rest(count: int) -> str:
+	return f"*... et {count} autre{'s' if count > 1 else ''} jeu{'x' if count > 1 else ''}*"
+
+
+def buildProtonDbEmbed(games: list, total_games: int) -> discord.Embed:
+	content = ""
+	for count, game in enumerate(games[:MAX_GAMES]):
+		g_name = str(game.get('name'))
+		g_id = str(game.get('id'))
+		tier = str(game.get('tier') or 'N/A').lower()
+		tier_icon = _TIER_COLORS.get(tier, '⚫')
+
+		new_entry = f"**[{g_name}](<https://www.protondb.com/app/{g_id}>)**\n{tier_icon} Classé **{tier.capitalize()}**"
+
+		ac_status = game.get('anticheat_status')
+		if ac_status:
+			ac_emoji, ac_label = _ANTICHEAT_STATUS.get(str(ac_status).lower(), ('❔', str(ac_status)))
+			ac_list = ', '.join([str(ac) for ac in game.get('anticheats') or [] if ac])
+			new_entry += f" • [Anti-cheat {ac_emoji} {ac_label}"
+			if ac_list:
+				new_entry += f" ({ac_list})"
+			new_entry += f"](<https://areweanticheatyet.com/game/{g_id}>)"
+
+		new_entry += "\n\n"
+
+		# Vérifier la limite avant d'ajouter
+		if len(content) + len(new_entry) > 3900:
+			content += _rest(total_games - count)
+			break
+
+		content += new_entry
+	else:
+		# Jeux correspondants au-delà de ceux affichés (leurs résumés n'ont pas été demandés)
+		rest = max(0, total_games - len(games))
+		if rest > 0:
+			content += _rest(rest)
+
+	return discord.Embed(
+		title=f"🎮 Résultats ProtonDB - **{total_games} jeu{'x' if total_games > 1 else ''} trouvé{'s' if total_games > 1 else ''}**",
+		description=content,
+		color=0x5865F2
+	)
+
+
+def notFoundMessage(mention: str, name: str) -> str:
+	return f'{mention} Je n\'ai pas trouvé de jeux correspondant à **{name}**. Es-tu sûr que le jeu est disponible sur Steam ?'
+
+
+def _ensure_index_loaded():
+	# Premier appel : l'index est chargé sur le pool de la base, l'autocomplétion n'attend pas
+	global _index_loading
+	if not gameIndex.loaded and (_index_loading is None or _index_loading.done()):
+		_index_loading = asyncio.ensure_future(runQuery(gameIndex.load))
+
+
+async def _complete_game(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+	_ensure_index_loaded()
+	return [app_commands.Choice(name=name[:100], value=name[:100]) for name in gameIndex.complete(current, MAX_CHOICES)]
+
+
+@app_commands.command(name="protondb", description="Compatibilité Linux / Steam Deck d'un jeu sur ProtonDB")
+@app_commands.describe(jeu="Nom du jeu")
+@app_commands.autocomplete(jeu=_complete_game)
+async def protondb_command(interaction: discord.Interaction, jeu: str):
+	if not ConfigurationHelper().getValue('proton_db_enable_enable'):
+		await interaction.response.send_message("❌ La recherche ProtonDB est désactivée.", ephemeral=True)
+		return
+	name = jeu.strip()
+	if not name:
+		await interaction.response.send_message("⚠️ Indique le nom d'un jeu, par exemple `/protondb Elden Ring`.", ephemeral=True)
+		return
+
+	await interaction.response.defer(thinking=True)
+	try:
+		games, total_games = await searchProtonDb(name, MAX_GAMES)
+	except Exception as e:
+		logging.error(f'Échec de la recherche ProtonDB pour "{name}" : {e}')
+		await interaction.followup.send(SEARCH_FAILED_MESSAGE)
+		return
+
+	try:
+		if not games:
+			await interaction.followup.send(notFoundMessage(interaction.user.mention, name), suppress_embeds=True)
+		else:
+			await interaction.followup.send(embed=buildProtonDbEmbed(games, total_games))
+	except Exception as e:
+		logging.error(f"Échec de l'envoi de la réponse ProtonDB : {e}")
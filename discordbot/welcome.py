@@ -1,8 +1,10 @@
 import discord
 import logging
+from database.writebehind import writeBehind, INSERT_MEMBER_INVITE, sqlDateTime
+from database.rollups import UPSERT_MEMBER_LEAVE
 from database.helpers import ConfigurationHelper
 from discord import Member, TextChannel
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 
 invite_cache = {}
 
@@ -47,6 +49,22 @@ async def getUsedInvite(guild):
 	return (None, None, 'Inconnue')
 
 async def sendWelcomeMessage(bot: discord.Client, member: Member):
+	# Invitation et agrégat journalier des arrivées (tableau de bord, !inspect), même si le message
+	# de bienvenue est désactivé, comme les départs
+	invite_code, inviter_name, invite_display = await getUsedInvite(member.guild)
+	
+	try:
+		# Écriture différée : un raid d'arrivées est regroupé en une seule transaction
+		writeBehind.enqueue(INSERT_MEMBER_INVITE, (
+			str(member.id),
+			str(member.guild.id),
+			invite_code,
+			inviter_name,
+			sqlDateTime(datetime.now(timezone.utc))
+		))
+	except Exception as e:
+		logging.error(f'Échec de la sauvegarde de l\'invitation : {e}')
+	
 	config = ConfigurationHelper()
 	
 	if not config.getValue('welcome_enable'):
@@ -68,25 +86,6 @@ async def sendWelcomeMessage(bot: discord.Client, member: Member):
 	
 	welcome_message = replaceMessageVariables(welcome_message, member)
 	
-	invite_code, inviter_name, invite_display = await getUsedInvite(member.guild)
-	
-	try:
-		from database import db
-		from sqlalchemy import text
-		db.session.execute(
-			text("INSERT INTO member_invites (user_id, guild_id, invite_code, inviter_name, join_date) VALUES (:user_id, :guild_id, :invite_code, :inviter_name, :join_date)"),
-			{
-				'user_id': str(member.id),
-				'guild_id': str(member.guild.id),
-				'invite_code': invite_code,
-				'inviter_name': inviter_name,
-				'join_date': datetime.now(timezone.utc)
-			}
-		)
-		db.session.commit()
-	except Exception as e:
-		logging.error(f'Échec de la sauvegarde de l\'invitation : {e}')
-	
 	embed = discord.Embed(
 		title='🎉 Nouveau membre !',
 		description=welcome_message,
@@ -130,6 +129,12 @@ def formatDuration(seconds: int) -> str:
 	return ' et '.join(parts)
 
 async def sendLeaveMessage(bot: discord.Client, member: Member):
+	# Agrégat journalier des départs (tableau de bord, jour local), même si le message de départ est désactivé
+	try:
+		writeBehind.enqueue(UPSERT_MEMBER_LEAVE, (date.today().isoformat(), str(member.guild.id)))
+	except Exception as e:
+		logging.error(f'Échec de l\'enregistrement du départ : {e}')
+	
 	config = ConfigurationHelper()
 	
 	if not config.getValue('leave_enable'):
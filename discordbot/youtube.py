@@ -5,6 +5,7 @@ import requests
 import discord
 
 from database import db
+from database.executor import runQuery, runWrite
 from database.models import YouTubeNotification
 from webapp import webapp
 
@@ -18,14 +19,13 @@ async def checkYouTubeVideos():
 	global _youtube_first_check
 	with webapp.app_context():
 		try:
-			notifications: list[YouTubeNotification] = YouTubeNotification.query.filter_by(enable=True).all()
+			notifications: list[YouTubeNotification] = await runQuery(lambda: YouTubeNotification.query.filter_by(enable=True).all())
 			
 			for notification in notifications:
 				try:
 					await _checkChannelVideos(notification, is_first_check=_youtube_first_check)
 				except Exception as e:
 					logger.error(f"Erreur lors de la vérification de la chaîne {notification.channel_id}: {e}")
-					db.session.rollback()
 					continue
 			
 			if _youtube_first_check:
@@ -33,7 +33,6 @@ async def checkYouTubeVideos():
 				logger.info("YouTube: première vérification terminée, notifications activées")
 		except Exception as e:
 			logger.error(f"Erreur lors de la vérification YouTube: {e}")
-			db.session.rollback()
 
 
 def _extract_embed_config(notification: YouTubeNotification) -> dict:
@@ -123,7 +122,7 @@ async def _checkChannelVideos(notification: YouTubeNotification, is_first_check:
 		
 		# Enregistrer toutes les vidéos du flux dans l'historique (les doublons sont ignorés)
 		for vid, vdata in videos:
-			_save_video_history(notification.id, vid, vdata, notified=False)
+			await _save_video_history(notification.id, vid, vdata, notified=False)
 		
 		if videos:
 			latest_video_id, latest_video = videos[0]
@@ -131,13 +130,11 @@ async def _checkChannelVideos(notification: YouTubeNotification, is_first_check:
 			if is_first_check:
 				if not notification.last_video_id or notification.last_video_id != latest_video_id:
 					logger.info(f"YouTube: synchronisation initiale pour {channel_id}, dernière vidéo: {latest_video_id}")
-					notification.last_video_id = latest_video_id
-					db.session.commit()
+					await _set_last_video(notification, latest_video_id)
 				return
 			
 			if not notification.last_video_id:
-				notification.last_video_id = latest_video_id
-				db.session.commit()
+				await _set_last_video(notification, latest_video_id)
 				return
 			
 			if latest_video_id != notification.last_video_id:
@@ -145,45 +142,48 @@ async def _checkChannelVideos(notification: YouTubeNotification, is_first_check:
 				embed_config = _extract_embed_config(notification)
 				success = await _notifyVideo(embed_config, latest_video, latest_video_id)
 				if success:
-					_save_video_history(notification.id, latest_video_id, latest_video, notified=True)
+					await _save_video_history(notification.id, latest_video_id, latest_video, notified=True)
 				else:
 					logger.warning(f"Notification échouée pour {latest_video_id}, vidéo enregistrée comme non notifiée")
-				notification.last_video_id = latest_video_id
-				db.session.commit()
+				await _set_last_video(notification, latest_video_id)
 				
 	except Exception as e:
 		logger.error(f"Erreur lors de la vérification des vidéos: {e}")
-		db.session.rollback()
 
 
-def _save_video_history(notification_id: int, video_id: str, video_data: dict, notified: bool):
-	"""Enregistre une vidéo dans l'historique (ne fait rien si déjà présente)."""
+async def _set_last_video(notification: YouTubeNotification, video_id: str):
+	notification.last_video_id = video_id
+	await runWrite(lambda: YouTubeNotification.query.filter_by(id=notification.id).update({'last_video_id': video_id}))
+
+
+def _store_video_history(notification_id: int, video_id: str, video_data: dict, notified: bool):
 	from database.models import YouTubeVideoHistory
+	existing = YouTubeVideoHistory.query.filter_by(
+		notification_id=notification_id, video_id=video_id
+	).first()
+	if existing:
+		if notified and not existing.notified:
+			existing.notified = True
+		return
+	db.session.add(YouTubeVideoHistory(
+		notification_id=notification_id,
+		video_id=video_id,
+		title=video_data.get('title', 'Sans titre'),
+		url=video_data.get('url', f"https://www.youtube.com/watch?v={video_id}"),
+		channel_name=video_data.get('channel_name', 'Inconnu'),
+		thumbnail=video_data.get('thumbnail'),
+		published_at=video_data.get('published', ''),
+		is_short=video_data.get('is_short', False),
+		notified=notified,
+	))
+
+
+async def _save_video_history(notification_id: int, video_id: str, video_data: dict, notified: bool):
+	"""Enregistre une vidéo dans l'historique (ne fait rien si déjà présente)."""
 	try:
-		existing = YouTubeVideoHistory.query.filter_by(
-			notification_id=notification_id, video_id=video_id
-		).first()
-		if existing:
-			if notified and not existing.notified:
-				existing.notified = True
-				db.session.commit()
-			return
-		entry = YouTubeVideoHistory(
-			notification_id=notification_id,
-			video_id=video_id,
-			title=video_data.get('title', 'Sans titre'),
-			url=video_data.get('url', f"https://www.youtube.com/watch?v={video_id}"),
-			channel_name=video_data.get('channel_name', 'Inconnu'),
-			thumbnail=video_data.get('thumbnail'),
-			published_at=video_data.get('published', ''),
-			is_short=video_data.get('is_short', False),
-			notified=notified,
-		)
-		db.session.add(entry)
-		db.session.commit()
+		await runWrite(_store_video_history, notification_id, video_id, video_data, notified)
 	except Exception as e:
 		logger.error(f"Erreur lors de l'enregistrement de l'historique vidéo: {e}")
-		db.session.rollback()
 
 
 async def _notifyVideo(embed_config: dict, video_data: dict, video_id: str) -> bool:
@@ -296,11 +296,11 @@ async def _send_video_notification_async(history_id: int) -> tuple[bool, str]:
 	"""Force l'envoi d'une notification pour une vidéo de l'historique. Retourne (succès, message)."""
 	from database.models import YouTubeVideoHistory
 	with webapp.app_context():
-		history = YouTubeVideoHistory.query.get(history_id)
+		history = await runQuery(lambda: YouTubeVideoHistory.query.get(history_id))
 		if not history:
 			return (False, "Vidéo introuvable dans l'historique.")
 		
-		notification = YouTubeNotification.query.get(history.notification_id)
+		notification = await runQuery(lambda: YouTubeNotification.query.get(history.notification_id))
 		if not notification:
 			return (False, "Notification YouTube associée introuvable.")
 		
@@ -316,11 +316,9 @@ async def _send_video_notification_async(history_id: int) -> tuple[bool, str]:
 		
 		success = await _notifyVideo(embed_config, video_data, history.video_id)
 		if success:
-			history.notified = True
-			db.session.commit()
+			await runWrite(lambda: YouTubeVideoHistory.query.filter_by(id=history_id).update({'notified': True}))
 			return (True, "Notification envoyée sur Discord.")
 		else:
-			db.session.rollback()
 			return (False, "Échec de l'envoi sur Discord.")
 
 
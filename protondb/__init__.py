@@ -1,201 +1,244 @@
+import asyncio
 import logging
-import requests
-import re
-import json
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import deque
 
+import aiohttp
 from algoliasearch.search.client import SearchClientSync, SearchConfig
-from database import db
+from database.executor import runQuery
 from database.helpers import ConfigurationHelper
-from database.models import GameAlias, AntiCheatCache, Configuration
-from sqlalchemy import desc, func
-
-def _call_algoliasearch(search_name:str): 
-	config = SearchConfig(ConfigurationHelper().getValue('proton_db_api_id'), 
-						ConfigurationHelper().getValue('proton_db_api_key'))
-	config.set_default_hosts()
-	client = SearchClientSync(config=config)
-	return client.search_single_index(index_name="steamdb",
+from protondb.anticheat import antiCheatIndex
+from protondb.cache import searchCache, summaryCache, normalizeQuery
+from protondb.game_index import gameIndex, normalizeName
+
+_algolia_lock = threading.Lock()
+_algolia_client = None
+_algolia_credentials = None
+
+def _algolia() -> SearchClientSync:
+	"""Client Algolia du processus, recréé seulement si les identifiants changent."""
+	global _algolia_client, _algolia_credentials
+	credentials = (ConfigurationHelper().getValue('proton_db_api_id'), ConfigurationHelper().getValue('proton_db_api_key'))
+	with _algolia_lock:
+		if _algolia_client is None or credentials != _algolia_credentials:
+			config = SearchConfig(*credentials)
+			config.set_default_hosts()
+			_algolia_client = SearchClientSync(config=config)
+			_algolia_credentials = credentials
+		return _algolia_client
+
+def _call_algoliasearch(search_name:str) -> list:
+	"""Jeux trouvés par Algolia, réduits aux champs utilisés (ils sont mis en cache)."""
+	responses = _algolia().search_single_index(index_name="steamdb",
 											search_params={
 												"query":search_name,
 												"facetFilters":[["appType:Game"]],
 												"hitsPerPage":50},
 											request_options= {'headers':{'Referer':'https://www.protondb.com/'}})
+	return [{'object_id': hit.get('object_id'), 'name': hit.get('name')} for hit in responses.model_dump().get('hits') or []]
 
-def _call_summary(id): 
-	response = requests.get(f'http://jazzy-starlight-aeea19.netlify.app/api/v1/reports/summaries/{id}.json')
-	if (response.status_code == 200) :
-		return response.json()
-	logging.error(f'Échec de la récupération des données ProtonDB pour le jeu {id}. Code de statut HTTP : {response.status_code}')
-	return None
+# Résumés ProtonDB récupérés en parallèle sur une session HTTP partagée (une par boucle asyncio,
+# les bots Discord et Twitch ayant chacun la leur), au plus SUMMARY_CONCURRENCY à la fois par
+# boucle, rafraîchissements du cache compris.
+SUMMARY_URL = 'http://jazzy-starlight-aeea19.netlify.app/api/v1/reports/summaries/{}.json'
+SUMMARY_CONCURRENCY = 8
+SUMMARY_TIMEOUT = 5
+_LATENCY_SAMPLES = 500
 
-def _is_name_match(name:str, search_name:str) -> bool:
-	normalized_game_name = re.sub("[^a-z0-9]", "", name.lower())
-	normalized_search_name = re.sub("[^a-z0-9]", "", search_name.lower())
-	return normalized_game_name.find(normalized_search_name) >= 0
+_sessions = {}
 
-def _apply_game_aliases(search_name:str) -> str:
-	for alias in GameAlias.query.order_by(desc(func.length(GameAlias.alias))).all():
-		search_name = re.sub(re.escape(alias.alias), alias.name, search_name, flags=re.IGNORECASE)
-	return search_name
 
-def _should_update_anticheat_cache() -> bool:
-	try:
-		last_update_conf = Configuration.query.filter_by(key='anticheat_last_update').first()
-		if not last_update_conf:
-			return True
-		try:
-			last_update = datetime.fromisoformat(last_update_conf.value)
-			return datetime.now() - last_update > timedelta(days=7)
-		except:
-			return True
-	except Exception as e:
-		logging.error(f'Erreur lors de la vérification du cache anti-cheat: {e}')
-		return False
+class _SearchStats:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+		self._counters = {'searches': 0, 'errors': 0, 'summaries': 0, 'summary_errors': 0, 'summary_timeouts': 0, 'cut_off': 0}
 
-def _fetch_anticheat_data():
-	try:
-		url = 'https://raw.githubusercontent.com/AreWeAntiCheatYet/AreWeAntiCheatYet/master/games.json'
-		response = requests.get(url, timeout=10)
-		if response.status_code == 200:
-			return response.json()
-		else:
-			logging.error(f'Échec de la récupération des données anti-cheat. Code HTTP: {response.status_code}')
+	def count(self, key: str, n: int = 1):
+		with self._lock:
+			self._counters[key] += n
+
+	def record(self, elapsed_ms: float):
+		with self._lock:
+			self._counters['searches'] += 1
+			self._latencies.append(elapsed_ms)
+
+	def toDict(self) -> dict:
+		with self._lock:
+			latencies = sorted(self._latencies)
+			counters = dict(self._counters)
+		def percentile(p):
+			return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1) if latencies else 0.0
+		return {**counters, 'p50_ms': percentile(0.5), 'p90_ms': percentile(0.9), 'p99_ms': percentile(0.99),
+			'max_ms': round(latencies[-1], 1) if latencies else 0.0}
+
+
+_stats = _SearchStats()
+
+
+def getSearchStats() -> dict:
+	"""Compteurs et percentiles de latence des recherches !pdb (sur les dernières recherches)."""
+	return _stats.toDict()
+
+
+def _http_session() -> tuple:
+	"""(session HTTP, sémaphore de concurrence) de la boucle courante."""
+	loop = asyncio.get_running_loop()
+	current = _sessions.get(loop)
+	if current is None or current[0].closed:
+		# Sessions des boucles terminées (reconnexion du bot Twitch) : on les oublie
+		for closed in [other for other in _sessions if other.is_closed()]:
+			del _sessions[closed]
+		session = aiohttp.ClientSession(
+			timeout=aiohttp.ClientTimeout(total=SUMMARY_TIMEOUT),
+			connector=aiohttp.TCPConnector(limit=SUMMARY_CONCURRENCY))
+		current = _sessions[loop] = (session, asyncio.Semaphore(SUMMARY_CONCURRENCY))
+	return current
+
+
+async def _call_summary(id: str) -> dict | None:
+	"""Résumé ProtonDB du jeu, mis en cache ; {} si le jeu n'a aucun rapport, None en cas d'erreur."""
+	session, semaphore = _http_session()
+	async with semaphore:
+		try:
+			async with session.get(SUMMARY_URL.format(id)) as response:
+				if response.status == 200:
+					_stats.count('summaries')
+					summary = await response.json(content_type=None)
+					summaryCache.store(id, summary)
+					return summary
+				if response.status == 404:
+					summaryCache.store(id, {})
+					return {}
+				logging.error(f'Échec de la récupération des données ProtonDB pour le jeu {id}. Code de statut HTTP : {response.status}')
+		except asyncio.TimeoutError:
+			_stats.count('summary_timeouts')
+			logging.warning(f'Délai dépassé pour le résumé ProtonDB du jeu {id}')
 			return None
-	except Exception as e:
-		logging.error(f'Erreur lors de la récupération des données anti-cheat: {e}')
-		return None
+		except (aiohttp.ClientError, ValueError) as e:
+			logging.error(f'Échec de la récupération des données ProtonDB pour le jeu {id} : {e}')
+	_stats.count('summary_errors')
+	return None
 
-def _update_anticheat_cache_if_needed():
+def _search_hits(search_name:str) -> tuple:
+	"""Partie base de données et Algolia de la recherche : (requête, jeux, fraîcheur) (contexte applicatif requis)."""
+	gameIndex.load()
+	search_name = gameIndex.rewriteAliases(search_name)
+	
+	cached = searchCache.get(normalizeQuery(search_name))
+	if cached is not None:
+		hits, fresh = cached
+		return search_name, hits, fresh
+	hits = gameIndex.resolve(search_name)
+	if hits is not None:
+		# Titre connu localement : réponse sans Algolia, dont le résultat est mis en cache en tâche de fond
+		return search_name, hits, False
+	hits = _call_algoliasearch(search_name)
+	_store_search_hits(search_name, hits)
+	return search_name, hits, True
+
+def _store_search_hits(search_name:str, hits:list):
+	searchCache.store(normalizeQuery(search_name), hits)
+	gameIndex.add((hit['object_id'], hit['name']) for hit in hits)
+
+def _refresh_search_hits(search_name:str):
+	key = normalizeQuery(search_name)
 	try:
-		if not _should_update_anticheat_cache():
-			return
-		
-		logging.info('Mise à jour du cache anti-cheat...')
-		anticheat_data = _fetch_anticheat_data()
-		if not anticheat_data:
-			return
-		
-		for game in anticheat_data:
-			try:
-				steam_id = str(game.get('storeIds', {}).get('steam', ''))
-				if not steam_id or steam_id == '0':
-					continue
-				
-				cache_entry = AntiCheatCache.query.filter_by(steam_id=steam_id).first()
-				
-				status = game.get('status', 'Unknown')
-				anticheats_list = game.get('anticheats', [])
-				anticheats_str = json.dumps(anticheats_list) if anticheats_list else None
-				reference = game.get('reference', '')
-				notes_data = game.get('notes', '')
-				if isinstance(notes_data, list):
-					notes = json.dumps(notes_data)
-				else:
-					notes = str(notes_data) if notes_data else ''
-				game_name = game.get('name', '')
-				
-				if cache_entry:
-					cache_entry.game_name = game_name
-					cache_entry.status = status
-					cache_entry.anticheats = anticheats_str
-					cache_entry.reference = reference
-					cache_entry.notes = notes
-					cache_entry.updated_at = datetime.now()
-				else:
-					cache_entry = AntiCheatCache(
-						steam_id=steam_id,
-						game_name=game_name,
-						status=status,
-						anticheats=anticheats_str,
-						reference=reference,
-						notes=notes,
-						updated_at=datetime.now()
-					)
-					db.session.add(cache_entry)
-			except Exception as e:
-				logging.error(f'Erreur lors de la mise à jour du jeu {game.get("name")}: {e}')
-				continue
-		
-		last_update_conf = Configuration.query.filter_by(key='anticheat_last_update').first()
-		if last_update_conf:
-			last_update_conf.value = datetime.now().isoformat()
-		else:
-			last_update_conf = Configuration(key='anticheat_last_update', value=datetime.now().isoformat())
-			db.session.add(last_update_conf)
-		
-		db.session.commit()
-		logging.info('Cache anti-cheat mis à jour avec succès')
+		_store_search_hits(search_name, _call_algoliasearch(search_name))
 	except Exception as e:
-		try:
-			db.session.rollback()
-		except:
-			pass
-		logging.error(f'Erreur lors de la mise à jour du cache anti-cheat: {e}')
+		logging.error(f'Échec du rafraîchissement de la recherche ProtonDB "{search_name}" : {e}')
+	finally:
+		searchCache.releaseRefresh(key)
+
+_background = set()
 
-def _get_anticheat_info(steam_id: str) -> dict:
+def _in_background(coroutine):
+	# Référence forte : une tâche sans référence peut être collectée avant la fin
+	task = asyncio.ensure_future(coroutine)
+	_background.add(task)
+	task.add_done_callback(_background.discard)
+
+async def _refresh_summary(id: str):
 	try:
-		cache_entry = AntiCheatCache.query.filter_by(steam_id=steam_id).first()
-		if not cache_entry:
-			return None
-		
-		try:
-			anticheats = json.loads(cache_entry.anticheats) if cache_entry.anticheats else []
-		except:
-			anticheats = []
-		
-		return {
-			'status': cache_entry.status,
-			'anticheats': anticheats,
-			'reference': cache_entry.reference,
-			'notes': cache_entry.notes
-		}
-	except Exception as e:
-		logging.error(f'Erreur lors de la récupération des infos anti-cheat pour {steam_id}: {e}')
-		return None
+		await _call_summary(id)
+	finally:
+		summaryCache.releaseRefresh(id)
 
-def searhProtonDb(search_name:str): 
-	results = []
-	search_name = _apply_game_aliases(search_name)
-	
+def _may_have_report(id: str, cached: dict, tasks: dict) -> bool:
+	# Jeu non atteint : sans rapport seulement si le cache ou une requête terminée l'a établi
+	if id in cached:
+		return bool(cached[id][0])
+	task = tasks[id]
+	if task.done() and not task.cancelled() and task.exception() is None:
+		return bool(task.result())
+	return True
+
+async def searchProtonDb(search_name:str, limit:int = None) -> tuple:
+	"""
+	Recherche un jeu sur ProtonDB : (résultats dans l'ordre d'Algolia, nombre de jeux ayant un rapport).
+	Quand ``limit`` interrompt la recherche, ce nombre est estimé : les jeux restants dont on ne sait
+	pas encore s'ils ont un rapport sont comptés.
+	Recherches et résumés viennent du cache quand il le permet (une entrée périmée est servie et
+	rafraîchie en tâche de fond). Les résumés manquants sont récupérés en parallèle ; dès que
+	``limit`` résultats sont prêts, les requêtes restantes sont annulées.
+	"""
+	start = time.perf_counter()
 	try:
-		_update_anticheat_cache_if_needed()
-	except Exception as e:
-		logging.error(f'Erreur lors de la mise à jour du cache anti-cheat: {e}')
-	
-	responses = _call_algoliasearch(search_name)
-	for hit in responses.model_dump().get('hits'): 
-		id = hit.get('object_id')
-		name:str = hit.get('name')
-		if (_is_name_match(name, search_name)) :
-			try:
-				summmary = _call_summary(id)
-				if (summmary != None) :
-					tier = summmary.get('tier')
-					
-					anticheat_info = None
-					try:
-						anticheat_info = _get_anticheat_info(str(id))
-					except Exception as e:
-						logging.error(f'Erreur lors de la récupération anti-cheat pour {name}: {e}')
-					
-					result = {
-						'id':id, 
-						'name' : name,
-						'tier' : tier
-					}
-					
-					if anticheat_info:
-						result['anticheat_status'] = anticheat_info.get('status')
-						result['anticheats'] = anticheat_info.get('anticheats', [])
-						result['anticheat_reference'] = anticheat_info.get('reference')
-						result['anticheat_notes'] = anticheat_info.get('notes')
-					
-					results.append(result)
-					logging.info(f'Trouvé {name}({id}) : {tier}' + (f' [Anti-cheat: {anticheat_info.get("status")}]' if anticheat_info else ''))
-			except Exception as e:
-				logging.error(f'Erreur lors du traitement du jeu {name} (ID: {id}) : {e}')
-		else:
-			logging.info(f'{name}({id}) ne contient pas {search_name}')
-	return results
+		search_name, hits, fresh = await runQuery(_search_hits, search_name)
+		if not fresh and searchCache.claimRefresh(normalizeQuery(search_name)):
+			_in_background(runQuery(_refresh_search_hits, search_name))
+		query = normalizeName(search_name)
+		matching = []
+		for hit in hits:
+			id, name = str(hit.get('object_id')), hit.get('name')
+			if query in gameIndex.normalizedName(id, name):
+				matching.append((id, name))
+			else:
+				logging.info(f'{name}({id}) ne contient pas {search_name}')
+
+		ids = [id for id, _ in matching]
+		cached, missing = summaryCache.lookup(ids)
+		if missing:
+			cached.update(await runQuery(summaryCache.load, missing))
+		tasks = {id: asyncio.ensure_future(_call_summary(id)) for id in ids if id not in cached}
+		results = []
+		more = 0
+		try:
+			for position, (id, name) in enumerate(matching):
+				if id in cached:
+					summary, fresh = cached[id]
+					if not fresh and summaryCache.claimRefresh(id):
+						_in_background(_refresh_summary(id))
+				else:
+					summary = await tasks[id]
+				if not summary:
+					continue
+				results.append({'id': id, 'name': name, 'tier': summary.get('tier')})
+				if limit and len(results) >= limit:
+					more = sum(1 for id, _ in matching[position + 1:] if _may_have_report(id, cached, tasks))
+					break
+		finally:
+			pending = [task for task in tasks.values() if not task.done()]
+			for task in pending:
+				task.cancel()
+			if pending:
+				_stats.count('cut_off', len(pending))
 
+		if results and not antiCheatIndex.loaded:
+			await runQuery(antiCheatIndex.load)
+		anticheat_infos = antiCheatIndex.get([result['id'] for result in results])
+		for result in results:
+			anticheat_info = anticheat_infos.get(result['id'])
+			if anticheat_info:
+				result['anticheat_status'] = anticheat_info.get('status')
+				result['anticheats'] = anticheat_info.get('anticheats', [])
+				result['anticheat_reference'] = anticheat_info.get('reference')
+				result['anticheat_notes'] = anticheat_info.get('notes')
+			logging.info(f'Trouvé {result["name"]}({result["id"]}) : {result["tier"]}' + (f' [Anti-cheat: {anticheat_info.get("status")}]' if anticheat_info else ''))
+		return results, len(results) + more
+	except Exception:
+		_stats.count('errors')
+		raise
+	finally:
+		_stats.record((time.perf_counter() - start) * 1000)
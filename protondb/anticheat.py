@@ -0,0 +1,197 @@
+# Statut anti-cheat des jeux (AreWeAntiCheatYet), affiché par !pdb.
+# - rafraîchissement hebdomadaire par un thread dédié (cf. run-web.py), hors de toute commande :
+#   le JSON est lu au fil du téléchargement, comparé aux lignes en base lues en une requête (moteur
+#   lecture seule), et seules les lignes nouvelles ou modifiées sont écrites (INSERT ... ON CONFLICT),
+#   un lot par connexion hors du pool de l'écrivain ;
+# - les recherches lisent un index steam_id -> infos en mémoire, chargé une fois depuis la base
+#   et remplacé à chaque rafraîchissement.
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from webapp import webapp
+from database import db, backgroundConnection
+from database.helpers import ConfigurationHelper
+from database.models import AntiCheatCache
+from database.writebehind import sqlDateTime
+from protondb.game_index import gameIndex
+
+ANTICHEAT_URL = 'https://raw.githubusercontent.com/AreWeAntiCheatYet/AreWeAntiCheatYet/master/games.json'
+REFRESH_INTERVAL = timedelta(days=7)
+CHECK_INTERVAL = 3600
+FIRST_DELAY = 60
+UPSERT_CHUNK_SIZE = 500
+_DOWNLOAD_TIMEOUT = 30
+
+_UPSERT_ROW = '''INSERT INTO anticheat_cache (steam_id, game_name, status, anticheats, reference, notes, updated_at)
+	VALUES (?, ?, ?, ?, ?, ?, ?)
+	ON CONFLICT(steam_id) DO UPDATE SET game_name = excluded.game_name, status = excluded.status,
+		anticheats = excluded.anticheats, reference = excluded.reference, notes = excluded.notes,
+		updated_at = excluded.updated_at'''
+
+_refreshLock = threading.Lock()
+_lastRefresh: dict = {}
+
+
+def _cachedRows() -> list:
+	"""Lignes de anticheat_cache, au format de _row (contexte applicatif requis, lecture seule)."""
+	return [tuple(row) for row in db.session.query(AntiCheatCache.steam_id, AntiCheatCache.game_name, AntiCheatCache.status,
+		AntiCheatCache.anticheats, AntiCheatCache.reference, AntiCheatCache.notes).all()]
+
+
+def _info(row: tuple) -> dict:
+	try:
+		anticheats = json.loads(row[3]) if row[3] else []
+	except ValueError:
+		anticheats = []
+	return {'status': row[2], 'anticheats': anticheats, 'reference': row[4], 'notes': row[5]}
+
+
+class AntiCheatIndex:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._entries = None
+
+	@property
+	def loaded(self) -> bool:
+		return self._entries is not None
+
+	def load(self):
+		"""Charge l'index depuis la base s'il ne l'est pas encore (contexte applicatif requis)."""
+		if self._entries is not None:
+			return
+		self.replace(_cachedRows())
+
+	def replace(self, rows: list):
+		entries = {row[0]: _info(row) for row in rows}
+		with self._lock:
+			self._entries = entries
+
+	def get(self, steam_ids: list) -> dict:
+		entries = self._entries or {}
+		return {steam_id: entries[steam_id] for steam_id in steam_ids if steam_id in entries}
+
+	def __len__(self) -> int:
+		return len(self._entries or {})
+
+
+antiCheatIndex = AntiCheatIndex()
+
+
+def _iterJsonArray(chunks):
+	"""Éléments d'un tableau JSON décodés au fil des morceaux de texte reçus."""
+	decoder = json.JSONDecoder()
+	buffer = ''
+	started = False
+	for chunk in chunks:
+		buffer += chunk
+		position = 0
+		while True:
+			while position < len(buffer) and buffer[position] in ' \t\r\n,':
+				position += 1
+			if position >= len(buffer):
+				break
+			if not started:
+				if buffer[position] != '[':
+					raise ValueError('le document anti-cheat n\'est pas un tableau JSON')
+				started = True
+				position += 1
+				continue
+			if buffer[position] == ']':
+				return
+			try:
+				item, position = decoder.raw_decode(buffer, position)
+			except json.JSONDecodeError:
+				# Élément coupé entre deux morceaux : on attend la suite
+				break
+			yield item
+		buffer = buffer[position:]
+	raise ValueError('document anti-cheat tronqué')
+
+
+def _row(game: dict) -> tuple | None:
+	steam_id = str((game.get('storeIds') or {}).get('steam', ''))
+	if not steam_id or steam_id == '0':
+		return None
+	anticheats = game.get('anticheats') or []
+	notes = game.get('notes', '')
+	if isinstance(notes, list):
+		notes = json.dumps(notes)
+	else:
+		notes = str(notes) if notes else ''
+	return (steam_id, game.get('name', '') or '', game.get('status', 'Unknown') or 'Unknown',
+		json.dumps(anticheats) if anticheats else None, game.get('reference', '') or '', notes)
+
+
+def _isDue() -> bool:
+	with webapp.app_context():
+		last_update = ConfigurationHelper().getValue('anticheat_last_update')
+	if not last_update:
+		return True
+	try:
+		return datetime.now() - datetime.fromisoformat(last_update) > REFRESH_INTERVAL
+	except ValueError:
+		return True
+
+
+def refreshAntiCheatCache(force: bool = False) -> dict | None:
+	"""Met à jour anticheat_cache si la dernière mise à jour date de plus d'une semaine. Retourne le résumé."""
+	with _refreshLock:
+		if not force and not _isDue():
+			return None
+		start = time.perf_counter()
+		logging.info('Mise à jour du cache anti-cheat...')
+		with requests.get(ANTICHEAT_URL, stream=True, timeout=_DOWNLOAD_TIMEOUT) as response:
+			response.raise_for_status()
+			response.encoding = 'utf-8'
+			games = {}
+			for game in _iterJsonArray(response.iter_content(chunk_size=65536, decode_unicode=True)):
+				row = _row(game) if isinstance(game, dict) else None
+				if row:
+					games[row[0]] = row
+
+		with webapp.app_context():
+			existing = {row[0]: row for row in _cachedRows()}
+		now = sqlDateTime(datetime.now())
+		changed = [row + (now,) for steam_id, row in games.items() if existing.get(steam_id) != row]
+		for offset in range(0, len(changed), UPSERT_CHUNK_SIZE):
+			# Une connexion par lot : les écritures des bots passent entre deux lots
+			with backgroundConnection() as connection:
+				connection.executemany(_UPSERT_ROW, changed[offset:offset + UPSERT_CHUNK_SIZE])
+				connection.commit()
+
+		# Les lignes absentes du document restent en base (et dans l'index), comme auparavant
+		existing.update(games)
+		antiCheatIndex.replace(list(existing.values()))
+		gameIndex.add((row[0], row[1]) for row in games.values())
+		with webapp.app_context():
+			ConfigurationHelper().createOrUpdate('anticheat_last_update', datetime.now().isoformat())
+			db.session.commit()
+
+		_lastRefresh.clear()
+		_lastRefresh.update({
+			'finished_at': datetime.now().isoformat(),
+			'games': len(games),
+			'written': len(changed),
+			'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+		})
+		logging.info(f'Cache anti-cheat mis à jour : {len(changed)} jeu(x) modifié(s) sur {len(games)}')
+		return dict(_lastRefresh)
+
+
+def runAntiCheatRefreshForever():
+	time.sleep(FIRST_DELAY)
+	while True:
+		try:
+			refreshAntiCheatCache()
+		except Exception as e:
+			logging.error(f'Erreur lors de la mise à jour du cache anti-cheat: {e}')
+		time.sleep(CHECK_INTERVAL)
+
+
+def getAntiCheatStats() -> dict:
+	return {'indexed': len(antiCheatIndex), 'loaded': antiCheatIndex.loaded, 'last_refresh': dict(_lastRefresh)}
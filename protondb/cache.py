@@ -0,0 +1,140 @@
+# Cache à deux niveaux des recherches ProtonDB : LRU en mémoire devant la table protondb_cache.
+# - « search » : jeux trouvés par Algolia pour une requête normalisée ;
+# - « summary » : résumé ProtonDB (tier) par app id Steam ;
+# chaque type a sa durée de fraîcheur. Une entrée périmée reste servie (au plus STALE_MAX)
+# pendant qu'un seul rafraîchissement est lancé en tâche de fond (stale-while-revalidate).
+# Les écritures en base passent par l'écriture différée.
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import func
+
+from database import db
+from database.models import ProtonDbCache
+from database.writebehind import writeBehind, UPSERT_PROTONDB_CACHE, sqlDateTime
+
+SEARCH_TTL = 24 * 3600
+SUMMARY_TTL = 12 * 3600
+STALE_MAX = 7 * 24 * 3600
+MEMORY_SIZE = 1000
+
+
+def normalizeQuery(search_name: str) -> str:
+	return re.sub(r'\s+', ' ', search_name.strip().lower())
+
+
+class _Entry:
+	__slots__ = ('value', 'fetched_at')
+
+	def __init__(self, value, fetched_at: float):
+		self.value = value
+		self.fetched_at = fetched_at
+
+
+class PersistentTtlCache:
+	def __init__(self, kind: str, ttl: int, max_stale: int = STALE_MAX, size: int = MEMORY_SIZE):
+		self.kind = kind
+		self.ttl = ttl
+		self.max_stale = max_stale
+		self._size = size
+		self._lock = threading.Lock()
+		self._memory = OrderedDict()
+		self._refreshing = set()
+		self._stats = {'hits': 0, 'stale_hits': 0, 'db_hits': 0, 'misses': 0, 'refreshes': 0, 'stores': 0}
+
+	def _remember(self, key: str, entry: _Entry):
+		self._memory[key] = entry
+		self._memory.move_to_end(key)
+		while len(self._memory) > self._size:
+			self._memory.popitem(last=False)
+
+	def lookup(self, keys: list) -> tuple[dict, list]:
+		"""Niveau mémoire : ({clé: (valeur, fraîche)}, clés absentes). Sans accès à la base."""
+		now = time.time()
+		found, missing = {}, []
+		with self._lock:
+			for key in keys:
+				entry = self._memory.get(key)
+				age = now - entry.fetched_at if entry is not None else None
+				if age is None or age >= self.ttl + self.max_stale:
+					missing.append(key)
+					continue
+				self._memory.move_to_end(key)
+				fresh = age < self.ttl
+				self._stats['hits' if fresh else 'stale_hits'] += 1
+				found[key] = (entry.value, fresh)
+		return found, missing
+
+	def load(self, keys: list) -> dict:
+		"""Niveau base pour les clés absentes de la mémoire (contexte applicatif requis)."""
+		if not keys:
+			return {}
+		rows = ProtonDbCache.query.filter(ProtonDbCache.kind == self.kind, ProtonDbCache.key.in_(keys)).all()
+		now = time.time()
+		found = {}
+		with self._lock:
+			for row in rows:
+				fetched_at = row.fetched_at.timestamp()
+				age = now - fetched_at
+				if age >= self.ttl + self.max_stale:
+					continue
+				value = json.loads(row.value)
+				self._remember(row.key, _Entry(value, fetched_at))
+				found[row.key] = (value, age < self.ttl)
+			self._stats['db_hits'] += len(found)
+			self._stats['misses'] += len(keys) - len(found)
+		return found
+
+	def get(self, key: str) -> tuple | None:
+		"""(valeur, fraîche) depuis la mémoire puis la base, None si absente (contexte applicatif requis)."""
+		found, missing = self.lookup([key])
+		if missing:
+			found = self.load(missing)
+		return found.get(key)
+
+	def store(self, key: str, value):
+		now = datetime.now()
+		with self._lock:
+			self._remember(key, _Entry(value, now.timestamp()))
+			self._stats['stores'] += 1
+		writeBehind.enqueue(UPSERT_PROTONDB_CACHE, (self.kind, key, json.dumps(value), sqlDateTime(now)))
+
+	def claimRefresh(self, key: str) -> bool:
+		"""True si l'appelant doit rafraîchir la clé (un seul rafraîchissement à la fois)."""
+		with self._lock:
+			if key in self._refreshing:
+				return False
+			self._refreshing.add(key)
+			self._stats['refreshes'] += 1
+			return True
+
+	def releaseRefresh(self, key: str):
+		with self._lock:
+			self._refreshing.discard(key)
+
+	def getStats(self) -> dict:
+		with self._lock:
+			stats = dict(self._stats)
+			stats['memory_size'] = len(self._memory)
+		served = stats['hits'] + stats['stale_hits'] + stats['db_hits']
+		lookups = served + stats['misses']
+		stats['hit_ratio'] = round(served / lookups, 3) if lookups else 0.0
+		return stats
+
+
+searchCache = PersistentTtlCache('search', SEARCH_TTL)
+summaryCache = PersistentTtlCache('summary', SUMMARY_TTL)
+
+
+def getCacheStats(with_database: bool = False) -> dict:
+	"""Compteurs des deux caches ; with_database ajoute le nombre d'entrées en base (contexte applicatif requis)."""
+	stats = {cache.kind: cache.getStats() for cache in (searchCache, summaryCache)}
+	if with_database:
+		counts = dict(db.session.query(ProtonDbCache.kind, func.count()).group_by(ProtonDbCache.kind).all())
+		for kind, cache_stats in stats.items():
+			cache_stats['database_size'] = counts.get(kind, 0)
+	return stats
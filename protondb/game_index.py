@@ -0,0 +1,230 @@
+# Index local des noms de jeux pour !pdb, alimenté par le jeu de données anti-cheat, les jeux
+# déjà renvoyés par Algolia (cache des recherches) et les alias :
+# - noms normalisés une fois, comme pour la comparaison avec la recherche (minuscules, [a-z0-9]) ;
+# - postings de trigrammes : les jeux dont le nom contient la recherche sont trouvés par
+#   intersection de listes, sans parcourir l'index ;
+# - alias réécrits en une seule passe par une expression compilée (alias les plus longs d'abord,
+#   un groupe par alias), reconstruite après un commit qui touche game_alias.
+# - noms normalisés triés : complétion par préfixe (autocomplétion de /protondb) par dichotomie.
+# Un titre connu exactement est résolu en app ids sans appel à Algolia (cf. _search_hits).
+import json
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import db
+from database.models import AntiCheatCache, GameAlias, ProtonDbCache
+
+_NON_ALNUM = re.compile('[^a-z0-9]')
+_GRAM = 3
+# Au-delà, un ajout trie la liste des préfixes en une fois plutôt que d'insérer nom par nom
+_BULK_INSERT = 64
+# Autocomplétion : au-delà de ce nombre de candidats, la saisie est trop générale pour la
+# recherche par sous-chaîne (seuls les préfixes sont proposés)
+_COMPLETE_CANDIDATES = 2000
+
+
+def normalizeName(name: str | None) -> str:
+	return _NON_ALNUM.sub('', name.lower()) if name else ''
+
+
+def _trigrams(normalized: str) -> set:
+	return {normalized[i:i + _GRAM] for i in range(len(normalized) - _GRAM + 1)}
+
+
+class GameIndex:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._names = {}
+		self._normalized = {}
+		self._exact = defaultdict(set)
+		self._postings = defaultdict(set)
+		self._prefixes = []
+		self._loaded = False
+		# (nom de chaque groupe de l'expression, expression compilée) ; None tant qu'ils sont à (re)charger
+		self._aliases = None
+		self._alias_generation = 0
+		self._stats = {'lookups': 0, 'resolved': 0, 'rewrites': 0, 'completions': 0}
+
+	@property
+	def loaded(self) -> bool:
+		return self._loaded
+
+	def load(self):
+		"""Charge les noms connus et les alias s'ils ne le sont pas encore (contexte applicatif requis)."""
+		if not self._loaded:
+			start = time.perf_counter()
+			games = db.session.query(AntiCheatCache.steam_id, AntiCheatCache.game_name).all()
+			for (value,) in db.session.query(ProtonDbCache.value).filter(ProtonDbCache.kind == 'search'):
+				try:
+					games.extend((hit.get('object_id'), hit.get('name')) for hit in json.loads(value))
+				except (ValueError, AttributeError):
+					continue
+			self.add(games)
+			with self._lock:
+				self._loaded = True
+				self._stats['load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+		if self._aliases is None:
+			self._loadAliases()
+
+	def _loadAliases(self):
+		with self._lock:
+			generation = self._alias_generation
+		aliases = {}
+		for alias, name in db.session.query(GameAlias.alias, GameAlias.name):
+			if alias and name:
+				aliases.setdefault(alias.lower(), name)
+		# Nom retrouvé par le numéro du groupe et non par le texte trouvé : sans tenir compte de la
+		# casse, 'İ' trouve 'i' et 'ſ' trouve 's' sans redonner l'alias une fois en minuscules
+		ordered = sorted(aliases, key=len, reverse=True)
+		names = [aliases[alias] for alias in ordered]
+		pattern = None
+		if ordered:
+			pattern = re.compile('|'.join(f'({re.escape(alias)})' for alias in ordered), re.IGNORECASE)
+		with self._lock:
+			if generation == self._alias_generation:
+				self._aliases = (names, pattern)
+
+	def invalidateAliases(self):
+		with self._lock:
+			self._aliases = None
+			self._alias_generation += 1
+
+	def rewriteAliases(self, search_name: str) -> str:
+		"""Remplace les alias de la recherche par le nom du jeu, en une passe."""
+		current = self._aliases
+		if current is None or current[1] is None:
+			return search_name
+		names, pattern = current
+		rewritten = pattern.sub(lambda match: names[match.lastindex - 1], search_name)
+		if rewritten != search_name:
+			self._stats['rewrites'] += 1
+		return rewritten
+
+	def add(self, games):
+		"""Ajoute ou met à jour des jeux (app id, nom)."""
+		with self._lock:
+			added = []
+			for id, name in games:
+				id = str(id) if id else ''
+				normalized = normalizeName(name)
+				if not id or not normalized:
+					continue
+				self._names[id] = name
+				previous = self._normalized.get(id)
+				if previous == normalized:
+					continue
+				if previous is not None:
+					self._exact[previous].discard(id)
+					for gram in _trigrams(previous):
+						self._postings[gram].discard(id)
+					position = bisect_left(self._prefixes, (previous, id))
+					if position < len(self._prefixes) and self._prefixes[position] == (previous, id):
+						del self._prefixes[position]
+				self._normalized[id] = normalized
+				self._exact[normalized].add(id)
+				for gram in _trigrams(normalized):
+					self._postings[gram].add(id)
+				added.append((normalized, id))
+			if len(added) > _BULK_INSERT:
+				self._prefixes.extend(added)
+				self._prefixes.sort()
+			else:
+				for entry in added:
+					insort(self._prefixes, entry)
+
+	def normalizedName(self, id: str, name: str | None) -> str:
+		"""Nom normalisé, sans recalcul quand le jeu est connu sous ce nom."""
+		if self._names.get(id) == name:
+			normalized = self._normalized.get(id)
+			if normalized is not None:
+				return normalized
+		return normalizeName(name)
+
+	def _containing(self, query: str, max_candidates: int | None = None) -> list:
+		grams = sorted((self._postings.get(gram, ()) for gram in _trigrams(query)), key=len)
+		if not grams or not grams[0] or (max_candidates and len(grams[0]) > max_candidates):
+			return []
+		candidates = set(grams[0])
+		for posting in grams[1:]:
+			candidates &= posting
+			if not candidates:
+				return []
+		return [id for id in candidates if query in self._normalized[id]]
+
+	def resolve(self, search_name: str) -> list | None:
+		"""
+		Jeux connus dont le nom contient la recherche, au format des résultats Algolia, si un jeu
+		porte exactement ce nom ; None sinon (la recherche doit passer par Algolia).
+		"""
+		query = normalizeName(search_name)
+		with self._lock:
+			self._stats['lookups'] += 1
+			if len(query) < _GRAM or not self._exact.get(query):
+				return None
+			ids = self._containing(query)
+			self._stats['resolved'] += 1
+			names = self._names
+			normalized = self._normalized
+			ids.sort(key=lambda id: (normalized[id] != query, len(normalized[id]), names[id]))
+			return [{'object_id': id, 'name': names[id]} for id in ids]
+
+	def complete(self, prefix: str, limit: int = 25) -> list:
+		"""
+		Noms de jeux connus pour l'autocomplétion : ceux qui commencent par la saisie, puis ceux
+		qui la contiennent, sans doublon ni accès à la base.
+		"""
+		query = normalizeName(prefix)
+		with self._lock:
+			self._stats['completions'] += 1
+			if not query:
+				return []
+			names, seen = [], set()
+			prefixes = self._prefixes
+			for position in range(bisect_left(prefixes, (query,)), len(prefixes)):
+				normalized, id = prefixes[position]
+				if not normalized.startswith(query) or len(names) >= limit:
+					break
+				if normalized not in seen:
+					seen.add(normalized)
+					names.append(self._names[id])
+			if len(names) < limit and len(query) >= _GRAM:
+				for id in sorted(self._containing(query, _COMPLETE_CANDIDATES), key=lambda id: len(self._normalized[id])):
+					if len(names) >= limit:
+						break
+					if self._normalized[id] not in seen:
+						seen.add(self._normalized[id])
+						names.append(self._names[id])
+			return names
+
+	def getStats(self) -> dict:
+		with self._lock:
+			return {**self._stats, 'loaded': self._loaded, 'games': len(self._names),
+				'trigrams': len(self._postings), 'aliases': len(self._aliases[0]) if self._aliases else 0}
+
+
+gameIndex = GameIndex()
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackAliasChanges(session, flush_context, instances):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if isinstance(obj, GameAlias):
+			session.info['game_aliases_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidateAfterCommit(session):
+	if session.info.pop('game_aliases_changed', False):
+		gameIndex.invalidateAliases()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('game_aliases_changed', None)
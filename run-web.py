@@ -1,5 +1,6 @@
 import locale
 import logging
+import signal
 import threading
 import os
 from logging.handlers import RotatingFileHandler
@@ -7,18 +8,31 @@ from logging.handlers import RotatingFileHandler
 from webapp import webapp
 from discordbot import bot
 from twitchbot import twitchBot
+from database.writebehind import writeBehind
+from database.retention import runRetentionForever
+from protondb.anticheat import runAntiCheatRefreshForever
+from webapp.panel_events import MAX_SUBSCRIBERS
 
 
 def start_server(): 
     logging.info("Démarrage du serveur web")
     from waitress import serve
-    serve(webapp, host="0.0.0.0", port=5000)
+    # Chaque flux SSE du panneau garde un thread : on en prévoit assez pour les requêtes ordinaires
+    serve(webapp, host="0.0.0.0", port=5000, threads=MAX_SUBSCRIBERS + 8)
 
 def start_discord_bot():
     logging.info("Démarrage du bot Discord")
     with webapp.app_context():
         bot.begin()
 
+def start_retention():
+    logging.info("Démarrage de la rétention des données")
+    runRetentionForever()
+
+def start_anticheat_refresh():
+    logging.info("Démarrage de la mise à jour du cache anti-cheat")
+    runAntiCheatRefreshForever()
+
 def start_twitch_bot():
     logging.info("Démarrage du bot Twitch")
     with webapp.app_context():
@@ -53,10 +67,20 @@ if __name__ == '__main__':
 
     locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
 
+    # Arrêt (docker stop, Ctrl+C) : vider les écritures différées avant de quitter
+    def _shutdown(signum, frame):
+        logging.info("Arrêt demandé, écriture des journaux en attente")
+        writeBehind.flushAndStop()
+        os._exit(0)
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
     jobs = []
     jobs.append(threading.Thread(target=start_discord_bot, name='discord-bot'))
     jobs.append(threading.Thread(target=start_server, name='web-server'))
     jobs.append(threading.Thread(target=start_twitch_bot, name='twitch-bot'))
+    jobs.append(threading.Thread(target=start_retention, name='retention', daemon=True))
+    jobs.append(threading.Thread(target=start_anticheat_refresh, name='anticheat-refresh', daemon=True))
 
     for job in jobs:
         job.start()
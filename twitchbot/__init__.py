@@ -1,13 +1,15 @@
 import asyncio
 import logging
 import time
+from datetime import datetime
 
 from twitchAPI.twitch import Twitch
 from twitchAPI.type import AuthScope, ChatEvent
 from twitchAPI.chat import Chat, ChatEvent, ChatMessage, EventData
 
+from database.executor import runQuery, runWrite
 from database.helpers import ConfigurationHelper
-from database.models import Commande
+from database.commands import getRouter, loadRouter
 
 
 def _user_has_twitch_permission(msg: ChatMessage, required: str) -> bool:
@@ -28,7 +30,12 @@ from twitchbot.announcements import checkAndSendAnnouncements, incrementMessageC
 from twitchbot import moderation
 from twitchbot import link_filter
 from twitchbot import event_notifications
+from twitchbot.user_ids import userIds
+from twitchbot.pipeline import MessagePipeline, MessageContext
+from twitchbot.helix import helix, helixPriority, PRIORITY_BACKGROUND
+from twitchbot.chat_queue import chatQueue
 from webapp import webapp
+from webapp.chat_activity import twitchChat, ChatRecord
 
 USER_SCOPE = [
     AuthScope.CHAT_READ,
@@ -53,86 +60,97 @@ async def _onReady(ready_event: EventData):
 		await ready_event.chat.join_room(channel)
 		# EventSub (follow, sub, raid) : besoin du broadcaster_id
 		try:
-			from twitchAPI.helper import first
-			user = await first(twitchBot.twitch.get_users(logins=[channel]))
-			if user:
+			broadcaster_id = await userIds.resolve(twitchBot.twitch, channel)
+			if broadcaster_id:
 				twitchBot._eventsub = event_notifications.create_eventsub(twitchBot.twitch, asyncio.get_event_loop())
-				asyncio.create_task(event_notifications.register_eventsub_handlers(twitchBot._eventsub, user.id, ready_event.chat, channel))
+				asyncio.create_task(event_notifications.register_eventsub_handlers(twitchBot._eventsub, broadcaster_id, ready_event.chat, channel))
 		except Exception as e:
 			logging.warning('EventSub non démarré: %s', e)
-	asyncio.get_event_loop().create_task(twitchBot._checkOnlineStreamers())
-	asyncio.get_event_loop().create_task(twitchBot._runAnnouncements())
-	asyncio.get_event_loop().create_task(twitchBot._checkClips())
+	# Boucles de fond : leurs requêtes Helix passent après la modération et les commandes
+	with helixPriority(PRIORITY_BACKGROUND):
+		asyncio.get_event_loop().create_task(twitchBot._checkOnlineStreamers())
+		asyncio.get_event_loop().create_task(twitchBot._runAnnouncements())
+		asyncio.get_event_loop().create_task(twitchBot._checkClips())
 
 
-async def _onMessage(msg: ChatMessage):
+async def _accountMessage(ctx: MessageContext) -> bool:
+	msg = ctx.msg
 	logging.info(f'Dans {msg.room.name}, {msg.user.name} a dit : {msg.text}')
 	incrementMessageCount()
-	
-	# Stocker le message dans BOT_STATUS pour l'affichage web
+	userIds.seedFromMessage(msg)
+	# Stocker le message pour l'affichage web (deque borné, compteurs de débit en O(1))
+	twitchChat.record(ChatRecord(
+		msg.user.name,
+		msg.text,
+		datetime.fromtimestamp(ctx.received_at).isoformat(),
+		msg.user.mod,
+		msg.user.subscriber,
+		msg.user.vip,
+		getattr(msg.user, 'color', None) or '#9146FF',
+	))
+	return True
+
+
+async def _commandStage(ctx: MessageContext) -> bool:
+	await _handleCustomCommand(ctx.msg)
+	return True
+
+
+messagePipeline = MessagePipeline([
+	('accounting', _accountMessage),
+	('link_filter', lambda ctx: link_filter.check_message_for_links(ctx.msg, ctx.twitch)),
+	('banned_words', lambda ctx: moderation.check_message_for_banned_words(ctx.msg, ctx.twitch)),
+	('flood', lambda ctx: moderation.check_message_for_flood(ctx.msg, ctx.twitch)),
+	('commands', _commandStage),
+])
+
+
+async def _onMessage(msg: ChatMessage):
+	# Un seul contexte applicatif pour toutes les étapes du message
 	with webapp.app_context():
-		from datetime import datetime
-		now_ts = time.time()
-		msg_timestamps = webapp.config["BOT_STATUS"].setdefault("twitch_msg_timestamps", [])
-		msg_timestamps.append(now_ts)
-		cutoff = now_ts - 60
-		webapp.config["BOT_STATUS"]["twitch_msg_timestamps"] = [ts for ts in msg_timestamps if ts >= cutoff]
-		webapp.config["BOT_STATUS"]["twitch_msg_per_minute"] = len(webapp.config["BOT_STATUS"]["twitch_msg_timestamps"])
-
-		message_data = {
-			'username': msg.user.name,
-			'text': msg.text,
-			'timestamp': datetime.now().isoformat(),
-			'is_mod': msg.user.mod,
-			'is_subscriber': msg.user.subscriber,
-			'is_vip': msg.user.vip,
-			'color': getattr(msg.user, 'color', None) or '#9146FF'
-		}
-		messages = webapp.config["BOT_STATUS"]["twitch_chat_messages"]
-		messages.append(message_data)
-		# Limiter à 100 messages
-		if len(messages) > 100:
-			messages.pop(0)
-	
-	if not await link_filter.check_message_for_links(msg, twitchBot.twitch):
-		return
-	if not await moderation.check_message_for_banned_words(msg, twitchBot.twitch):
-		return
-	await _handleCustomCommand(msg)
+		await messagePipeline.run(MessageContext(msg, twitchBot.twitch))
 
 
 async def _handleCustomCommand(msg: ChatMessage):
 	if not msg.text.startswith('!'):
 		return
-	trigger = msg.text.split()[0].lower()
-	with webapp.app_context():
-		# Vérifier si les commandes Twitch sont activées globalement
-		if not ConfigurationHelper().getValue('twitch_commands_enable'):
+	trigger = msg.text.split()[0]
+	# Vérifier si les commandes Twitch sont activées globalement
+	if not ConfigurationHelper().getValue('twitch_commands_enable'):
+		return
+	# Une recherche dans l'index en mémoire, rechargé seulement après une modification
+	router = getRouter() or await runQuery(loadRouter)
+	commande = router.find('twitch', trigger)
+	if commande:
+		if not _user_has_twitch_permission(msg, commande.twitch_permission):
 			return
-		commande = Commande.query.filter_by(trigger=trigger, twitch_enable=True).first()
-		if commande:
-			permission = commande.twitch_permission or 'viewer'
-			if not _user_has_twitch_permission(msg, permission):
-				return
-			response = _replace_command_variables(commande.response, msg)
-			await msg.reply(response)
-
+		response = commande.template.render(_command_variables(commande.template.variables, msg))
+		chatQueue.reply(msg, response)
 
-def _replace_command_variables(text: str, msg: ChatMessage) -> str:
-	"""Remplace les variables de template dans la réponse d'une commande."""
-	from datetime import datetime
-
-	result = text
-	result = result.replace('{user}', msg.user.name)
-	result = result.replace('{username}', msg.user.name)
-	result = result.replace('{channel}', msg.room.name)
 
+def _command_variables(variables: frozenset, msg: ChatMessage) -> dict:
+	"""Valeurs des seules variables utilisées par le modèle de réponse."""
+	values = {}
+	if not variables:
+		return values
 	bot_status = webapp.config.get("BOT_STATUS", {})
-	result = result.replace('{title}', bot_status.get("twitch_stream_title", ""))
-	result = result.replace('{game}', bot_status.get("twitch_game_name", ""))
-	result = result.replace('{viewers}', str(bot_status.get("twitch_viewer_count", 0)))
-
-	uptime_str = "hors ligne"
+	for name in variables:
+		if name in ('user', 'username'):
+			values[name] = msg.user.name
+		elif name == 'channel':
+			values[name] = msg.room.name
+		elif name == 'title':
+			values[name] = bot_status.get("twitch_stream_title", "")
+		elif name == 'game':
+			values[name] = bot_status.get("twitch_game_name", "")
+		elif name == 'viewers':
+			values[name] = str(bot_status.get("twitch_viewer_count", 0))
+		elif name == 'uptime':
+			values[name] = _stream_uptime(bot_status)
+	return values
+
+
+def _stream_uptime(bot_status: dict) -> str:
 	started_at_str = bot_status.get("twitch_started_at")
 	if started_at_str and bot_status.get("twitch_is_live", False):
 		try:
@@ -142,18 +160,15 @@ def _replace_command_variables(text: str, msg: ChatMessage) -> str:
 			hours, remainder = divmod(max(0, total_seconds), 3600)
 			minutes, _ = divmod(remainder, 60)
 			if hours > 0:
-				uptime_str = f"{hours}h {minutes:02d}min"
-			else:
-				uptime_str = f"{minutes}min"
+				return f"{hours}h {minutes:02d}min"
+			return f"{minutes}min"
 		except (ValueError, TypeError):
 			pass
-	result = result.replace('{uptime}', uptime_str)
-
-	return result
+	return "hors ligne"
 
 
 async def _helloCommand(msg: ChatMessage):
-	await msg.reply(f'Bonjour {msg.user.name}')
+	chatQueue.reply(msg, f'Bonjour {msg.user.name}')
 
 
 def _isConfigured():
@@ -175,8 +190,10 @@ class TwitchBot():
 				try:
 					helper = ConfigurationHelper()
 					self.twitch = await Twitch(helper.getValue('twitch_client_id'), helper.getValue('twitch_client_secret'))
+					helix.attach(self.twitch)
 					await self.twitch.set_user_authentication(helper.getValue('twitch_access_token'), USER_SCOPE, helper.getValue('twitch_refresh_token'))
 					self.chat = await Chat(self.twitch)
+					chatQueue.attach(self.chat)
 					# Laisser des tentatives de reconnexion internes plus longues avant reboot complet du client
 					self.chat.reconnect_delay_steps = [0, 1, 2, 4, 8, 16, 32, 64, 128, 128, 128]
 					self.chat.register_event(ChatEvent.READY, _onReady)
@@ -288,30 +305,24 @@ class TwitchBot():
 			return
 		from twitchAPI.helper import first
 		try:
-			user = await first(self.twitch.get_users(logins=[channel]))
-			if not user:
+			broadcaster_id = await userIds.resolve(self.twitch, channel)
+			if not broadcaster_id:
 				return
 		except Exception:
 			return
 		while True:
 			try:
-				with webapp.app_context():
-					from database.models import TwitchEventNotification
-					cfg = TwitchEventNotification.query.filter_by(event_type='clip', enable=True).first()
+				from database.models import TwitchEventNotification
+				cfg = await runQuery(lambda: TwitchEventNotification.query.filter_by(event_type='clip', enable=True).first())
 				if not cfg:
 					await asyncio.sleep(120)
 					continue
-				clip = await first(self.twitch.get_clips(broadcaster_id=user.id, first=1))
+				clip = await first(self.twitch.get_clips(broadcaster_id=broadcaster_id, first=1))
 				if not clip:
 					await asyncio.sleep(120)
 					continue
 				if cfg.last_clip_id is None:
-					with webapp.app_context():
-						from database import db
-						cfg = TwitchEventNotification.query.filter_by(event_type='clip', enable=True).first()
-						if cfg:
-							cfg.last_clip_id = clip.id
-							db.session.commit()
+					await runWrite(lambda: TwitchEventNotification.query.filter_by(event_type='clip', enable=True).update({'last_clip_id': clip.id}))
 				elif clip.id != cfg.last_clip_id:
 					with webapp.app_context():
 						await event_notifications.notify_clip(
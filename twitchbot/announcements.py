@@ -4,8 +4,10 @@ from datetime import datetime, timedelta
 from twitchAPI.chat import Chat
 from twitchAPI.twitch import Twitch
 
-from database import db
+from database.executor import runQuery, runWrite
 from database.models import TwitchAnnouncement
+from twitchbot.helix import helix
+from twitchbot.chat_queue import chatQueue, PRIORITY_ANNOUNCEMENT
 from webapp import webapp
 
 logger = logging.getLogger('twitch-announcements')
@@ -32,9 +34,12 @@ def _getAndResetMessageCount() -> int:
 
 async def _is_channel_live(twitch: Twitch, channel: str) -> bool:
 	"""Vérifie si la chaîne Twitch est actuellement en live."""
-	try:
+	async def fetch():
 		async for _ in twitch.get_streams(user_login=[channel]):
 			return True
+		return False
+	try:
+		return await helix.coalesce(('streams', channel.lower()), fetch)
 	except Exception as e:
 		logger.warning(f'Impossible de vérifier le statut live de {channel}: {e}')
 	return False
@@ -52,7 +57,7 @@ async def checkAndSendAnnouncements(chat: Chat, channel: str, twitch: Twitch):
 		if not await _is_channel_live(twitch, channel):
 			return
 
-		announcements: list[TwitchAnnouncement] = TwitchAnnouncement.query.filter_by(enable=True).order_by(TwitchAnnouncement.id).all()
+		announcements: list[TwitchAnnouncement] = await runQuery(lambda: TwitchAnnouncement.query.filter_by(enable=True).order_by(TwitchAnnouncement.id).all())
 		if not announcements:
 			return
 
@@ -83,7 +88,7 @@ async def checkAndSendAnnouncements(chat: Chat, channel: str, twitch: Twitch):
 			await _sendAnnouncement(chat, channel, announcement)
 			announcement.last_sent = now
 			_last_announcement_index = announcements.index(announcement)
-			db.session.commit()
+			await runWrite(lambda: TwitchAnnouncement.query.filter_by(id=announcement.id).update({'last_sent': now}))
 			logger.info(f'Annonce envoyée : {announcement.name} (après {message_count} messages)')
 		except Exception as e:
 			logger.error(f'Erreur lors de l\'envoi de l\'annonce "{announcement.name}": {e}')
@@ -132,6 +137,7 @@ def _shouldSend(announcement: TwitchAnnouncement, now: datetime) -> bool:
 
 async def _sendAnnouncement(chat: Chat, channel: str, announcement: TwitchAnnouncement):
 	"""
-	Envoie une annonce dans le chat Twitch.
+	Envoie une annonce dans le chat Twitch (priorité la plus basse de la file d'envoi).
 	"""
-	await chat.send_message(channel, announcement.text)
+	if not await chatQueue.send(channel, announcement.text, PRIORITY_ANNOUNCEMENT):
+		raise RuntimeError("annonce abandonnée par la file d'envoi")
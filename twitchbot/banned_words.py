@@ -0,0 +1,182 @@
+# Détection des mots interdits du chat Twitch par automate d'Aho-Corasick.
+# L'automate est construit une fois à partir de la table twitch_banned_word puis reconstruit
+# uniquement après un commit qui la modifie : chaque message est parcouru en une seule passe,
+# quel que soit le nombre de règles, sans requête en base.
+#
+# Modes d'une règle :
+# - contenu (défaut) : le mot peut apparaître dans un autre mot ;
+# - mot entier (whole_word) : le mot doit être délimité par des caractères non alphanumériques ;
+# - joker : « * » dans le mot remplace n'importe quelle suite de lettres (ex. « idiot* ») ;
+# - leet : le message est normalisé (4 → a, 3 → e, 0 → o, @ → a...) avant la comparaison.
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('twitch-moderation')
+
+# Substitutions caractère pour caractère : les positions du texte normalisé sont celles du message.
+# La ponctuation courante (!, |, +) n'est pas substituée pour ne pas casser les limites de mots.
+LEET_TABLE = str.maketrans({
+	'4': 'a', '@': 'a', '8': 'b', '3': 'e', '6': 'g', '9': 'g', '1': 'i',
+	'0': 'o', '5': 's', '$': 's', '7': 't', '2': 'z',
+})
+_WORD_CHAR = re.compile(r'\w')
+
+
+def normalizeLeet(text: str) -> str:
+	return text.translate(LEET_TABLE)
+
+
+class BannedWordRule:
+	__slots__ = ('id', 'word', 'timeout_duration', 'whole_word', 'leet', 'keyword', 'regex')
+
+	def __init__(self, id: int, word: str, timeout_duration: int, whole_word: bool = False, leet: bool = False):
+		self.id = id
+		self.word = word
+		self.timeout_duration = timeout_duration
+		self.whole_word = whole_word
+		self.leet = leet
+		pattern = normalizeLeet(word.lower()) if leet else word.lower()
+		segments = pattern.split('*')
+		# Le plus long segment littéral sert d'ancre dans l'automate ; le reste est vérifié par regex
+		self.keyword = max(segments, key=len)
+		self.regex = None
+		if len(segments) > 1:
+			body = r'\w*'.join(re.escape(segment) for segment in segments)
+			if whole_word:
+				body = rf'(?<!\w){body}(?!\w)'
+			self.regex = re.compile(body)
+
+
+class BannedWordMatcher:
+	"""Automate d'Aho-Corasick sur les ancres des règles, vérification des modes à la volée."""
+
+	def __init__(self, rules: list):
+		self.rules = [rule for rule in rules if rule.keyword]
+		self._goto = [{}]
+		self._fail = [0]
+		self._out = [()]
+		for rule in self.rules:
+			self._add(rule)
+		self._link()
+
+	def _add(self, rule: BannedWordRule):
+		# Les ancres sont indexées normalisées : une seule passe sur le message normalisé suffit,
+		# les règles sans leet sont ensuite comparées au message d'origine (mêmes positions)
+		state = 0
+		for char in normalizeLeet(rule.keyword):
+			next_state = self._goto[state].get(char)
+			if next_state is None:
+				next_state = len(self._goto)
+				self._goto[state][char] = next_state
+				self._goto.append({})
+				self._fail.append(0)
+				self._out.append(())
+			state = next_state
+		self._out[state] += (rule,)
+
+	def _link(self):
+		queue = deque(self._goto[0].values())
+		while queue:
+			state = queue.popleft()
+			for char, next_state in self._goto[state].items():
+				queue.append(next_state)
+				fallback = self._fail[state]
+				while fallback and char not in self._goto[fallback]:
+					fallback = self._fail[fallback]
+				self._fail[next_state] = self._goto[fallback].get(char, 0)
+				self._out[next_state] += self._out[self._fail[next_state]]
+
+	def match(self, text: str) -> BannedWordRule | None:
+		"""Première règle (par position de fin dans le message) qui correspond, sinon None."""
+		if not self.rules:
+			return None
+		lowered = text.lower()
+		normalized = normalizeLeet(lowered)
+		goto, fail, out = self._goto, self._fail, self._out
+		state = 0
+		for end, char in enumerate(normalized, 1):
+			while state and char not in goto[state]:
+				state = fail[state]
+			state = goto[state].get(char, 0)
+			for rule in out[state]:
+				if self._accept(rule, lowered, normalized, end):
+					return rule
+		return None
+
+	@staticmethod
+	def _accept(rule: BannedWordRule, lowered: str, normalized: str, end: int) -> bool:
+		subject = normalized if rule.leet else lowered
+		if rule.regex is not None:
+			return rule.regex.search(subject) is not None
+		start = end - len(rule.keyword)
+		if not rule.leet and lowered[start:end] != rule.keyword:
+			return False
+		if rule.whole_word:
+			if start > 0 and _WORD_CHAR.match(subject[start - 1]):
+				return False
+			if end < len(subject) and _WORD_CHAR.match(subject[end]):
+				return False
+		return True
+
+
+_lock = threading.Lock()
+_matcher: BannedWordMatcher | None = None
+_generation = 0
+
+
+def buildMatcher() -> BannedWordMatcher:
+	"""Construit l'automate depuis les mots interdits actifs (contexte applicatif requis)."""
+	# Import local : le module reste utilisable sans application Flask (benchmarks)
+	from database.models import TwitchBannedWord
+	global _matcher
+	with _lock:
+		if _matcher is not None:
+			return _matcher
+		generation = _generation
+	start = time.perf_counter()
+	rows = TwitchBannedWord.query.filter_by(enabled=True).all()
+	matcher = BannedWordMatcher([
+		BannedWordRule(row.id, row.word, row.timeout_duration or 0, bool(row.whole_word), bool(row.leet)) for row in rows
+	])
+	logger.info(f"Automate des mots interdits construit : {len(matcher.rules)} règle(s), {len(matcher._goto)} états en {(time.perf_counter() - start) * 1000:.1f} ms")
+	with _lock:
+		if generation == _generation:
+			_matcher = matcher
+	return matcher
+
+
+def getMatcher() -> BannedWordMatcher | None:
+	"""Automate courant, None s'il doit être (re)construit."""
+	return _matcher
+
+
+def invalidateMatcher():
+	global _matcher, _generation
+	with _lock:
+		_matcher = None
+		_generation += 1
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackBannedWordChanges(session, flush_context, instances):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if getattr(obj, '__tablename__', None) == 'twitch_banned_word':
+			session.info['banned_words_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidateAfterCommit(session):
+	if session.info.pop('banned_words_changed', False):
+		invalidateMatcher()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('banned_words_changed', None)
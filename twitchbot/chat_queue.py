@@ -0,0 +1,192 @@
+# File d'envoi des messages du bot dans le chat Twitch, par salon.
+# Twitch n'accepte que 20 messages / 30 s d'un compte sans privilège (100 pour un modérateur,
+# le broadcaster ou un VIP) ; au-delà les messages sont ignorés. Tous les envois du bot
+# (réponses, annonces, remerciements, panneau) passent donc par cette file :
+# - fenêtre glissante de 30 s dont la taille suit le statut du bot dans le salon (USERSTATE) ;
+# - priorités : réponses et panneau > remerciements d'événements > annonces ;
+# - un message identique déjà en attente n'est pas dupliqué ;
+# - un message qui attend plus que sa durée de vie, ou qui ne trouve pas de place dans une
+#   file pleine, est abandonné. Abandons et retards sont comptés et journalisés.
+# S'exécute sur la boucle du bot Twitch (le panneau y soumet ses envois).
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from twitchAPI.chat import Chat, ChatMessage
+
+logger = logging.getLogger('twitch-chat-queue')
+
+PRIORITY_REPLY = 0
+PRIORITY_EVENT = 1
+PRIORITY_ANNOUNCEMENT = 2
+_LANES = {PRIORITY_REPLY: 'reply', PRIORITY_EVENT: 'event', PRIORITY_ANNOUNCEMENT: 'announcement'}
+# Durée de vie d'un message en attente : une réponse périmée n'a plus de sens, une annonce peut attendre
+MAX_DELAY = {PRIORITY_REPLY: 30, PRIORITY_EVENT: 60, PRIORITY_ANNOUNCEMENT: 180}
+
+WINDOW = 30
+USER_LIMIT = 20
+PRIVILEGED_LIMIT = 100
+MAX_PENDING = 50
+# Marge pour l'horloge de Twitch : on ne remplit jamais complètement la fenêtre
+_SAFETY = 1
+
+
+class _Outgoing:
+	__slots__ = ('text', 'reply_to', 'priority', 'queued_at', 'future')
+
+	def __init__(self, text: str, reply_to: str | None, priority: int, future: asyncio.Future):
+		self.text = text
+		self.reply_to = reply_to
+		self.priority = priority
+		self.queued_at = time.monotonic()
+		self.future = future
+
+
+class _Channel:
+	def __init__(self, name: str):
+		self.name = name
+		self.pending = []
+		self.index = {}
+		self.sent = deque()
+		self.worker = None
+		self.wake = asyncio.Event()
+
+
+class ChatSendQueue:
+	def __init__(self):
+		self._chat = None
+		self._loop = None
+		self._channels = {}
+		self._privileged = {}
+		self._sequence = itertools.count()
+		self._stats = {lane: {'sent': 0, 'coalesced': 0, 'dropped_full': 0, 'dropped_expired': 0,
+			'errors': 0, 'delayed': 0, 'total_delay_ms': 0.0, 'max_delay_ms': 0.0} for lane in _LANES}
+
+	def attach(self, chat: Chat):
+		"""Suit le statut du bot (modérateur, broadcaster, VIP) dans chaque salon à partir de USERSTATE."""
+		self._chat = chat
+		self._loop = None
+		original = chat._handle_user_state
+
+		async def handle_user_state(parsed: dict):
+			await original(parsed)
+			badges = parsed['tags'].get('badges') or {}
+			channel = parsed['command']['channel'][1:]
+			self._privileged[channel] = parsed['tags'].get('mod') == '1' or 'broadcaster' in badges or 'vip' in badges
+
+		chat._handle_user_state = handle_user_state
+
+	def _bind(self):
+		loop = asyncio.get_running_loop()
+		if loop is not self._loop:
+			self._loop = loop
+			self._channels = {}
+
+	def _limit(self, channel: str) -> int:
+		return (PRIVILEGED_LIMIT if self._privileged.get(channel) else USER_LIMIT) - _SAFETY
+
+	def send(self, channel: str, text: str, priority: int = PRIORITY_REPLY) -> asyncio.Future:
+		"""Met un message en file ; le futur vaut True une fois envoyé, False s'il est abandonné."""
+		return self._enqueue(channel.lstrip('#').lower(), text, None, priority)
+
+	def reply(self, msg: ChatMessage, text: str, priority: int = PRIORITY_REPLY) -> asyncio.Future:
+		return self._enqueue(msg.room.name.lower(), text, msg.id, priority)
+
+	def _enqueue(self, channel_name: str, text: str, reply_to: str | None, priority: int) -> asyncio.Future:
+		self._bind()
+		text = text[:500]
+		channel = self._channels.get(channel_name)
+		if channel is None:
+			channel = self._channels[channel_name] = _Channel(channel_name)
+		stats = self._stats[priority]
+		key = (text, reply_to)
+		existing = channel.index.get(key)
+		if existing is not None and not existing.future.done():
+			stats['coalesced'] += 1
+			return existing.future
+		future = self._loop.create_future()
+		if len(channel.pending) >= MAX_PENDING:
+			# File pleine : le nouveau message n'entre que s'il est plus prioritaire que le dernier en attente
+			worst = max(channel.pending)
+			if priority >= worst[0]:
+				stats['dropped_full'] += 1
+				logger.warning(f"File d'envoi pleine pour #{channel_name}, message abandonné : {text[:80]}")
+				future.set_result(False)
+				return future
+			channel.pending.remove(worst)
+			heapq.heapify(channel.pending)
+			self._drop(channel, worst[2], 'dropped_full')
+		message = _Outgoing(text, reply_to, priority, future)
+		heapq.heappush(channel.pending, (priority, next(self._sequence), message))
+		channel.index[key] = message
+		if channel.worker is None or channel.worker.done():
+			channel.worker = self._loop.create_task(self._drain(channel))
+		channel.wake.set()
+		return future
+
+	def _drop(self, channel: _Channel, message: _Outgoing, reason: str):
+		channel.index.pop((message.text, message.reply_to), None)
+		self._stats[message.priority][reason] += 1
+		logger.warning(f"Message abandonné pour #{channel.name} ({reason}) : {message.text[:80]}")
+		if not message.future.done():
+			message.future.set_result(False)
+
+	async def _drain(self, channel: _Channel):
+		while channel.pending:
+			now = time.monotonic()
+			while channel.sent and now - channel.sent[0] >= WINDOW:
+				channel.sent.popleft()
+			if len(channel.sent) >= self._limit(channel.name):
+				channel.wake.clear()
+				try:
+					await asyncio.wait_for(channel.wake.wait(), WINDOW - (now - channel.sent[0]))
+				except asyncio.TimeoutError:
+					pass
+				continue
+			_, _, message = heapq.heappop(channel.pending)
+			waited = now - message.queued_at
+			if waited > MAX_DELAY[message.priority]:
+				self._drop(channel, message, 'dropped_expired')
+				continue
+			channel.index.pop((message.text, message.reply_to), None)
+			await self._deliver(channel, message, waited)
+
+	async def _deliver(self, channel: _Channel, message: _Outgoing, waited: float):
+		stats = self._stats[message.priority]
+		tags = f'@reply-parent-msg-id={message.reply_to} ' if message.reply_to else ''
+		try:
+			await self._chat.send_raw_irc_message(f'{tags}PRIVMSG #{channel.name} :{message.text}')
+		except Exception as e:
+			stats['errors'] += 1
+			logger.error(f"Échec d'envoi dans #{channel.name} : {e}")
+			if not message.future.done():
+				message.future.set_result(False)
+			return
+		channel.sent.append(time.monotonic())
+		stats['sent'] += 1
+		delay_ms = waited * 1000
+		stats['total_delay_ms'] += delay_ms
+		if delay_ms > stats['max_delay_ms']:
+			stats['max_delay_ms'] = delay_ms
+		if waited >= 1:
+			stats['delayed'] += 1
+			logger.info(f"Message envoyé dans #{channel.name} après {waited:.1f}s d'attente")
+		if not message.future.done():
+			message.future.set_result(True)
+
+	def getStats(self) -> dict:
+		lanes = {}
+		for priority, stats in self._stats.items():
+			lane = {key: value for key, value in stats.items() if key != 'total_delay_ms'}
+			lane['avg_delay_ms'] = round(stats['total_delay_ms'] / stats['sent'], 3) if stats['sent'] else 0.0
+			lane['max_delay_ms'] = round(stats['max_delay_ms'], 3)
+			lanes[_LANES[priority]] = lane
+		channels = {name: {'pending': len(channel.pending), 'sent_in_window': len(channel.sent), 'limit': self._limit(name)}
+			for name, channel in self._channels.items()}
+		return {'lanes': lanes, 'channels': channels}
+
+
+chatQueue = ChatSendQueue()
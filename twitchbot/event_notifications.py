@@ -13,8 +13,9 @@ from twitchAPI.object.eventsub import (
 )
 from twitchAPI.twitch import Twitch
 
-from database import db
+from database.executor import runQuery, runWrite
 from database.models import TwitchEventNotification
+from twitchbot.chat_queue import chatQueue, PRIORITY_EVENT
 from webapp import webapp
 
 logger = logging.getLogger("twitch-events")
@@ -32,7 +33,8 @@ async def _send_twitch(chat: Chat, channel: str, text: str) -> None:
 	if not text or not chat:
 		return
 	try:
-		await chat.send_message(channel, text[:500])
+		# Sans attendre l'envoi : un train de subs ne bloque pas les handlers EventSub
+		chatQueue.send(channel, text, PRIORITY_EVENT)
 	except Exception as e:
 		logger.error("Envoi chat Twitch événement: %s", e)
 
@@ -56,9 +58,13 @@ def _schedule_discord_send(channel_id: int, content: str | None, embed: discord.
 		logger.error("Envoi Discord événement: %s", e)
 
 
+async def _get_event_config(event_type: str) -> TwitchEventNotification | None:
+	return await runQuery(lambda: TwitchEventNotification.query.filter_by(event_type=event_type, enable=True).first())
+
+
 async def _handle_follow(data: ChannelFollowEvent, chat: Chat, channel: str) -> None:
 	with webapp.app_context():
-		cfg = TwitchEventNotification.query.filter_by(event_type="follow", enable=True).first()
+		cfg = await _get_event_config("follow")
 		if not cfg:
 			return
 		ev = data.event
@@ -87,7 +93,7 @@ async def _handle_follow(data: ChannelFollowEvent, chat: Chat, channel: str) ->
 
 async def _handle_subscribe(data: ChannelSubscribeEvent, chat: Chat, channel: str) -> None:
 	with webapp.app_context():
-		cfg = TwitchEventNotification.query.filter_by(event_type="sub", enable=True).first()
+		cfg = await _get_event_config("sub")
 		if not cfg:
 			return
 		ev = data.event
@@ -116,7 +122,7 @@ async def _handle_subscribe(data: ChannelSubscribeEvent, chat: Chat, channel: st
 
 async def _handle_raid(data: ChannelRaidEvent, chat: Chat, channel: str) -> None:
 	with webapp.app_context():
-		cfg = TwitchEventNotification.query.filter_by(event_type="raid", enable=True).first()
+		cfg = await _get_event_config("raid")
 		if not cfg:
 			return
 		ev = data.event
@@ -163,7 +169,7 @@ async def notify_clip(
 ) -> None:
 	"""Appelé quand un nouveau clip est détecté (polling)."""
 	with webapp.app_context():
-		cfg = TwitchEventNotification.query.filter_by(event_type="clip", enable=True).first()
+		cfg = await _get_event_config("clip")
 		if not cfg:
 			return
 		msg_twitch = _format_message(
@@ -196,7 +202,7 @@ async def notify_clip(
 				embed.set_thumbnail(url=thumbnail_url)
 			_schedule_discord_send(cfg.discord_channel_id, content.strip() or None, embed)
 		cfg.last_clip_id = clip_id
-		db.session.commit()
+		await runWrite(lambda: TwitchEventNotification.query.filter_by(id=cfg.id).update({"last_clip_id": clip_id}))
 
 
 def create_eventsub(twitch: Twitch, callback_loop: asyncio.AbstractEventLoop) -> EventSubWebsocket:
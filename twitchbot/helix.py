@@ -0,0 +1,222 @@
+# Ordonnanceur des requêtes Helix du client Twitch du bot.
+# Toutes les requêtes HTTP de twitchAPI passent par Twitch._api_request : attach() l'enveloppe
+# pour qu'elles consomment un jeton d'un seau alimenté par les en-têtes Ratelimit-* de Twitch.
+# - trois files de priorité : modération (ban, suppression, réglages du chat) > interactif
+#   (commandes, panneau) > tâches de fond (live, annonces, clips) ; les tâches de fond laissent
+#   toujours une réserve de jetons aux deux autres ;
+# - les lectures identiques en cours sont partagées (coalesce) ;
+# - un 429 vide le seau jusqu'à Ratelimit-Reset et la requête est rejouée une fois.
+# S'exécute sur la boucle du bot Twitch (le panneau y soumet ses actions).
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+
+from twitchAPI.twitch import Twitch
+
+logger = logging.getLogger('twitch-helix')
+
+PRIORITY_MODERATION = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+_LANES = {PRIORITY_MODERATION: 'moderation', PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BACKGROUND: 'background'}
+
+DEFAULT_LIMIT = 800  # jetons par minute d'un token utilisateur
+BACKGROUND_RESERVE = 0.2  # part du seau que les tâches de fond ne consomment jamais
+_MAX_BACKOFF = 60
+
+# (méthode, début du chemin Helix) des requêtes de modération, prioritaires
+_MODERATION_ROUTES = (
+	('POST', 'moderation/bans'),
+	('DELETE', 'moderation/bans'),
+	('DELETE', 'moderation/chat'),
+	('PATCH', 'chat/settings'),
+	('PUT', 'moderation/shield_mode'),
+)
+
+_priority = contextvars.ContextVar('helix_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def helixPriority(priority: int):
+	"""Priorité des requêtes Helix émises dans ce bloc (et les tâches qu'il crée)."""
+	token = _priority.set(priority)
+	try:
+		yield
+	finally:
+		_priority.reset(token)
+
+
+def _classify(method: str, url: str) -> int:
+	path = url.split('/helix/', 1)[-1]
+	for route_method, prefix in _MODERATION_ROUTES:
+		if method == route_method and path.startswith(prefix):
+			return PRIORITY_MODERATION
+	return _priority.get()
+
+
+class _LaneStats:
+	__slots__ = ('requests', 'queued', 'wait_ms', 'max_wait_ms', 'rate_limited', 'coalesced')
+
+	def __init__(self):
+		self.requests = 0
+		self.queued = 0
+		self.wait_ms = 0.0
+		self.max_wait_ms = 0.0
+		self.rate_limited = 0
+		self.coalesced = 0
+
+	def toDict(self) -> dict:
+		return {
+			'requests': self.requests,
+			'queued': self.queued,
+			'avg_wait_ms': round(self.wait_ms / self.requests, 3) if self.requests else 0.0,
+			'max_wait_ms': round(self.max_wait_ms, 3),
+			'rate_limited': self.rate_limited,
+			'coalesced': self.coalesced,
+		}
+
+
+class HelixScheduler:
+	def __init__(self, limit: int = DEFAULT_LIMIT):
+		self._limit = limit
+		self._tokens = float(limit)
+		self._updated = time.monotonic()
+		self._blocked_until = 0.0
+		self._loop = None
+		self._waiters = []
+		self._sequence = itertools.count()
+		self._dispatcher = None
+		self._wake = None
+		self._inflight = {}
+		self._stats = {lane: _LaneStats() for lane in _LANES}
+
+	def attach(self, twitch: Twitch):
+		"""Fait passer toutes les requêtes HTTP du client par l'ordonnanceur."""
+		original = twitch._api_request
+
+		async def scheduled(method, session, url, auth_type, required_scope, data=None, retries=1):
+			priority = _classify(method, url)
+			await self.acquire(priority)
+			response = await original(method, session, url, auth_type, required_scope, data=data, retries=retries)
+			self._observe(response, priority)
+			if response.status == 429:
+				# twitchAPI a déjà attendu la remise à zéro ; un seul nouvel essai, après le seau
+				await self.acquire(priority)
+				response = await original(method, session, url, auth_type, required_scope, data=data, retries=retries)
+				self._observe(response, priority)
+			return response
+
+		twitch._api_request = scheduled
+
+	def _bind(self):
+		# Nouvelle session Twitch (nouvelle boucle) : files et tâche de distribution à recréer
+		loop = asyncio.get_running_loop()
+		if loop is not self._loop:
+			self._loop = loop
+			self._waiters = []
+			self._wake = asyncio.Event()
+			self._dispatcher = None
+			self._inflight = {}
+
+	def _refill(self, now: float):
+		self._tokens = min(self._limit, self._tokens + (now - self._updated) * self._limit / 60)
+		self._updated = now
+
+	def _available(self, priority: int, now: float) -> bool:
+		if now < self._blocked_until:
+			return False
+		self._refill(now)
+		floor = self._limit * BACKGROUND_RESERVE if priority == PRIORITY_BACKGROUND else 0
+		return self._tokens - 1 >= floor
+
+	async def acquire(self, priority: int):
+		self._bind()
+		now = time.monotonic()
+		stats = self._stats[priority]
+		stats.requests += 1
+		if not self._waiters and self._available(priority, now):
+			self._tokens -= 1
+			return
+		stats.queued += 1
+		future = self._loop.create_future()
+		heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+		if self._dispatcher is None or self._dispatcher.done():
+			self._dispatcher = self._loop.create_task(self._dispatch())
+		self._wake.set()
+		await future
+		waited = (time.monotonic() - now) * 1000
+		stats.wait_ms += waited
+		if waited > stats.max_wait_ms:
+			stats.max_wait_ms = waited
+
+	async def _dispatch(self):
+		while self._waiters:
+			now = time.monotonic()
+			priority, _, future = self._waiters[0]
+			if future.done():
+				heapq.heappop(self._waiters)
+				continue
+			if self._available(priority, now):
+				heapq.heappop(self._waiters)
+				self._tokens -= 1
+				future.set_result(None)
+				continue
+			# Attente du prochain jeton (ou de la fin du blocage), ou d'un demandeur plus prioritaire
+			floor = self._limit * BACKGROUND_RESERVE if priority == PRIORITY_BACKGROUND else 0
+			delay = max(self._blocked_until - now, (floor + 1 - self._tokens) * 60 / self._limit, 0.01)
+			self._wake.clear()
+			try:
+				await asyncio.wait_for(self._wake.wait(), delay)
+			except asyncio.TimeoutError:
+				pass
+
+	def _observe(self, response, priority: int):
+		headers = response.headers
+		now = time.monotonic()
+		try:
+			limit = int(headers.get('Ratelimit-Limit', 0))
+			remaining = headers.get('Ratelimit-Remaining')
+			reset = headers.get('Ratelimit-Reset')
+			if limit:
+				self._limit = limit
+			if remaining is not None:
+				# Le compteur de Twitch fait foi (le budget est partagé avec d'autres clients)
+				self._refill(now)
+				self._tokens = min(self._tokens, float(remaining))
+			if response.status == 429 or remaining == '0':
+				self._stats[priority].rate_limited += response.status == 429
+				wait = float(reset) - time.time() if reset else 1
+				self._blocked_until = now + min(max(wait, 0.1), _MAX_BACKOFF)
+				self._tokens = 0
+				logger.warning(f"Limite Helix atteinte, requêtes suspendues {self._blocked_until - now:.1f}s")
+		except (TypeError, ValueError):
+			pass
+
+	async def coalesce(self, key, factory):
+		"""Partage le résultat d'une lecture identique déjà en cours (factory : coroutine sans argument)."""
+		self._bind()
+		task = self._inflight.get(key)
+		if task is not None:
+			self._stats[_priority.get()].coalesced += 1
+			return await asyncio.shield(task)
+		task = self._loop.create_task(factory())
+		self._inflight[key] = task
+		task.add_done_callback(lambda _: self._inflight.pop(key, None))
+		return await asyncio.shield(task)
+
+	def getStats(self) -> dict:
+		now = time.monotonic()
+		return {
+			'limit': self._limit,
+			'tokens': round(min(self._limit, self._tokens + (now - self._updated) * self._limit / 60), 1),
+			'blocked_for_s': round(max(0.0, self._blocked_until - now), 1),
+			'waiting': len(self._waiters),
+			'lanes': {_LANES[priority]: stats.toDict() for priority, stats in self._stats.items()},
+		}
+
+
+helix = HelixScheduler()
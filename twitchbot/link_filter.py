@@ -5,10 +5,10 @@ from datetime import datetime, timedelta
 from twitchAPI.twitch import Twitch
 from twitchAPI.chat import ChatMessage
 
-from database import db
-from database.models import TwitchLinkFilter, TwitchAllowedDomain, TwitchPermit, TwitchAllowedUser
-from twitchbot.moderation import _log_action, _get_broadcaster_id, _get_moderator_id, _get_user_id, _is_moderator
-from webapp import webapp
+from database.executor import runQuery
+from twitchbot.link_rules import LinkFilterState, getState, loadState, permitsLoaded, loadPermits, grantPermit, consumePermit, extractDomain
+from twitchbot.moderation import _log_action, _get_ids, _is_moderator
+from twitchbot.chat_queue import chatQueue
 
 logger = logging.getLogger('twitch-link-filter')
 logger.setLevel(logging.INFO)
@@ -16,63 +16,22 @@ logger.setLevel(logging.INFO)
 URL_REGEX = re.compile(r'https?://[^\s]+|(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:/[^\s]*)?')
 
 
-def _get_filter_config():
-    """Retourne un dictionnaire avec la config du filtre de liens"""
-    with webapp.app_context():
-        config = TwitchLinkFilter.query.first()
-        if not config:
-            config = TwitchLinkFilter(enabled=False)
-            db.session.add(config)
-            db.session.commit()
-        # Retourner un dict pour éviter DetachedInstanceError
-        return {
-            'enabled': config.enabled,
-            'allow_subscribers': config.allow_subscribers,
-            'allow_vips': config.allow_vips,
-            'allow_moderators': config.allow_moderators,
-            'timeout_duration': config.timeout_duration,
-            'warning_message': config.warning_message
-        }
+async def _get_state() -> LinkFilterState:
+    # Snapshot construit une fois, rechargé seulement après une modification depuis le webapp
+    state = getState()
+    if state is None:
+        state = await runQuery(loadState)
+    return state
 
 
-def _get_allowed_domains():
-    with webapp.app_context():
-        return [d.domain.lower() for d in TwitchAllowedDomain.query.all()]
-
-
-def _is_user_whitelisted(username: str) -> bool:
-    with webapp.app_context():
-        return TwitchAllowedUser.query.filter_by(username=username.lower()).first() is not None
-
-
-def _has_valid_permit(username: str) -> bool:
-    with webapp.app_context():
-        permit = TwitchPermit.query.filter_by(username=username.lower()).first()
-        if permit and permit.expires_at > datetime.now():
-            return True
-        if permit and permit.expires_at <= datetime.now():
-            db.session.delete(permit)
-            db.session.commit()
-        return False
-
-
-def _extract_domain(url: str) -> str:
-    url = url.lower()
-    url = re.sub(r'^https?://', '', url)
-    url = re.sub(r'^www\.', '', url)
-    return url.split('/')[0]
-
-
-def _is_domain_allowed(url: str, allowed_domains: list) -> bool:
-    domain = _extract_domain(url)
-    for allowed in allowed_domains:
-        if domain == allowed or domain.endswith('.' + allowed):
-            return True
-    return False
+async def _ensure_permits():
+    if not permitsLoaded():
+        await runQuery(loadPermits)
 
 
 async def check_message_for_links(msg: ChatMessage, twitch: Twitch) -> bool:
-    config = _get_filter_config()
+    state = await _get_state()
+    config = state.config
     
     if not config['enabled']:
         return True
@@ -86,24 +45,19 @@ async def check_message_for_links(msg: ChatMessage, twitch: Twitch) -> bool:
     if config['allow_subscribers'] and msg.user.subscriber:
         return True
     
-    if _is_user_whitelisted(msg.user.name):
+    if msg.user.name.lower() in state.whitelist:
         return True
     
     urls = URL_REGEX.findall(msg.text)
     if not urls:
         return True
     
-    if _has_valid_permit(msg.user.name):
-        with webapp.app_context():
-            permit = TwitchPermit.query.filter_by(username=msg.user.name.lower()).first()
-            if permit:
-                db.session.delete(permit)
-                db.session.commit()
+    await _ensure_permits()
+    if consumePermit(msg.user.name):
         return True
     
-    allowed_domains = _get_allowed_domains()
     for url in urls:
-        if not _is_domain_allowed(url, allowed_domains):
+        if not state.isDomainAllowed(url):
             await _handle_unauthorized_link(msg, twitch, config, url)
             return False
     
@@ -111,9 +65,7 @@ async def check_message_for_links(msg: ChatMessage, twitch: Twitch) -> bool:
 
 
 async def _handle_unauthorized_link(msg: ChatMessage, twitch: Twitch, config: dict, url: str):
-    broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
-    moderator_id = await _get_moderator_id(twitch)
-    user_id = await _get_user_id(twitch, msg.user.name)
+    broadcaster_id, moderator_id, user_id = await _get_ids(twitch, msg.room.name, msg.user.name)
     
     if user_id and config['timeout_duration'] > 0:
         try:
@@ -127,9 +79,9 @@ async def _handle_unauthorized_link(msg: ChatMessage, twitch: Twitch, config: di
         logger.error(f"Erreur suppression message: {e}")
     
     if config['warning_message']:
-        await msg.reply(config['warning_message'])
+        chatQueue.reply(msg, config['warning_message'])
     
-    _log_action("link_blocked", "AutoMod", msg.user.name, _extract_domain(url))
+    _log_action("link_blocked", "AutoMod", msg.user.name, extractDomain(url))
     logger.info(f"Lien bloque de {msg.user.name}: {url}")
 
 
@@ -139,7 +91,7 @@ async def permit_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !permit <viewer> [minutes]")
+        chatQueue.reply(msg, "Usage: !permit <viewer> [minutes]")
         return
     
     username = args[0].lstrip('@').lower()
@@ -152,15 +104,9 @@ async def permit_command(msg: ChatMessage, twitch: Twitch):
     
     expires_at = datetime.now() + timedelta(seconds=duration)
     
-    with webapp.app_context():
-        existing = TwitchPermit.query.filter_by(username=username).first()
-        if existing:
-            existing.expires_at = expires_at
-        else:
-            permit = TwitchPermit(username=username, expires_at=expires_at)
-            db.session.add(permit)
-        db.session.commit()
+    await _ensure_permits()
+    grantPermit(username, expires_at)
     
     _log_action("permit", msg.user.name, username, f"{duration}s")
-    await msg.reply(f"@{username} peut poster un lien pendant {duration // 60} minute(s)")
+    chatQueue.reply(msg, f"@{username} peut poster un lien pendant {duration // 60} minute(s)")
     logger.info(f"Permit accorde a {username} par {msg.user.name}")
@@ -0,0 +1,170 @@
+# État en mémoire du filtre de liens Twitch : aucune requête en base par message de chat.
+# - configuration, viewers autorisés et domaines autorisés forment un snapshot rechargé
+#   paresseusement après un commit qui touche l'une de ces tables ;
+# - les domaines autorisés sont indexés dans un trie de labels inversés (com → youtube → www),
+#   un domaine est autorisé s'il est égal à un domaine de la liste ou en est un sous-domaine ;
+# - les permis (!permit) sont tenus en mémoire, chargés une fois depuis la base puis persistés
+#   par l'écriture différée.
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.models import TwitchLinkFilter, TwitchAllowedDomain, TwitchAllowedUser, TwitchPermit
+from database.writebehind import writeBehind, INSERT_TWITCH_PERMIT, DELETE_TWITCH_PERMIT, sqlDateTime
+
+logger = logging.getLogger('twitch-link-filter')
+
+# Marqueur de fin de domaine dans un nœud du trie (un label ne peut pas être vide)
+_END = ''
+_TRACKED_TABLES = ('twitch_link_filter', 'twitch_allowed_domain', 'twitch_allowed_user')
+
+
+def extractDomain(url: str) -> str:
+	url = url.lower()
+	if url.startswith('https://'):
+		url = url[8:]
+	elif url.startswith('http://'):
+		url = url[7:]
+	if url.startswith('www.'):
+		url = url[4:]
+	return url.split('/', 1)[0]
+
+
+class DomainIndex:
+	"""Trie des domaines autorisés, parcouru du TLD vers le sous-domaine."""
+
+	def __init__(self, domains):
+		self._root = {}
+		for domain in domains:
+			node = self._root
+			for label in reversed(domain.split('.')):
+				node = node.setdefault(label, {})
+			node[_END] = True
+
+	def allows(self, domain: str) -> bool:
+		node = self._root
+		for label in reversed(domain.split('.')):
+			node = node.get(label) if label else None
+			if node is None:
+				return False
+			if _END in node:
+				return True
+		return False
+
+
+class LinkFilterState:
+	__slots__ = ('config', 'whitelist', 'domains')
+
+	def __init__(self, config: dict, whitelist: set, domains: DomainIndex):
+		self.config = config
+		self.whitelist = whitelist
+		self.domains = domains
+
+	def isDomainAllowed(self, url: str) -> bool:
+		return self.domains.allows(extractDomain(url))
+
+
+_lock = threading.Lock()
+_state: LinkFilterState | None = None
+_generation = 0
+_permits: dict | None = None
+
+
+def _defaultConfig() -> dict:
+	columns = TwitchLinkFilter.__table__.columns
+	return {key: columns[key].default.arg for key in
+		('enabled', 'allow_subscribers', 'allow_vips', 'allow_moderators', 'timeout_duration', 'warning_message')}
+
+
+def loadState() -> LinkFilterState:
+	"""Construit le snapshot du filtre de liens (contexte applicatif requis)."""
+	global _state
+	with _lock:
+		if _state is not None:
+			return _state
+		generation = _generation
+	row = TwitchLinkFilter.query.first()
+	config = _defaultConfig()
+	if row is not None:
+		config = {key: getattr(row, key) for key in config}
+	whitelist = {username.lower() for (username,) in TwitchAllowedUser.query.with_entities(TwitchAllowedUser.username) if username}
+	domains = DomainIndex(domain.lower() for (domain,) in TwitchAllowedDomain.query.with_entities(TwitchAllowedDomain.domain) if domain)
+	state = LinkFilterState(config, whitelist, domains)
+	with _lock:
+		if generation == _generation:
+			_state = state
+	return state
+
+
+def getState() -> LinkFilterState | None:
+	"""Snapshot courant, None s'il doit être (re)chargé."""
+	return _state
+
+
+def invalidateState():
+	global _state, _generation
+	with _lock:
+		_state = None
+		_generation += 1
+
+
+def loadPermits():
+	"""Charge les permis non expirés depuis la base (une seule fois, contexte applicatif requis)."""
+	global _permits
+	if _permits is not None:
+		return
+	now = datetime.now()
+	rows = TwitchPermit.query.with_entities(TwitchPermit.username, TwitchPermit.expires_at).filter(TwitchPermit.expires_at > now).all()
+	with _lock:
+		if _permits is None:
+			_permits = {username.lower(): expires_at for username, expires_at in rows if username}
+
+
+def permitsLoaded() -> bool:
+	return _permits is not None
+
+
+def grantPermit(username: str, expires_at: datetime):
+	"""Accorde (ou prolonge) un permis ; loadPermits doit avoir été appelé."""
+	username = username.lower()
+	now = datetime.now()
+	with _lock:
+		# Les permis expirés jamais consommés sont oubliés ici (la rétention les purge en base)
+		for expired in [name for name, expiry in _permits.items() if expiry <= now]:
+			del _permits[expired]
+		_permits[username] = expires_at
+	writeBehind.enqueue(DELETE_TWITCH_PERMIT, (username,))
+	writeBehind.enqueue(INSERT_TWITCH_PERMIT, (username, sqlDateTime(expires_at)))
+
+
+def consumePermit(username: str) -> bool:
+	"""Consomme le permis du viewer s'il est valide ; un permis expiré est supprimé."""
+	username = username.lower()
+	with _lock:
+		expires_at = _permits.pop(username, None)
+	if expires_at is None:
+		return False
+	writeBehind.enqueue(DELETE_TWITCH_PERMIT, (username,))
+	return expires_at > datetime.now()
+
+
+@event.listens_for(Session, 'before_flush')
+def _trackLinkFilterChanges(session, flush_context, instances):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if getattr(obj, '__tablename__', None) in _TRACKED_TABLES:
+			session.info['link_filter_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidateAfterCommit(session):
+	if session.info.pop('link_filter_changed', False):
+		invalidateState()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forgetAfterRollback(session):
+	session.info.pop('link_filter_changed', None)
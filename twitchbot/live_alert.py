@@ -6,10 +6,13 @@ import discord
 from twitchAPI.twitch import Twitch
 from twitchAPI.object.api import Stream
 
-from database import db
+from database.executor import runQuery, runWrite
 from database.models import LiveAlert
 from discordbot import bot
 from webapp import webapp
+from webapp.chat_activity import twitchChat, ChatRecord, clearAfterLive
+from webapp.panel_events import panelEvents, streamInfo
+from twitchbot.helix import helix
 
 logger = logging.getLogger('live-alert')
 logger.setLevel(logging.INFO)
@@ -48,9 +51,10 @@ def _format_embed_text(text: str, stream: Stream, stream_url: str, thumbnail: st
 async def checkOnlineStreamer(twitch: Twitch) :
 	global _live_alert_first_check
 	with webapp.app_context() : 
-		alerts : list[LiveAlert] = LiveAlert.query.all()
+		alerts : list[LiveAlert] = await runQuery(lambda: LiveAlert.query.all())
 		bot_status = webapp.config["BOT_STATUS"]
 		was_live = bot_status.get("twitch_is_live", False)
+		previous_info = streamInfo(bot_status)
 
 		try:
 			streams = await _retreiveStreams(twitch, alerts)
@@ -85,21 +89,12 @@ async def checkOnlineStreamer(twitch: Twitch) :
 			if was_live and not bot_status.get("twitch_ended_at"):
 				bot_status["twitch_ended_at"] = datetime.now().isoformat()
 			if was_live and not bot_status.get("twitch_chat_clear_notice_sent"):
-				messages = bot_status.setdefault("twitch_chat_messages", [])
-				now_iso = datetime.now().isoformat()
-				messages.append({
-					'username': 'System',
-					'text': 'Live terminé, ce chat sera vidé dans 1h.',
-					'timestamp': now_iso,
-					'is_mod': False,
-					'is_subscriber': False,
-					'is_vip': False,
-					'color': '#22c55e',
-					'panel_only': True,
-				})
-				if len(messages) > 100:
-					messages.pop(0)
+				twitchChat.notice(ChatRecord('System', 'Live terminé, ce chat sera vidé dans 1h.', datetime.now().isoformat(), False, False, False, '#22c55e', panel_only=True))
 				bot_status["twitch_chat_clear_notice_sent"] = True
+			clearAfterLive(bot_status)
+		current_info = streamInfo(bot_status)
+		if current_info != previous_info:
+			panelEvents.publish('stream', current_info)
 		
 		# Premier check : synchronisation sans notification
 		if _live_alert_first_check:
@@ -113,7 +108,7 @@ async def checkOnlineStreamer(twitch: Twitch) :
 				else:
 					alert.online = False
 			await _updateBotActivity(watch_stream)
-			db.session.commit()
+			await _saveOnlineStates(alerts)
 			_live_alert_first_check = False
 			return
 		
@@ -133,7 +128,15 @@ async def checkOnlineStreamer(twitch: Twitch) :
 				alert.online = False
 		
 		await _updateBotActivity(watch_stream)
-		db.session.commit()
+		await _saveOnlineStates(alerts)
+
+
+async def _saveOnlineStates(alerts: list[LiveAlert]):
+	states = {alert.id: alert.online for alert in alerts}
+	def _save():
+		for alert_id, online in states.items():
+			LiveAlert.query.filter_by(id=alert_id).update({'online': online})
+	await runWrite(_save)
 
 
 async def _updateBotActivity(stream: Stream | None):
@@ -161,7 +164,7 @@ async def _updateBotActivity(stream: Stream | None):
 		# Remettre une humeur aléatoire
 		from database.models import Humeur
 		import random
-		humeurs = Humeur.query.all()
+		humeurs = await runQuery(lambda: Humeur.query.all())
 		if humeurs:
 			humeur = random.choice(humeurs)
 			logger.info(f'Réinitialisation du statut : {humeur.text}')
@@ -240,9 +243,11 @@ async def _sendMessage(channel_id: int, message: str | None, embed: discord.Embe
 		logger.error(f"Erreur lors de l'envoi de la notification live : {e}")
 
 async def _retreiveStreams(twitch: Twitch, alerts: list[LiveAlert]) -> list[Stream]:
-	streams: list[Stream] = []
 	logger.info(f'Recherche de streams pour : {alerts}')
-	async for stream in twitch.get_streams(user_login=[alert.login for alert in alerts]):
-		streams.append(stream)
+	logins = sorted({alert.login.lower() for alert in alerts})
+
+	async def fetch() -> list[Stream]:
+		return [stream async for stream in twitch.get_streams(user_login=logins)]
+	streams = await helix.coalesce(('streams', *logins), fetch)
 	logger.info(f'Ces streams sont en ligne : {streams}')
 	return streams
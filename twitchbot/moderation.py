@@ -1,13 +1,22 @@
 import re
+import time
+import asyncio
 import logging
+from collections import OrderedDict, deque
 from datetime import datetime
 
 from twitchAPI.twitch import Twitch
 from twitchAPI.chat import ChatMessage
 
-from database import db
-from database.models import TwitchAnnouncement, TwitchModerationLog, TwitchBannedWord
-from webapp import webapp
+from database.executor import runQuery, runWrite
+from database.writebehind import writeBehind, INSERT_TWITCH_MODERATION_LOG, sqlDateTime
+from database.models import TwitchAnnouncement
+from database.helpers import ConfigurationHelper
+from webapp.panel_events import panelEvents
+from twitchbot.banned_words import getMatcher, buildMatcher
+from twitchbot.user_ids import userIds
+from twitchbot.helix import helix
+from twitchbot.chat_queue import chatQueue
 
 logger = logging.getLogger('twitch-moderation')
 logger.setLevel(logging.INFO)
@@ -17,16 +26,17 @@ games_disabled: bool = False
 
 
 def _log_action(action: str, moderator: str, target: str = None, details: str = None):
-    with webapp.app_context():
-        log = TwitchModerationLog(
-            action=action,
-            moderator=moderator,
-            target=target,
-            details=details,
-            created_at=datetime.now()
-        )
-        db.session.add(log)
-        db.session.commit()
+    # Écriture différée : les rafales d'AutoMod sont regroupées en une transaction
+    created_at = datetime.now()
+    writeBehind.enqueue(INSERT_TWITCH_MODERATION_LOG, (action, moderator, target, details, sqlDateTime(created_at)))
+    panelEvents.publish('log', {
+        "action": action,
+        "moderator": moderator,
+        "target": target or '',
+        "details": details or '',
+        "created_at": created_at.strftime('%d/%m %H:%M'),
+        "created_at_iso": created_at.isoformat(),
+    })
 
 
 def _is_moderator(msg: ChatMessage) -> bool:
@@ -34,21 +44,24 @@ def _is_moderator(msg: ChatMessage) -> bool:
 
 
 async def _get_broadcaster_id(twitch: Twitch, channel: str) -> str:
-    async for user in twitch.get_users(logins=[channel]):
-        return user.id
-    return None
+    return await userIds.resolve(twitch, channel)
 
 
 async def _get_user_id(twitch: Twitch, username: str) -> str:
-    async for user in twitch.get_users(logins=[username]):
-        return user.id
-    return None
+    return await userIds.resolve(twitch, username)
 
 
 async def _get_moderator_id(twitch: Twitch) -> str:
-    async for user in twitch.get_users():
-        return user.id
-    return None
+    return await userIds.resolveModerator(twitch)
+
+
+async def _get_ids(twitch: Twitch, channel: str, username: str) -> tuple:
+    """(broadcaster_id, moderator_id, user_id) : les ids absents du cache partagent un appel Helix."""
+    return await asyncio.gather(
+        _get_broadcaster_id(twitch, channel),
+        _get_moderator_id(twitch),
+        _get_user_id(twitch, username),
+    )
 
 
 async def timeout_command(msg: ChatMessage, twitch: Twitch):
@@ -57,7 +70,7 @@ async def timeout_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !timeout <viewer> [minutes] [raison]")
+        chatQueue.reply(msg, "Usage: !timeout <viewer> [minutes] [raison]")
         return
     
     viewer = args[0].lstrip('@')
@@ -75,9 +88,7 @@ async def timeout_command(msg: ChatMessage, twitch: Twitch):
             # args[1] n'est pas un nombre, donc tout depuis args[1] est la raison
             reason = ' '.join(args[1:])
     
-    broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
-    moderator_id = await _get_moderator_id(twitch)
-    user_id = await _get_user_id(twitch, viewer)
+    broadcaster_id, moderator_id, user_id = await _get_ids(twitch, msg.room.name, viewer)
     
     if user_id:
         await twitch.ban_user(broadcaster_id, moderator_id, user_id, reason=reason, duration=duration)
@@ -93,7 +104,7 @@ async def ban_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !ban <viewer1> [viewer2] ...")
+        chatQueue.reply(msg, "Usage: !ban <viewer1> [viewer2] ...")
         return
     
     broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
@@ -114,7 +125,7 @@ async def unban_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !unban <viewer1> [viewer2] ...")
+        chatQueue.reply(msg, "Usage: !unban <viewer1> [viewer2] ...")
         return
     
     broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
@@ -156,7 +167,7 @@ async def shieldmode_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !shieldmode <on/off>")
+        chatQueue.reply(msg, "Usage: !shieldmode <on/off>")
         return
     
     broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
@@ -174,7 +185,7 @@ async def settitle_command(msg: ChatMessage, twitch: Twitch):
     
     parts = msg.text.split(maxsplit=1)
     if len(parts) < 2:
-        await msg.reply("Usage: !settitle <titre>")
+        chatQueue.reply(msg, "Usage: !settitle <titre>")
         return
     
     title = parts[1]
@@ -191,23 +202,24 @@ async def setgame_command(msg: ChatMessage, twitch: Twitch):
     
     parts = msg.text.split(maxsplit=1)
     if len(parts) < 2:
-        await msg.reply("Usage: !setgame <jeu>")
+        chatQueue.reply(msg, "Usage: !setgame <jeu>")
         return
     
     game_name = parts[1]
     broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
     
-    game_id = None
-    async for game in twitch.get_games(names=[game_name]):
-        game_id = game.id
-        break
+    async def fetch_game_id():
+        async for game in twitch.get_games(names=[game_name]):
+            return game.id
+        return None
+    game_id = await helix.coalesce(('games', game_name.lower()), fetch_game_id)
     
     if game_id:
         await twitch.modify_channel_information(broadcaster_id, game_id=game_id)
         _log_action("setgame", msg.user.name, None, game_name)
         logger.info(f'Jeu changé en "{game_name}" par {msg.user.name}')
     else:
-        await msg.reply(f"Jeu '{game_name}' introuvable")
+        chatQueue.reply(msg, f"Jeu '{game_name}' introuvable")
 
 
 async def subon_command(msg: ChatMessage, twitch: Twitch):
@@ -297,7 +309,7 @@ async def multitwitch_command(msg: ChatMessage, twitch: Twitch):
     
     if len(args) == 0:
         if last_multitwitch:
-            await msg.reply(last_multitwitch)
+            chatQueue.reply(msg, last_multitwitch)
         return
     
     if not _is_moderator(msg):
@@ -316,7 +328,7 @@ async def multitwitch_command(msg: ChatMessage, twitch: Twitch):
             if mentions:
                 channels = [msg.room.name] + mentions
                 last_multitwitch = f"https://multitwitch.live/{'/'.join(channels)}"
-                await msg.reply(last_multitwitch)
+                chatQueue.reply(msg, last_multitwitch)
             return
         return
     
@@ -328,7 +340,7 @@ async def multitwitch_command(msg: ChatMessage, twitch: Twitch):
             channels.append(arg.lstrip('@'))
     
     last_multitwitch = f"https://multitwitch.live/{'/'.join(channels)}"
-    await msg.reply(last_multitwitch)
+    chatQueue.reply(msg, last_multitwitch)
     logger.info(f'MultiTwitch créé par {msg.user.name}: {last_multitwitch}')
 
 
@@ -338,32 +350,35 @@ async def ann_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 2:
-        await msg.reply("Usage: !ann <alias> <on/off/toggle>")
+        chatQueue.reply(msg, "Usage: !ann <alias> <on/off/toggle>")
         return
     
     alias = args[0]
     action = args[1].lower()
     
-    with webapp.app_context():
+    if action not in ("on", "off", "toggle"):
+        chatQueue.reply(msg, "Action invalide: on/off/toggle")
+        return
+
+    def _apply():
         announcement = TwitchAnnouncement.query.filter_by(name=alias).first()
         if not announcement:
-            await msg.reply(f"Annonce '{alias}' introuvable")
-            return
-        
+            return None
         if action == "on":
             announcement.enable = True
         elif action == "off":
             announcement.enable = False
-        elif action == "toggle":
-            announcement.enable = not announcement.enable
         else:
-            await msg.reply("Action invalide: on/off/toggle")
-            return
-        
-        db.session.commit()
-        status = "activée" if announcement.enable else "désactivée"
-        logger.info(f'Annonce {alias} {status} par {msg.user.name}')
-        await msg.reply(f"Annonce '{alias}' {status}")
+            announcement.enable = not announcement.enable
+        return announcement.enable
+
+    enabled = await runWrite(_apply)
+    if enabled is None:
+        chatQueue.reply(msg, f"Annonce '{alias}' introuvable")
+        return
+    status = "activée" if enabled else "désactivée"
+    logger.info(f'Annonce {alias} {status} par {msg.user.name}')
+    chatQueue.reply(msg, f"Annonce '{alias}' {status}")
 
 
 async def no_game_command(msg: ChatMessage, twitch: Twitch):
@@ -374,7 +389,7 @@ async def no_game_command(msg: ChatMessage, twitch: Twitch):
     
     args = msg.text.split()[1:]
     if len(args) < 1:
-        await msg.reply("Usage: !no_game <on/off>")
+        chatQueue.reply(msg, "Usage: !no_game <on/off>")
         return
     
     action = args[0].lower()
@@ -382,11 +397,11 @@ async def no_game_command(msg: ChatMessage, twitch: Twitch):
     if action == "on":
         games_disabled = True
         logger.info(f'Jeux désactivés par {msg.user.name}')
-        await msg.reply("Jeux désactivés")
+        chatQueue.reply(msg, "Jeux désactivés")
     elif action == "off":
         games_disabled = False
         logger.info(f'Jeux activés par {msg.user.name}')
-        await msg.reply("Jeux activés")
+        chatQueue.reply(msg, "Jeux activés")
 
 
 def are_games_disabled() -> bool:
@@ -402,45 +417,93 @@ async def check_message_for_banned_words(msg: ChatMessage, twitch: Twitch) -> bo
     if msg.user.mod or msg.user.name.lower() == msg.room.name.lower():
         return True
     
-    with webapp.app_context():
-        banned_words = TwitchBannedWord.query.filter_by(enabled=True).all()
-        if not banned_words:
-            return True
+    # Automate construit une fois, reconstruit seulement après une modification de la liste
+    matcher = getMatcher()
+    if matcher is None:
+        matcher = await runQuery(buildMatcher)
+    
+    banned_word_entry = matcher.match(msg.text)
+    if banned_word_entry is not None:
+        # Bloquer le message
+        broadcaster_id, moderator_id, user_id = await _get_ids(twitch, msg.room.name, msg.user.name)
         
-        message_lower = msg.text.lower()
+        # Timeout de l'utilisateur
+        if user_id and banned_word_entry.timeout_duration > 0:
+            try:
+                await twitch.ban_user(
+                    broadcaster_id, 
+                    moderator_id, 
+                    user_id, 
+                    reason=f"Mot interdit: {banned_word_entry.word}", 
+                    duration=banned_word_entry.timeout_duration
+                )
+            except Exception as e:
+                logger.error(f"Erreur timeout mot interdit: {e}")
         
-        for banned_word_entry in banned_words:
-            word = banned_word_entry.word.lower()
-            # Recherche du mot dans le message (mot entier ou partie de mot)
-            if word in message_lower:
-                # Bloquer le message
-                broadcaster_id = await _get_broadcaster_id(twitch, msg.room.name)
-                moderator_id = await _get_moderator_id(twitch)
-                user_id = await _get_user_id(twitch, msg.user.name)
-                
-                # Timeout de l'utilisateur
-                if user_id and banned_word_entry.timeout_duration > 0:
-                    try:
-                        await twitch.ban_user(
-                            broadcaster_id, 
-                            moderator_id, 
-                            user_id, 
-                            reason=f"Mot interdit: {banned_word_entry.word}", 
-                            duration=banned_word_entry.timeout_duration
-                        )
-                    except Exception as e:
-                        logger.error(f"Erreur timeout mot interdit: {e}")
-                
-                # Suppression du message
-                try:
-                    await twitch.delete_chat_message(broadcaster_id, moderator_id, message_id=msg.id)
-                except Exception as e:
-                    logger.error(f"Erreur suppression message mot interdit: {e}")
-                
-                # Log
-                _log_action("banned_word", "AutoMod", msg.user.name, f"Mot: {banned_word_entry.word}")
-                logger.info(f"Mot interdit détecté de {msg.user.name}: {banned_word_entry.word}")
-                
-                return False
+        # Suppression du message
+        try:
+            await twitch.delete_chat_message(broadcaster_id, moderator_id, message_id=msg.id)
+        except Exception as e:
+            logger.error(f"Erreur suppression message mot interdit: {e}")
+        
+        # Log
+        _log_action("banned_word", "AutoMod", msg.user.name, f"Mot: {banned_word_entry.word}")
+        logger.info(f"Mot interdit détecté de {msg.user.name}: {banned_word_entry.word}")
+        
+        return False
     
     return True
+
+
+# Horodatages récents par viewer pour la détection de flood (bornés à FLOOD_TRACKED_USERS viewers)
+FLOOD_TRACKED_USERS = 5000
+_flood_history: OrderedDict = OrderedDict()
+
+
+async def check_message_for_flood(msg: ChatMessage, twitch: Twitch) -> bool:
+    """
+    Vérifie si le viewer dépasse twitch_flood_max_messages messages en twitch_flood_window secondes.
+    Retourne True si le message est valide, False s'il doit être bloqué.
+    """
+    helper = ConfigurationHelper()
+    if not helper.getValue('twitch_flood_enable'):
+        return True
+    if _is_moderator(msg):
+        return True
+    
+    max_messages = helper.getIntValue('twitch_flood_max_messages') or 6
+    window = helper.getIntValue('twitch_flood_window') or 10
+    now = time.monotonic()
+    
+    # On garde max_messages + 1 horodatages : le flood est le (max_messages + 1)-ième message de la fenêtre
+    tracked = max_messages + 1
+    login = msg.user.name.lower()
+    history = _flood_history.pop(login, None)
+    if history is None:
+        history = deque(maxlen=tracked)
+    elif history.maxlen != tracked:
+        history = deque(history, maxlen=tracked)
+    _flood_history[login] = history
+    if len(_flood_history) > FLOOD_TRACKED_USERS:
+        _flood_history.popitem(last=False)
+    
+    history.append(now)
+    if len(history) < tracked or now - history[0] > window:
+        return True
+    
+    history.clear()
+    timeout_duration = helper.getIntValue('twitch_flood_timeout')
+    broadcaster_id, moderator_id, user_id = await _get_ids(twitch, msg.room.name, msg.user.name)
+    if user_id and timeout_duration > 0:
+        try:
+            await twitch.ban_user(broadcaster_id, moderator_id, user_id, reason="Flood", duration=timeout_duration)
+        except Exception as e:
+            logger.error(f"Erreur timeout flood: {e}")
+    try:
+        await twitch.delete_chat_message(broadcaster_id, moderator_id, message_id=msg.id)
+    except Exception as e:
+        logger.error(f"Erreur suppression message flood: {e}")
+    
+    _log_action("flood", "AutoMod", msg.user.name, f"plus de {max_messages} messages en {window}s")
+    logger.info(f"Flood détecté de {msg.user.name}")
+    return False
@@ -0,0 +1,98 @@
+# Traitement d'un message du chat Twitch en étapes déclarées (comptage, filtre de liens, mots
+# interdits, flood, commandes). Les étapes partagent un contexte par message ; une étape qui
+# retourne False arrête le traitement (message bloqué). Chaque étape a son histogramme de
+# latence et ses compteurs, exposés par /settings/cache-stats pour repérer l'étape coûteuse
+# pendant un raid.
+import bisect
+import logging
+import threading
+import time
+
+from twitchAPI.twitch import Twitch
+from twitchAPI.chat import ChatMessage
+
+logger = logging.getLogger('twitch-pipeline')
+
+# Bornes supérieures des classes de l'histogramme, en millisecondes (la dernière est ouverte)
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class MessageContext:
+	__slots__ = ('msg', 'twitch', 'received_at', 'login', 'is_broadcaster', 'is_mod', 'blocked_by')
+
+	def __init__(self, msg: ChatMessage, twitch: Twitch):
+		self.msg = msg
+		self.twitch = twitch
+		self.received_at = time.time()
+		self.login = msg.user.name.lower()
+		self.is_broadcaster = self.login == msg.room.name.lower()
+		self.is_mod = msg.user.mod or self.is_broadcaster
+		self.blocked_by = None
+
+
+class StageStats:
+	__slots__ = ('calls', 'blocked', 'errors', 'total_ms', 'max_ms', 'histogram')
+
+	def __init__(self):
+		self.calls = 0
+		self.blocked = 0
+		self.errors = 0
+		self.total_ms = 0.0
+		self.max_ms = 0.0
+		self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+	def add(self, elapsed_ms: float):
+		self.calls += 1
+		self.total_ms += elapsed_ms
+		if elapsed_ms > self.max_ms:
+			self.max_ms = elapsed_ms
+		self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+	def toDict(self) -> dict:
+		labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+		return {
+			'calls': self.calls,
+			'blocked': self.blocked,
+			'errors': self.errors,
+			'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+			'max_ms': round(self.max_ms, 3),
+			'total_ms': round(self.total_ms, 3),
+			'histogram': dict(zip(labels, self.histogram)),
+		}
+
+
+class MessagePipeline:
+	def __init__(self, stages: list):
+		""":param stages: liste de (nom, étape async (MessageContext) -> bool), dans l'ordre d'exécution."""
+		self._stages = stages
+		self._lock = threading.Lock()
+		self._stats = {name: StageStats() for name, _ in stages}
+		self._messages = 0
+
+	async def run(self, ctx: MessageContext) -> bool:
+		"""Exécute les étapes ; False si une étape a bloqué le message."""
+		self._messages += 1
+		for name, stage in self._stages:
+			start = time.perf_counter()
+			try:
+				proceed = await stage(ctx)
+			except Exception as e:
+				# Une étape en erreur ne bloque pas le message ni les étapes suivantes
+				logger.error(f"Étape {name} en erreur : {e}")
+				proceed = True
+				with self._lock:
+					self._stats[name].errors += 1
+			elapsed = (time.perf_counter() - start) * 1000
+			with self._lock:
+				stats = self._stats[name]
+				stats.add(elapsed)
+				if proceed is False:
+					stats.blocked += 1
+			if proceed is False:
+				ctx.blocked_by = name
+				return False
+		return True
+
+	def getStats(self) -> dict:
+		with self._lock:
+			return {'messages': self._messages, 'stages': {name: stats.toDict() for name, stats in self._stats.items()}}
@@ -1,12 +1,12 @@
-import asyncio
 import logging
 import time
 
 from twitchAPI.chat import ChatMessage
 
 from database.helpers import ConfigurationHelper
-from protondb import searhProtonDb
+from protondb import searchProtonDb
 from twitchbot import _user_has_twitch_permission
+from twitchbot.chat_queue import chatQueue
 from webapp import webapp
 
 _last_used: float = 0.0
@@ -66,7 +66,7 @@ async def protondb_command(msg: ChatMessage):
 		elapsed = time.time() - _last_used
 		if elapsed < cooldown:
 			remaining = int(cooldown - elapsed)
-			await msg.reply(f"@{msg.user.name} La commande !pdb est en cooldown, réessaie dans {remaining}s.")
+			chatQueue.reply(msg, f"@{msg.user.name} La commande !pdb est en cooldown, réessaie dans {remaining}s.")
 			return
 	_last_used = time.time()
 
@@ -78,27 +78,22 @@ async def protondb_command(msg: ChatMessage):
 	name = text.strip()
 
 	if not name:
-		await msg.reply(f"@{msg.user.name} Utilisation : !pdb <nom du jeu>  Exemple : !pdb Elden Ring")
+		chatQueue.reply(msg, f"@{msg.user.name} Utilisation : !pdb <nom du jeu>  Exemple : !pdb Elden Ring")
 		return
 
-	def _search():
-		with webapp.app_context():
-			return searhProtonDb(name)
-
 	try:
-		loop = asyncio.get_event_loop()
-		games = await loop.run_in_executor(None, _search)
+		games, _ = await searchProtonDb(name, limit=3)
 	except Exception as e:
 		logging.error(f'Erreur ProtonDB Twitch pour "{name}": {e}')
-		await msg.reply(f"@{msg.user.name} Erreur lors de la recherche ProtonDB.")
+		chatQueue.reply(msg, f"@{msg.user.name} Erreur lors de la recherche ProtonDB.")
 		return
 
 	if not games:
-		await msg.reply(f"@{msg.user.name} Aucun jeu trouvé pour \"{name}\" sur Steam.")
+		chatQueue.reply(msg, f"@{msg.user.name} Aucun jeu trouvé pour \"{name}\" sur Steam.")
 		return
 
-	for game in games[:3]:
+	for game in games:
 		response = _format_game_response(game)
 		if len(response) > 500:
 			response = response[:497] + '...'
-		await msg.reply(response)
+		chatQueue.reply(msg, response)
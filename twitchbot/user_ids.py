@@ -0,0 +1,126 @@
+# Résolution login Twitch → id utilisateur sans appel Helix systématique.
+# - cache LRU à durée de vie, alimenté par les tags des messages du chat (auteur et salon) ;
+# - les résolutions manquées d'un même tour de boucle sont regroupées en un seul appel
+#   get_users(logins=[...]) par tranche de 100 logins ;
+# - l'id du compte du bot (modérateur) est résolu une fois par session Twitch.
+# Toutes les méthodes async s'exécutent sur la boucle du bot Twitch.
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from twitchAPI.twitch import Twitch
+
+logger = logging.getLogger('twitch-user-ids')
+
+USER_ID_CACHE_SIZE = 10000
+USER_ID_CACHE_TTL = 24 * 3600
+HELIX_MAX_LOGINS = 100
+
+
+class UserIdCache:
+	def __init__(self, max_size: int = USER_ID_CACHE_SIZE, ttl: float = USER_ID_CACHE_TTL):
+		self._max_size = max_size
+		self._ttl = ttl
+		self._entries = OrderedDict()
+		self._twitch = None
+		self._pending = {}
+		self._flush_task = None
+		self._moderator_task = None
+		self._stats = {'hits': 0, 'misses': 0, 'seeded': 0, 'helix_calls': 0}
+
+	def remember(self, login: str, user_id: str):
+		if not login or not user_id:
+			return
+		login = login.lower()
+		self._entries[login] = (user_id, time.monotonic() + self._ttl)
+		self._entries.move_to_end(login)
+		while len(self._entries) > self._max_size:
+			self._entries.popitem(last=False)
+
+	def seedFromMessage(self, msg):
+		"""Enregistre les ids portés par les tags d'un message (auteur et salon)."""
+		self.remember(msg.user.name, getattr(msg.user, 'id', None))
+		self.remember(msg.room.name, getattr(msg.room, 'room_id', None))
+		self._stats['seeded'] += 1
+
+	def get(self, login: str) -> str | None:
+		login = login.lower()
+		entry = self._entries.get(login)
+		if entry is None:
+			return None
+		if entry[1] < time.monotonic():
+			del self._entries[login]
+			return None
+		self._entries.move_to_end(login)
+		return entry[0]
+
+	def _bind(self, twitch: Twitch):
+		# Nouvelle session (nouvelle boucle) : les futures et l'id du modérateur de l'ancienne sont caducs
+		if twitch is not self._twitch:
+			self._twitch = twitch
+			self._pending = {}
+			self._flush_task = None
+			self._moderator_task = None
+
+	async def resolve(self, twitch: Twitch, login: str) -> str | None:
+		user_id = self.get(login)
+		if user_id is not None:
+			self._stats['hits'] += 1
+			return user_id
+		self._stats['misses'] += 1
+		self._bind(twitch)
+		login = login.lower()
+		future = self._pending.get(login)
+		if future is None:
+			future = asyncio.get_running_loop().create_future()
+			self._pending[login] = future
+			if self._flush_task is None:
+				self._flush_task = asyncio.create_task(self._flush(twitch))
+		return await asyncio.shield(future)
+
+	async def _flush(self, twitch: Twitch):
+		# Laisse les autres résolutions du même tour de boucle rejoindre le lot
+		await asyncio.sleep(0)
+		pending, self._pending = self._pending, {}
+		self._flush_task = None
+		logins = list(pending)
+		for start in range(0, len(logins), HELIX_MAX_LOGINS):
+			chunk = logins[start:start + HELIX_MAX_LOGINS]
+			self._stats['helix_calls'] += 1
+			try:
+				async for user in twitch.get_users(logins=chunk):
+					self.remember(user.login, user.id)
+			except Exception as e:
+				for login in chunk:
+					if not pending[login].done():
+						pending[login].set_exception(e)
+				continue
+			for login in chunk:
+				if not pending[login].done():
+					pending[login].set_result(self.get(login))
+
+	async def resolveModerator(self, twitch: Twitch) -> str | None:
+		self._bind(twitch)
+		if self._moderator_task is None:
+			self._moderator_task = asyncio.create_task(self._fetchModerator(twitch))
+		try:
+			return await asyncio.shield(self._moderator_task)
+		except Exception:
+			self._moderator_task = None
+			raise
+
+	async def _fetchModerator(self, twitch: Twitch) -> str | None:
+		self._stats['helix_calls'] += 1
+		async for user in twitch.get_users():
+			self.remember(user.login, user.id)
+			return user.id
+		return None
+
+	def getStats(self) -> dict:
+		stats = dict(self._stats)
+		stats['size'] = len(self._entries)
+		return stats
+
+
+userIds = UserIdCache()
@@ -7,7 +7,7 @@ webapp = Flask(__name__)
 # Secret key pour les sessions (Flask-Login)
 webapp.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-change-in-production")
 
-# État des bots (mis à jour par les bots, lu par le panneau)
+# État des bots (mis à jour par les bots, lu par le panneau) ; le chat Twitch est dans webapp.chat_activity
 webapp.config["BOT_STATUS"] = {
 	"discord_connected": False,
 	"discord_guild_count": 0,
@@ -21,9 +21,6 @@ webapp.config["BOT_STATUS"] = {
 	"twitch_started_at": None,
 	"twitch_ended_at": None,
 	"twitch_chat_clear_notice_sent": False,
-	"twitch_msg_per_minute": 0,
-	"twitch_msg_timestamps": [],  # Unix timestamps des 60 dernières secondes
-	"twitch_chat_messages": [],  # Derniers messages du chat (max 100)
 	"shoutbox_heartbeats": {},   # {"username": datetime} — présence des modos
 }
 
@@ -32,12 +29,12 @@ login_manager.init_app(webapp)
 login_manager.login_view = "login"
 login_manager.login_message = "Veuillez vous connecter pour accéder à cette page."
 
-from database.models import WebappUser
+from database.permissions import getUser
 
 @login_manager.user_loader
 def load_user(user_id):
 	try:
-		return WebappUser.query.get(int(user_id))
+		return getUser(int(user_id))
 	except (ValueError, TypeError):
 		return None
 
@@ -6,7 +6,8 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from database import db
-from database.models import WebappUser, ROLE_ORDER, PagePermission
+from database.models import WebappUser, ROLE_ORDER
+from database.permissions import pageMinLevel
 from database.helpers import ConfigurationHelper
 
 from webapp import webapp
@@ -42,12 +43,7 @@ def require_role_min(min_role: str):
 
 def _page_min_level(page_key: str, for_write: bool = False) -> int:
 	"""Niveau minimum requis pour la page (lecture ou écriture)."""
-	perm = PagePermission.query.filter_by(page_key=page_key).first()
-	if not perm:
-		return 0
-	if for_write and perm.write_level is not None:
-		return perm.write_level
-	return perm.min_level
+	return pageMinLevel(page_key, for_write)
 
 
 def require_page(page_key: str):
@@ -0,0 +1,148 @@
+# Activité du chat Twitch partagée entre le bot (écriture) et le panneau (lecture).
+# - derniers messages dans un deque borné d'enregistrements compacts, numérotés par un compteur
+#   croissant (seq) : un client qui poll ne demande que les messages après son curseur ;
+# - débit de messages par compteurs en anneau d'une seconde : msg/min, msg/5 min et msg/h
+#   sont des sommes glissantes tenues à jour, sans parcours des horodatages.
+# Le panneau ne lit que des copies (snapshot), jamais la structure vivante ; chaque nouvelle
+# ligne est aussi poussée aux panneaux ouverts par le flux d'événements (panel_events).
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from webapp.panel_events import panelEvents
+
+CHAT_BUFFER_SIZE = 100
+CLEAR_AFTER_LIVE = timedelta(hours=1)
+CLEAR_AFTER_LIVE_REASON = "Chat vidé automatiquement 1h après la fin du live."
+RATE_WINDOWS = (60, 300, 3600)
+_RING_SIZE = max(RATE_WINDOWS)
+
+
+class ChatRecord:
+	__slots__ = ('username', 'text', 'timestamp', 'is_mod', 'is_subscriber', 'is_vip', 'color', 'panel_only', 'seq')
+
+	def __init__(self, username: str, text: str, timestamp: str, is_mod: bool, is_subscriber: bool, is_vip: bool, color: str, panel_only: bool = False):
+		self.username = username
+		self.text = text
+		self.timestamp = timestamp
+		self.is_mod = is_mod
+		self.is_subscriber = is_subscriber
+		self.is_vip = is_vip
+		self.color = color
+		self.panel_only = panel_only
+		self.seq = 0
+
+	def toDict(self) -> dict:
+		return {key: getattr(self, key) for key in self.__slots__}
+
+
+class RateCounter:
+	"""Compteurs par seconde sur une heure glissante ; chaque fenêtre garde sa somme courante."""
+
+	def __init__(self):
+		self._buckets = [0] * _RING_SIZE
+		self._sums = dict.fromkeys(RATE_WINDOWS, 0)
+		self._second = int(time.time())
+
+	def _advance(self, now: int):
+		elapsed = now - self._second
+		if elapsed <= 0:
+			return
+		if elapsed >= _RING_SIZE:
+			self._buckets = [0] * _RING_SIZE
+			self._sums = dict.fromkeys(RATE_WINDOWS, 0)
+		else:
+			buckets, sums = self._buckets, self._sums
+			for second in range(self._second + 1, now + 1):
+				# La seconde second - window sort de chaque fenêtre ; pour l'heure, c'est la case réutilisée
+				for window in RATE_WINDOWS:
+					sums[window] -= buckets[(second - window) % _RING_SIZE]
+				buckets[second % _RING_SIZE] = 0
+		self._second = now
+
+	def increment(self, now: float):
+		now = int(now)
+		self._advance(now)
+		self._buckets[now % _RING_SIZE] += 1
+		for window in RATE_WINDOWS:
+			self._sums[window] += 1
+
+	def rates(self, now: float) -> dict:
+		self._advance(int(now))
+		return dict(self._sums)
+
+
+class ChatActivity:
+	def __init__(self, size: int = CHAT_BUFFER_SIZE):
+		self._lock = threading.Lock()
+		self._messages = deque(maxlen=size)
+		self._counter = RateCounter()
+		self._seq = 0
+
+	def record(self, record: ChatRecord):
+		with self._lock:
+			self._seq += 1
+			record.seq = self._seq
+			self._messages.append(record)
+			self._counter.increment(time.time())
+		panelEvents.publish('chat', record.toDict())
+
+	def notice(self, record: ChatRecord):
+		"""Message affiché dans le panneau sans compter dans le débit du chat."""
+		with self._lock:
+			self._seq += 1
+			record.seq = self._seq
+			self._messages.append(record)
+		panelEvents.publish('chat', record.toDict())
+
+	def snapshot(self, after: int | None = None) -> list:
+		"""Messages du buffer, ou seulement ceux dont seq dépasse after."""
+		with self._lock:
+			if after is None:
+				records = list(self._messages)
+			else:
+				# Les plus récents sont à droite : on s'arrête au premier déjà connu
+				records = []
+				for record in reversed(self._messages):
+					if record.seq <= after:
+						break
+					records.append(record)
+				records.reverse()
+		return [record.toDict() for record in records]
+
+	def lastSeq(self) -> int:
+		return self._seq
+
+	def rates(self) -> dict:
+		with self._lock:
+			sums = self._counter.rates(time.time())
+		return {'msg_per_min': sums[60], 'msg_per_5min': sums[300], 'msg_per_hour': sums[3600]}
+
+	def hasMessages(self) -> bool:
+		return bool(self._messages)
+
+	def clear(self, reason: str | None = None):
+		with self._lock:
+			self._messages.clear()
+			self._counter = RateCounter()
+		panelEvents.publish('chat_clear', {'reason': reason})
+
+
+twitchChat = ChatActivity()
+
+
+def clearAfterLive(bot_status: dict) -> bool:
+	"""Vide le chat une heure après la fin du live ; True une fois ce délai écoulé."""
+	ended_at_raw = bot_status.get("twitch_ended_at")
+	if not ended_at_raw:
+		return False
+	try:
+		ended_at = datetime.fromisoformat(ended_at_raw)
+	except ValueError:
+		return False
+	if datetime.now(ended_at.tzinfo) < ended_at + CLEAR_AFTER_LIVE:
+		return False
+	if twitchChat.hasMessages():
+		twitchChat.clear(CLEAR_AFTER_LIVE_REASON)
+	return True
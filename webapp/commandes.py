@@ -3,6 +3,7 @@ from webapp import webapp
 from webapp.auth import require_page, can_write_page
 from database import db
 from database.models import Commande
+from database.commands import parseAliases
 
 @webapp.route("/commandes")
 @require_page("commandes")
@@ -23,6 +24,7 @@ def add_commande():
 	discord_enable = request.form.get('discord_enable') != None
 	twitch_enable = request.form.get('twitch_enable') != None
 	twitch_permission = request.form.get('twitch_permission') or 'viewer'
+	aliases = ', '.join(parseAliases(request.form.get('aliases'))) or None
 	if twitch_permission not in TWITCH_PERMISSIONS:
 		twitch_permission = 'viewer'
 	
@@ -32,7 +34,7 @@ def add_commande():
 		
 		existing = Commande.query.filter_by(trigger=trigger).first()
 		if not existing:
-			commande = Commande(trigger=trigger, response=response, discord_enable=discord_enable, twitch_enable=twitch_enable, twitch_permission=twitch_permission)
+			commande = Commande(trigger=trigger, response=response, discord_enable=discord_enable, twitch_enable=twitch_enable, twitch_permission=twitch_permission, aliases=aliases)
 			db.session.add(commande)
 			db.session.commit()
 	
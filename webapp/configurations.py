@@ -23,7 +23,8 @@ def updateConfiguration():
 		'welcome_enable': 'welcome_channel_id',
 		'leave_enable': 'leave_channel_id',
 		'auto_rooms_enable': 'auto_rooms_channel_id',
-		'twitch_commands_enable': 'twitch_channel'
+		'twitch_commands_enable': 'twitch_channel',
+		'twitch_flood_enable': 'twitch_channel'
 	}
 	
 	staff_roles = request.form.getlist('moderation_staff_role_ids')
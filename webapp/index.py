@@ -1,15 +1,37 @@
+from datetime import date, timedelta
+
 from flask import render_template
 from webapp import webapp
 from webapp.auth import require_page
-from database.models import ModerationEvent, TwitchAnnouncement, TwitchModerationLog
+from database import db
+from database.models import TwitchAnnouncement, DailyModerationStat, DailyTwitchModeration, DailyMemberStat
+
+TREND_DAYS = 30
+
+def _daily_series(*columns, since: date) -> dict:
+	"""Totaux journaliers depuis `since` (jours sans activité à 0), lus dans les agrégats."""
+	days = [since + timedelta(days=i) for i in range((date.today() - since).days + 1)]
+	series = {}
+	for column in columns:
+		rows = dict(
+			db.session.query(column.class_.day, db.func.sum(column))
+			.filter(column.class_.day >= since)
+			.group_by(column.class_.day)
+			.all()
+		)
+		values = [int(rows.get(day) or 0) for day in days]
+		series[column.key] = {"values": values, "max": max(values) or 1, "total": sum(values)}
+	series["days"] = days
+	return series
 
 @webapp.route("/")
 @require_page("index")
 def index():
 	status = webapp.config["BOT_STATUS"]
-	sanctions_count = ModerationEvent.query.count()
+	sanctions_count = db.session.query(db.func.coalesce(db.func.sum(DailyModerationStat.count), 0)).scalar()
 	twitch_announcements_count = TwitchAnnouncement.query.count()
-	twitch_moderation_count = TwitchModerationLog.query.count()
+	twitch_moderation_count = db.session.query(db.func.coalesce(db.func.sum(DailyTwitchModeration.count), 0)).scalar()
+	since = date.today() - timedelta(days=TREND_DAYS - 1)
 	return render_template(
 		"index.html",
 		discord_connected=status["discord_connected"],
@@ -19,4 +41,8 @@ def index():
 		twitch_channel_name=status["twitch_channel_name"],
 		twitch_announcements_count=twitch_announcements_count,
 		twitch_moderation_count=twitch_moderation_count,
+		sanctions_trend=_daily_series(DailyModerationStat.count, since=since),
+		twitch_trend=_daily_series(DailyTwitchModeration.count, DailyTwitchModeration.automod_count, since=since),
+		members_trend=_daily_series(DailyMemberStat.joins, DailyMemberStat.leaves, since=since),
+		trend_days=TREND_DAYS,
 	)
@@ -1,59 +1,103 @@
-from flask import render_template, request, redirect, url_for
+from datetime import datetime, timedelta
+
+from flask import render_template, request, redirect, url_for, jsonify
 from webapp import webapp
 from webapp.auth import require_page, can_write_page
 from database import db
-from database.models import ModerationEvent
+from database.models import ModerationEvent, DailyModerationTarget, DailyModerationStaff
+from database.moderation_history import queryModerationEvents, DEFAULT_PAGE_SIZE
+
+EVENT_TYPES = ['warning', 'timeout', 'kick', 'ban', 'unban', 'transfer']
 
 def _top_sanctioned():
+	# Agrégats journaliers : quelques lignes par jour au lieu de tout l'historique
+	total = db.func.sum(DailyModerationTarget.count)
 	return (
 		db.session.query(
-			ModerationEvent.discord_id,
-			db.func.max(ModerationEvent.username).label("username"),
-			db.func.count(ModerationEvent.id).label("count"),
+			DailyModerationTarget.discord_id,
+			db.func.max(DailyModerationTarget.username).label("username"),
+			total.label("count"),
 		)
-		.group_by(ModerationEvent.discord_id)
-		.order_by(db.func.count(ModerationEvent.id).desc())
+		.group_by(DailyModerationTarget.discord_id)
+		.having(total > 0)
+		.order_by(total.desc())
 		.limit(3)
 		.all()
 	)
 
 def _top_moderators():
+	total = db.func.sum(DailyModerationStaff.count)
 	return (
 		db.session.query(
-			ModerationEvent.staff_id,
-			db.func.max(ModerationEvent.staff_name).label("staff_name"),
-			db.func.count(ModerationEvent.id).label("count"),
+			DailyModerationStaff.staff_id,
+			db.func.max(DailyModerationStaff.staff_name).label("staff_name"),
+			total.label("count"),
 		)
-		.group_by(ModerationEvent.staff_id)
-		.order_by(db.func.count(ModerationEvent.id).desc())
+		.group_by(DailyModerationStaff.staff_id)
+		.having(total > 0)
+		.order_by(total.desc())
 		.limit(3)
 		.all()
 	)
 
+def _parse_date(value: str):
+	try:
+		return datetime.strptime(value, '%Y-%m-%d') if value else None
+	except ValueError:
+		return None
+
+def _request_filters() -> dict:
+	"""Filtres de l'historique lus dans la query string (type, user, staff, from, to)."""
+	date_to = _parse_date(request.args.get('to', ''))
+	return {
+		'event_type': request.args.get('type', '').strip() or None,
+		'user': request.args.get('user', '').strip() or None,
+		'staff': request.args.get('staff', '').strip() or None,
+		'date_from': _parse_date(request.args.get('from', '')),
+		# Date de fin incluse : on s'arrête au début du jour suivant
+		'date_to': date_to + timedelta(days=1) if date_to else None,
+	}
+
 @webapp.route("/moderation")
 @require_page("moderation")
 def moderation():
-	events = ModerationEvent.query.order_by(ModerationEvent.created_at.desc()).all()
+	events, next_cursor = queryModerationEvents(limit=DEFAULT_PAGE_SIZE, **_request_filters())
 	top_sanctioned = _top_sanctioned()
 	top_moderators = _top_moderators()
 	return render_template(
 		"moderation.html",
 		events=events,
+		next_cursor=next_cursor,
+		event_types=EVENT_TYPES,
 		event=None,
 		top_sanctioned=top_sanctioned,
 		top_moderators=top_moderators,
 	)
 
+@webapp.route("/moderation/events")
+@require_page("moderation")
+def moderation_events_page():
+	"""Page suivante de l'historique (chargement progressif) : lignes HTML et curseur suivant."""
+	limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+	events, next_cursor = queryModerationEvents(request.args.get('cursor'), limit, **_request_filters())
+	return jsonify({
+		"html": render_template("moderation-rows.html", events=events),
+		"count": len(events),
+		"next_cursor": next_cursor,
+	})
+
 @webapp.route("/moderation/edit/<int:event_id>")
 @require_page("moderation")
 def open_edit_moderation_event(event_id):
 	event = ModerationEvent.query.get_or_404(event_id)
-	events = ModerationEvent.query.order_by(ModerationEvent.created_at.desc()).all()
 	top_sanctioned = _top_sanctioned()
 	top_moderators = _top_moderators()
+	# Le formulaire d'édition remplace la liste : inutile de charger l'historique
 	return render_template(
 		"moderation.html",
-		events=events,
+		events=[],
+		next_cursor=None,
+		event_types=EVENT_TYPES,
 		event=event,
 		top_sanctioned=top_sanctioned,
 		top_moderators=top_moderators,
@@ -0,0 +1,131 @@
+# Flux temps réel du panneau de modération Twitch (Server-Sent Events).
+# Les bots et les routes publient les changements (ligne de chat, log de modération, message
+# de shoutbox, infos du stream, présence) une seule fois : chaque événement est sérialisé en
+# trame SSE puis déposé dans la file bornée de chaque panneau ouvert. Un panneau coûte donc
+# O(événements) au lieu d'un rechargement complet par intervalle de polling.
+# - les derniers événements sont gardés pour rejouer ce qu'un panneau a manqué pendant une
+#   reconnexion (en-tête Last-Event-ID) ;
+# - un panneau trop lent (file pleine) ou revenu trop tard reçoit « resync » et recharge tout ;
+# - chaque flux occupe un thread waitress : leur nombre est plafonné, au-delà le panneau
+#   revient au polling.
+import json
+import queue
+import threading
+from collections import deque
+
+BACKLOG_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+MAX_SUBSCRIBERS = 8
+
+
+def sseFrame(event: str, data, event_id: int | None = None) -> str:
+	payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+	head = f'id: {event_id}\n' if event_id is not None else ''
+	return f'{head}event: {event}\ndata: {payload}\n\n'
+
+
+RESYNC_FRAME = sseFrame('resync', {})
+
+
+def streamInfo(bot_status: dict) -> dict:
+	"""Infos du live principal telles qu'affichées par le panneau."""
+	return {
+		"is_live": bot_status.get("twitch_is_live", False),
+		"viewer_count": bot_status.get("twitch_viewer_count", 0),
+		"title": bot_status.get("twitch_stream_title", ""),
+		"game_name": bot_status.get("twitch_game_name", ""),
+		"started_at": bot_status.get("twitch_started_at"),
+	}
+
+
+class PanelSubscriber:
+	__slots__ = ('username', 'frames', 'overflowed')
+
+	def __init__(self, username: str):
+		self.username = username
+		self.frames = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+		self.overflowed = False
+
+	def push(self, frame: str):
+		try:
+			self.frames.put_nowait(frame)
+		except queue.Full:
+			self.overflowed = True
+
+	def next(self, timeout: float) -> str:
+		"""Trames en attente, concaténées ; chaîne vide si rien n'arrive avant timeout."""
+		try:
+			frames = [self.frames.get(timeout=timeout)]
+		except queue.Empty:
+			return ''
+		while True:
+			try:
+				frames.append(self.frames.get_nowait())
+			except queue.Empty:
+				break
+		if self.overflowed:
+			# Des événements ont été perdus : le panneau repart d'un état complet
+			self.overflowed = False
+			return RESYNC_FRAME
+		return ''.join(frames)
+
+
+class PanelEventHub:
+	def __init__(self, backlog: int = BACKLOG_SIZE, max_subscribers: int = MAX_SUBSCRIBERS):
+		self._lock = threading.Lock()
+		self._subscribers = set()
+		self._backlog = deque(maxlen=backlog)
+		self._sequence = 0
+		self._max_subscribers = max_subscribers
+		self._stats = {'published': 0, 'delivered': 0, 'replayed': 0, 'resyncs': 0, 'rejected': 0, 'max_subscribers': 0}
+
+	def publish(self, event: str, data):
+		with self._lock:
+			self._sequence += 1
+			frame = sseFrame(event, data, self._sequence)
+			self._backlog.append((self._sequence, frame))
+			subscribers = tuple(self._subscribers)
+			self._stats['published'] += 1
+			self._stats['delivered'] += len(subscribers)
+		for subscriber in subscribers:
+			subscriber.push(frame)
+
+	def subscribe(self, username: str, last_event_id: str | None = None) -> PanelSubscriber | None:
+		"""Ouvre un abonnement, None si le plafond de flux est atteint."""
+		subscriber = PanelSubscriber(username)
+		with self._lock:
+			if len(self._subscribers) >= self._max_subscribers:
+				self._stats['rejected'] += 1
+				return None
+			try:
+				last = int(last_event_id) if last_event_id else None
+			except ValueError:
+				last = None
+			if last is not None and last < self._sequence and self._backlog and self._backlog[0][0] <= last + 1:
+				missed = [frame for event_id, frame in self._backlog if event_id > last]
+				for frame in missed:
+					subscriber.push(frame)
+				self._stats['replayed'] += len(missed)
+			elif last is not None and last != self._sequence:
+				# Trou trop ancien, ou numérotation repartie de zéro après un redémarrage
+				subscriber.push(RESYNC_FRAME)
+				self._stats['resyncs'] += 1
+			self._subscribers.add(subscriber)
+			if len(self._subscribers) > self._stats['max_subscribers']:
+				self._stats['max_subscribers'] = len(self._subscribers)
+		return subscriber
+
+	def unsubscribe(self, subscriber: PanelSubscriber):
+		with self._lock:
+			self._subscribers.discard(subscriber)
+
+	def usernames(self) -> set:
+		with self._lock:
+			return {subscriber.username for subscriber in self._subscribers}
+
+	def getStats(self) -> dict:
+		with self._lock:
+			return {**self._stats, 'subscribers': len(self._subscribers), 'last_event_id': self._sequence}
+
+
+panelEvents = PanelEventHub()
@@ -4,12 +4,13 @@ from webapp.auth import require_page, can_write_page
 from database import db
 from database.models import GameAlias
 from database.helpers import ConfigurationHelper
+from protondb.cache import getCacheStats
 
 @webapp.route("/protondb")
 @require_page("protondb")
 def openProtonDB():
 	aliases = GameAlias.query.all()
-	return render_template("protondb.html", aliases=aliases, configuration=ConfigurationHelper())
+	return render_template("protondb.html", aliases=aliases, configuration=ConfigurationHelper(), cache_stats=getCacheStats(with_database=True))
 
 @webapp.route("/protondb/gamealias/add", methods=['POST'])
 @require_page("protondb")
@@ -26,7 +27,8 @@ def addGameAlias():
 def delGameAlias(id: int):
 	if not can_write_page("protondb"):
 		return render_template("403.html"), 403
-	GameAlias.query.filter_by(id=id).delete()
+	# Suppression par la session (pas en masse) : l'index des jeux recompile ainsi ses alias
+	db.session.delete(GameAlias.query.get_or_404(id))
 	db.session.commit()
 	return redirect(url_for('openProtonDB'))
 
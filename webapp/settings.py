@@ -1,11 +1,15 @@
 # Paramètres webapp : rôles, permissions par page, inscriptions (super administrateur uniquement).
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify
 
 from webapp import webapp
 from webapp.auth import require_page
 from database import db
 from database.models import WebappRole, PagePermission, WebappUser
 from database.helpers import ConfigurationHelper
+from database.permissions import getPermissionCacheStats
+from database.writebehind import writeBehind
+from database.retention import getRetentionStats
+from webapp.panel_events import panelEvents
 
 # Métadonnées des pages : catégorie, label d'affichage, description
 PAGE_METADATA = {
@@ -327,3 +331,33 @@ def settings_permissions_bulk():
 	db.session.commit()
 	flash(f"Accès mis à jour pour {updated} page(s) avec le rôle « {role_name} ».", "success")
 	return redirect(url_for("settings"))
+
+
+@webapp.route("/settings/cache-stats")
+@require_page("settings")
+def settings_cache_stats():
+	"""Compteurs des caches en mémoire et de l'écriture différée (pour vérifier qu'ils absorbent la charge)."""
+	# Import local : le paquet twitchbot importe webapp
+	from twitchbot import messagePipeline
+	from twitchbot.user_ids import userIds
+	from twitchbot.helix import helix
+	from twitchbot.chat_queue import chatQueue
+	from protondb import getSearchStats
+	from protondb.cache import getCacheStats as getProtonDbCacheStats
+	from protondb.anticheat import getAntiCheatStats
+	from protondb.game_index import gameIndex
+	return jsonify({
+		"configuration": ConfigurationHelper().getCacheStats(),
+		"permissions": getPermissionCacheStats(),
+		"write_behind": writeBehind.getStats(),
+		"retention": getRetentionStats(),
+		"twitch_pipeline": messagePipeline.getStats(),
+		"twitch_user_ids": userIds.getStats(),
+		"twitch_helix": helix.getStats(),
+		"twitch_chat_queue": chatQueue.getStats(),
+		"panel_events": panelEvents.getStats(),
+		"protondb_search": getSearchStats(),
+		"protondb_cache": getProtonDbCacheStats(),
+		"protondb_anticheat": getAntiCheatStats(),
+		"protondb_game_index": gameIndex.getStats(),
+	})
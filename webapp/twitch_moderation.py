@@ -1,10 +1,18 @@
-from flask import render_template, request, redirect, url_for, jsonify
+import gzip
+import hashlib
+import time
+
+from flask import render_template, request, redirect, url_for, jsonify, Response
 from webapp import webapp
 from webapp.auth import require_page, can_write_page
 from database import db
+from database.executor import runQuery
+from sqlalchemy import func
 from database.models import Commande, TwitchModerationLog, TwitchLinkFilter, TwitchBannedWord, ModShoutboxMessage
 from flask_login import current_user
 from database.helpers import ConfigurationHelper
+from webapp.chat_activity import twitchChat, clearAfterLive, CLEAR_AFTER_LIVE_REASON
+from webapp.panel_events import panelEvents, streamInfo, sseFrame
 from datetime import datetime, timedelta, timezone
 
 
@@ -190,6 +198,7 @@ def clear_twitch_logs():
         return render_template("403.html"), 403
     TwitchModerationLog.query.delete()
     db.session.commit()
+    panelEvents.publish('logs_clear', {})
     return redirect(url_for('twitch_moderation'))
 
 @webapp.route("/twitch-moderation/add", methods=['POST'])
@@ -273,7 +282,13 @@ def add_banned_word():
     if word:
         existing = TwitchBannedWord.query.filter_by(word=word).first()
         if not existing:
-            banned_word = TwitchBannedWord(word=word, enabled=True, timeout_duration=timeout_duration)
+            banned_word = TwitchBannedWord(
+                word=word,
+                enabled=True,
+                timeout_duration=timeout_duration,
+                whole_word=request.form.get('whole_word') == 'on',
+                leet=request.form.get('leet') == 'on',
+            )
             db.session.add(banned_word)
             db.session.commit()
     
@@ -318,95 +333,120 @@ def send_twitch_message():
             return jsonify({"success": False, "error": "Event loop du bot non disponible"}), 503
 
         async def send_msg():
-            await twitchBot.chat.send_message(channel, message)
+            from twitchbot.chat_queue import chatQueue
+            return await chatQueue.send(channel, message)
 
         future = asyncio.run_coroutine_threadsafe(send_msg(), twitchBot._loop)
-        future.result(timeout=10)
+        if not future.result(timeout=10):
+            return jsonify({"success": False, "error": "Message abandonné (limite d'envoi du chat atteinte)"}), 429
         return jsonify({"success": True})
     except TimeoutError:
         return jsonify({"success": False, "error": "Timeout lors de l'envoi"}), 504
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Endpoints de polling incrémentaux : le client renvoie le curseur reçu (after=...) et ne reçoit
+# que les éléments plus récents. Sans changement, la réponse est un 304 (ETag calculé depuis
+# l'état, sans construire le corps) ; les corps volumineux (chargement initial) sont compressés.
+GZIP_MIN_SIZE = 1024
+LOG_PAGE_SIZE = 100
+
+
+def _delta_json(state, build):
+    """Réponse JSON conditionnelle : 304 si le client a déjà l'état ``state``, sinon build()."""
+    etag = hashlib.blake2s(repr(state).encode(), digest_size=8).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+        body = response.get_data()
+        if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
 @webapp.route("/twitch-moderation/messages")
 @require_page("twitch_moderation")
 def get_twitch_messages():
-    """Retourne les derniers messages du chat Twitch"""
-    bot_status = webapp.config["BOT_STATUS"]
-    clear_chat = False
-    clear_reason = None
-
-    ended_at_raw = bot_status.get("twitch_ended_at")
-    if ended_at_raw:
-        try:
-            ended_at = datetime.fromisoformat(ended_at_raw)
-            if datetime.now(ended_at.tzinfo) >= ended_at + timedelta(hours=1):
-                if bot_status.get("twitch_chat_messages"):
-                    bot_status["twitch_chat_messages"] = []
-                bot_status["twitch_msg_timestamps"] = []
-                bot_status["twitch_msg_per_minute"] = 0
-                clear_chat = True
-                clear_reason = "Chat vidé automatiquement 1h après la fin du live."
-        except ValueError:
-            pass
+    """Messages du chat Twitch après le curseur ``after`` (tout le buffer sans curseur)."""
+    clear_chat = clearAfterLive(webapp.config["BOT_STATUS"])
+    clear_reason = CLEAR_AFTER_LIVE_REASON if clear_chat else None
+    after = request.args.get("after", type=int)
+    cursor = twitchChat.lastSeq()
+    reset = after is not None and after > cursor
+    if reset:
+        # Compteur reparti de zéro (redémarrage) : le client recharge le buffer
+        after = None
+    rates = twitchChat.rates()
+
+    def build():
+        messages = twitchChat.snapshot(after)
+        return {
+            "messages": messages,
+            "cursor": max(cursor, messages[-1]["seq"]) if messages else cursor,
+            "reset": reset,
+            **rates,
+            "clear_chat": clear_chat,
+            "clear_reason": clear_reason,
+        }
 
-    messages = list(bot_status.get("twitch_chat_messages", []))
-    return jsonify({
-        "messages": messages,
-        "msg_per_min": int(bot_status.get("twitch_msg_per_minute", 0)),
-        "clear_chat": clear_chat,
-        "clear_reason": clear_reason,
-    })
+    return _delta_json(("chat", after, cursor, clear_chat, *rates.values()), build)
 
 
 @webapp.route("/twitch-moderation/stream-info")
 @require_page("twitch_moderation")
 def twitch_stream_info():
     """Retourne les infos du stream en cours pour le polling dynamique."""
-    bot_status = webapp.config.get("BOT_STATUS", {})
     return jsonify({
-        "is_live": bot_status.get("twitch_is_live", False),
-        "viewer_count": bot_status.get("twitch_viewer_count", 0),
-        "title": bot_status.get("twitch_stream_title", ""),
-        "game_name": bot_status.get("twitch_game_name", ""),
-        "started_at": bot_status.get("twitch_started_at"),
-        "msg_per_min": int(bot_status.get("twitch_msg_per_minute", 0)),
+        **streamInfo(webapp.config.get("BOT_STATUS", {})),
+        **twitchChat.rates(),
     })
 
 @webapp.route("/twitch-moderation/logs/poll")
 @require_page("twitch_moderation")
 def poll_twitch_logs():
-    """Retourne les logs de modération plus récents qu'un timestamp donné."""
-    since_str = request.args.get('since', '')
-    since = None
-    if since_str:
-        try:
-            since = datetime.fromisoformat(since_str)
-        except ValueError:
-            pass
-
-    query = TwitchModerationLog.query.order_by(TwitchModerationLog.created_at.desc())
-    if since:
-        query = query.filter(TwitchModerationLog.created_at > since)
-    logs = query.limit(20).all()
+    """Logs de modération d'id supérieur au curseur ``after`` (les 20 derniers et le total sans curseur)."""
+    after = request.args.get("after", type=int)
+    last_id = db.session.query(func.max(TwitchModerationLog.id)).scalar() or 0
+    reset = after is not None and after > last_id
+    if reset:
+        # Table vidée : les ids repartent de 1
+        after = None
+
+    def build():
+        if after is None:
+            logs = TwitchModerationLog.query.order_by(TwitchModerationLog.id.desc()).limit(20).all()
+            total = TwitchModerationLog.query.count()
+        else:
+            # Par ordre croissant pour que le curseur avance sans trou, renvoyés du plus récent au plus ancien
+            logs = TwitchModerationLog.query.filter(TwitchModerationLog.id > after) \
+                .order_by(TwitchModerationLog.id.asc()).limit(LOG_PAGE_SIZE).all()
+            logs.reverse()
+            total = None
+        return {
+            "logs": [
+                {
+                    "id": log.id,
+                    "key": _log_key(log),
+                    "action": log.action,
+                    "moderator": log.moderator,
+                    "target": log.target or '-',
+                    "details": log.details or '-',
+                    "created_at": log.created_at.strftime('%d/%m %H:%M') if log.created_at else '',
+                    "created_at_iso": log.created_at.isoformat() if log.created_at else '',
+                }
+                for log in logs
+            ],
+            "cursor": logs[0].id if logs else (after or 0),
+            "reset": reset,
+            "total": total,
+        }
 
-    now = datetime.now().isoformat()
-    return jsonify({
-        "logs": [
-            {
-                "id": log.id,
-                "action": log.action,
-                "moderator": log.moderator,
-                "target": log.target or '-',
-                "details": log.details or '-',
-                "created_at": log.created_at.strftime('%d/%m %H:%M') if log.created_at else '',
-                "created_at_iso": log.created_at.isoformat() if log.created_at else '',
-            }
-            for log in logs
-        ],
-        "timestamp": now,
-        "total": TwitchModerationLog.query.count(),
-    })
+    return _delta_json(("logs", after, last_id), build)
 
 
 @webapp.route("/twitch-moderation/execute-action", methods=['POST'])
@@ -444,14 +484,12 @@ def execute_moderation_action():
 
     async def execute_action():
         if action == 'timeout':
-            from twitchbot.moderation import _get_broadcaster_id, _get_moderator_id, _get_user_id, _log_action
+            from twitchbot.moderation import _get_ids, _log_action
             username = params.get('username', '').strip().lstrip('@')
             duration = int(params.get('duration', 600))
             reason = params.get('reason', 'Timeout')
             
-            broadcaster_id = await _get_broadcaster_id(twitchBot.twitch, channel)
-            moderator_id = await _get_moderator_id(twitchBot.twitch)
-            user_id = await _get_user_id(twitchBot.twitch, username)
+            broadcaster_id, moderator_id, user_id = await _get_ids(twitchBot.twitch, channel, username)
             
             if user_id:
                 await twitchBot.twitch.ban_user(broadcaster_id, moderator_id, user_id, reason=reason, duration=duration)
@@ -460,13 +498,11 @@ def execute_moderation_action():
             return {"success": False, "error": f"Utilisateur {username} introuvable"}
         
         elif action == 'ban':
-            from twitchbot.moderation import _get_broadcaster_id, _get_moderator_id, _get_user_id, _log_action
+            from twitchbot.moderation import _get_ids, _log_action
             username = params.get('username', '').strip().lstrip('@')
             reason = params.get('reason', 'Ban')
             
-            broadcaster_id = await _get_broadcaster_id(twitchBot.twitch, channel)
-            moderator_id = await _get_moderator_id(twitchBot.twitch)
-            user_id = await _get_user_id(twitchBot.twitch, username)
+            broadcaster_id, moderator_id, user_id = await _get_ids(twitchBot.twitch, channel, username)
             
             if user_id:
                 await twitchBot.twitch.ban_user(broadcaster_id, moderator_id, user_id, reason=reason)
@@ -494,20 +530,15 @@ def execute_moderation_action():
                 return {"success": True, "message": "Chat nettoyé"}
         
         elif action == 'permit':
-            from database.models import TwitchPermit
+            from twitchbot.link_rules import permitsLoaded, loadPermits, grantPermit
             username = params.get('username', '').strip().lstrip('@').lower()
             duration = int(params.get('duration', 60))
             
             expires_at = datetime.now() + timedelta(seconds=duration)
             
-            with webapp.app_context():
-                existing = TwitchPermit.query.filter_by(username=username).first()
-                if existing:
-                    existing.expires_at = expires_at
-                else:
-                    permit = TwitchPermit(username=username, expires_at=expires_at)
-                    db.session.add(permit)
-                db.session.commit()
+            if not permitsLoaded():
+                await runQuery(loadPermits)
+            grantPermit(username, expires_at)
             
             return {"success": True, "message": f"Permit accordé à {username} pour {duration//60}min"}
         
@@ -570,6 +601,7 @@ def shoutbox_send():
     )
     db.session.add(msg)
     db.session.commit()
+    panelEvents.publish('shoutbox', _shoutbox_item(msg))
     return jsonify({"success": True, "id": msg.id})
 
 
@@ -593,63 +625,88 @@ def shoutbox_transfer():
     )
     db.session.add(msg)
     db.session.commit()
+    panelEvents.publish('shoutbox', _shoutbox_item(msg))
     return jsonify({"success": True, "id": msg.id})
 
 
 @webapp.route("/twitch-moderation/shoutbox/messages")
 @require_page("twitch_moderation")
 def shoutbox_messages():
-    since_str = request.args.get('since', '')
-    since = None
-    if since_str:
+    """Messages et sanctions après le curseur ``after`` (« id_message.id_log »), les 100 derniers sans curseur."""
+    after_msg = after_log = None
+    after = request.args.get("after", "")
+    if after:
         try:
-            since = datetime.fromisoformat(since_str)
+            after_msg, after_log = (int(part) for part in after.split(".", 1))
         except ValueError:
             pass
+    last_msg = db.session.query(func.max(ModShoutboxMessage.id)).scalar() or 0
+    last_log = db.session.query(func.max(TwitchModerationLog.id)).scalar() or 0
+    reset = (after_msg is not None and after_msg > last_msg) or (after_log is not None and after_log > last_log)
+    if reset:
+        after_msg = after_log = None
+    online_users = _get_online_users()
+
+    def build():
+        chat_query = ModShoutboxMessage.query
+        log_query = TwitchModerationLog.query
+        if after_msg is not None:
+            chat_query = chat_query.filter(ModShoutboxMessage.id > after_msg)
+            log_query = log_query.filter(TwitchModerationLog.id > after_log)
+
+        chat_msgs = chat_query.order_by(ModShoutboxMessage.id.desc()).limit(100).all()
+        log_msgs = log_query.order_by(TwitchModerationLog.id.desc()).limit(100).all()
+
+        items = [_shoutbox_item(m) for m in chat_msgs]
+        for log in log_msgs:
+            items.append({
+                "type": "sanction",
+                "id": f"log-{_log_key(log)}",
+                "action": log.action,
+                "moderator": log.moderator,
+                "target": log.target or '',
+                "details": log.details or '',
+                "created_at": log.created_at.isoformat() if log.created_at else '',
+            })
+
+        items.sort(key=lambda x: x["created_at"])
+        items = items[-100:]
+
+        cursor_msg = chat_msgs[0].id if chat_msgs else (after_msg or 0)
+        cursor_log = log_msgs[0].id if log_msgs else (after_log or 0)
+        return {
+            "items": items,
+            "cursor": f"{cursor_msg}.{cursor_log}",
+            "reset": reset,
+            "online_users": online_users,
+        }
 
-    chat_query = ModShoutboxMessage.query
-    log_query = TwitchModerationLog.query
-    if since:
-        chat_query = chat_query.filter(ModShoutboxMessage.created_at > since)
-        log_query = log_query.filter(TwitchModerationLog.created_at > since)
-
-    chat_msgs = chat_query.order_by(ModShoutboxMessage.created_at.desc()).limit(100).all()
-    log_msgs = log_query.order_by(TwitchModerationLog.created_at.desc()).limit(100).all()
-
-    items = []
-    for m in chat_msgs:
-        items.append({
-            "type": "message",
-            "id": f"msg-{m.id}",
-            "author": m.author,
-            "text": m.message,
-            "created_at": m.created_at.isoformat() if m.created_at else '',
-        })
-    for log in log_msgs:
-        items.append({
-            "type": "sanction",
-            "id": f"log-{log.id}",
-            "action": log.action,
-            "moderator": log.moderator,
-            "target": log.target or '',
-            "details": log.details or '',
-            "created_at": log.created_at.isoformat() if log.created_at else '',
-        })
-
-    items.sort(key=lambda x: x["created_at"])
-    items = items[-100:]
+    return _delta_json(("shoutbox", after_msg, after_log, last_msg, last_log, *online_users), build)
 
-    return jsonify({
-        "items": items,
-        "timestamp": datetime.now().isoformat(),
-        "online_users": _get_online_users(),
-    })
+
+def _log_key(log):
+    # Les logs poussés par le flux n'ont pas encore d'id (écriture différée) : clé de contenu
+    created_at = log.created_at.isoformat() if log.created_at else ''
+    return f"{created_at}|{log.action}|{log.moderator}"
+
+
+def _shoutbox_item(m):
+    return {
+        "type": "message",
+        "id": f"msg-{m.id}",
+        "author": m.author,
+        "text": m.message,
+        "created_at": m.created_at.isoformat() if m.created_at else '',
+    }
 
 
 def _get_online_users():
+    # Présents : panneaux connectés au flux d'événements + heartbeats récents (popout, polling)
     heartbeats = webapp.config["BOT_STATUS"].get("shoutbox_heartbeats", {})
     cutoff = datetime.now() - timedelta(seconds=15)
-    return sorted(u for u, t in heartbeats.items() if t > cutoff)
+    online = panelEvents.usernames()
+    online.update(u for u, t in heartbeats.items() if t > cutoff)
+    return sorted(online)
 
 
 @webapp.route("/twitch-moderation/shoutbox/heartbeat", methods=['POST'])
@@ -667,6 +724,7 @@ def shoutbox_clear():
         return jsonify({"success": False, "error": "Permission refusée"}), 403
     ModShoutboxMessage.query.delete()
     db.session.commit()
+    panelEvents.publish('shoutbox_clear', {})
     return jsonify({"success": True})
 
 
@@ -674,3 +732,41 @@ def shoutbox_clear():
 @require_page("twitch_moderation")
 def shoutbox_popout():
     return render_template("shoutbox-popout.html")
+
+
+# =============================
+# Flux d'événements du panneau (SSE)
+# =============================
+STREAM_TICK = 5          # secondes entre deux trames d'état (débit du chat, présence)
+STREAM_LIFETIME = 300    # le flux est refermé puis rouvert par le navigateur (Last-Event-ID)
+
+
+@webapp.route("/twitch-moderation/events")
+@require_page("twitch_moderation")
+def twitch_moderation_events():
+    """Flux SSE multiplexé : chat, logs, shoutbox, infos du stream et présence, en deltas."""
+    username = current_user.username
+    subscriber = panelEvents.subscribe(username, request.headers.get("Last-Event-ID"))
+    if subscriber is None:
+        return jsonify({"error": "Trop de flux ouverts, repli sur le polling"}), 503
+    panelEvents.publish('presence', {"online_users": _get_online_users()})
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + STREAM_LIFETIME
+            next_tick = 0.0
+            while time.monotonic() < deadline:
+                now = time.monotonic()
+                if now >= next_tick:
+                    next_tick = now + STREAM_TICK
+                    # Trame sans id : ne déplace pas le point de reprise du navigateur
+                    yield sseFrame('status', {**twitchChat.rates(), "online_users": _get_online_users()})
+                frames = subscriber.next(max(0.0, next_tick - time.monotonic()))
+                if frames:
+                    yield frames
+        finally:
+            panelEvents.unsubscribe(subscriber)
+            panelEvents.publish('presence', {"online_users": _get_online_users()})
+
+    return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})